@@ -1,3 +1,10 @@
 from .main import MoexApi
 
-__all__ = ("MoexApi",)
+__all__ = ("MoexApi", "AsyncMoexApi")
+
+
+def __getattr__(name):  # aiohttp импортируется только при использовании асинхронного клиента
+    if name == "AsyncMoexApi":
+        from .async_main import AsyncMoexApi
+        return AsyncMoexApi
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
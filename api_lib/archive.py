@@ -0,0 +1,238 @@
+import gzip
+import io
+import os
+import re
+import warnings
+import zipfile
+from collections import namedtuple
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+# Файл архива: month = None у годовых архивов. path - куда файл скачивается
+ArchiveFile = namedtuple("ArchiveFile", "engine market datatype year month url path")
+
+_PERIOD = re.compile(r"(?<!\d)((?:19|20)\d\d)(?:[-_/]?(?:months?/)?(0?[1-9]|1[0-2]))?(?!\d)")
+
+
+def _get_period(url: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Год и месяц архива по ссылке на файл: .../years/2022/months/3/..., .../2022-03.zip, ...
+    """
+    match = None
+    for match in _PERIOD.finditer(url.rsplit("://", 1)[-1]):
+        pass
+    if match is None:
+        return None, None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+
+def _open_stream(path: str) -> Iterator[IO[bytes]]:
+    """
+    Потоки данных архива: файлы внутри zip, содержимое gz или сам файл. Распаковка идет по мере чтения,
+    архив целиком в память не загружается.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                if not member.is_dir():
+                    with archive.open(member) as stream:
+                        yield stream
+    elif path.endswith(".gz"):
+        with gzip.open(path) as stream:
+            yield stream
+    else:
+        with open(path, "rb") as stream:
+            yield stream
+
+
+class ArchiveDownloader:
+    """
+    Архивы сделок и итогов торгов Мосбиржи (datatype trades или securities) по годам и месяцам из эндпоинтов
+    114 и 115. Файлы скачиваются в MAX_WORKERS потоков через общий ограничитель частоты, прерванная загрузка
+    продолжается с места обрыва (заголовок Range), скачанные файлы повторно не загружаются. Архивы читаются
+    потоково, фреймами по ARCHIVE_CHUNK_ROWS строк с колонками в порядке эндпоинтов ARCHIVE_SHAPES,
+    и могут сразу складываться в ParquetLake под тем же эндпоинтом.
+
+    Пример:
+        archives = ArchiveDownloader()
+        archives.download("stock", "shares", "trades", years=[2021, 2022])
+        for frame in archives.read("stock", "shares", "trades", years=[2021]):
+            ...
+        archives.to_lake(ParquetLake(), "stock", "shares", "trades", years=[2021, 2022])
+    """
+
+    YEARS_API_ID = "114"
+    MONTHS_API_ID = "115"
+
+    def __init__(self, api: MoexApi = None, path: str = dictionaries.ARCHIVE_PATH):
+        self.api = api or MoexApi()
+        self.path = path
+        self.errors: Dict[Any, Exception] = {}  # Не загруженные файлы и периоды
+
+    def _map(self, function: Callable[[Any], Any], keys: List[Any]) -> Dict[Any, Any]:
+        results, errors = self.api.map_threads(function, keys)
+        self.errors.update(errors)
+        if len(results) < len(keys):
+            warnings.warn(f"Не загружено: {[key for key in keys if key not in results]}. Ошибки в errors")
+        return results
+
+    def periods(
+            self, engine: str, market: str, datatype: str, years: Iterable[int] = None
+    ) -> List[Tuple[int, Optional[int]]]:
+        """
+        :param years: годы. По умолчанию - все, за которые есть архивы;
+        :return: (год, месяц) архивов. Для лет без помесячной разбивки (detailed = 0) месяц - None.
+        """
+        params = {"engine": engine, "market": market, "datatype": datatype}
+        available = self.api.request(self.YEARS_API_ID, **params)
+        detailed = dict(zip(available["year"].astype(int), available["detailed"].astype(int)))
+        years = sorted(detailed if years is None else (int(year) for year in years if int(year) in detailed))
+
+        def get_months(year: int) -> List[int]:
+            months = self.api.request(self.MONTHS_API_ID, year=year, **params)
+            return sorted(months["month"].astype(int)) if not months.empty else []
+
+        months = self._map(get_months, [year for year in years if detailed[year]])
+        return [(year, month) for year in years for month in (months.get(year) or [None])]
+
+    def links(self, engine: str, market: str, datatype: str, period: str) -> Dict[Tuple[int, Optional[int]], str]:
+        """
+        :param period: yearly, monthly или daily;
+        :return: ссылки на файлы архивов по (год, месяц).
+        """
+        url = dictionaries.ARCHIVE_LINKS_URL.format(engine=engine, market=market, datatype=datatype, period=period)
+        response = self.api._request(url, {"iss.meta": "off"})
+        links = {}
+        for block in response.values():
+            for row in block.get("data", []):
+                for value in row:
+                    if isinstance(value, str) and value.startswith("http"):
+                        year, month = _get_period(value)
+                        if year is not None:
+                            links[(year, month if period != "yearly" else None)] = value
+        return links
+
+    def files(self, engine: str, market: str, datatype: str, years: Iterable[int] = None) -> List[ArchiveFile]:
+        """
+        Файлы архивов за годы years: помесячные, а для лет без помесячной разбивки - годовые.
+        """
+        periods = self.periods(engine, market, datatype, years)
+        links = {}
+        for period, is_monthly in (("monthly", True), ("yearly", False)):
+            if any((month is not None) == is_monthly for _, month in periods):
+                links.update(self.links(engine, market, datatype, period))
+        files = []
+        for year, month in periods:
+            url = links.get((year, month))
+            if url is None:
+                self.errors[(engine, market, datatype, year, month)] = KeyError("Нет ссылки на архив")
+                continue
+            name = url.rstrip("/").rsplit("/", 1)[-1].split("?")[0]
+            period_name = f"{year}-{month:02d}" if month else str(year)
+            path = os.path.join(self.path, engine, market, datatype, f"{period_name}-{name}")
+            files.append(ArchiveFile(engine, market, datatype, year, month, url, path))
+        return files
+
+    def _download(self, file: ArchiveFile) -> str:
+        """
+        Скачать файл, продолжая недокачанный .part с места обрыва. Если сервер не поддерживает Range,
+        файл скачивается заново.
+        """
+        if os.path.exists(file.path):
+            return file.path
+        os.makedirs(os.path.dirname(file.path), exist_ok=True)
+        part_path = file.path + ".part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        self.api.rate_limiter.wait()
+        with self.api.instrumentation.span("download", offset=offset) as span:
+            with self.api.session.get(
+                    file.url, headers=headers, stream=True, timeout=self.api.TIMEOUT
+            ) as response:
+                if response.status_code == 416:  # Запрошено больше, чем есть: файл уже скачан полностью
+                    os.replace(part_path, file.path)
+                    return file.path
+                if response.status_code not in (200, 206):
+                    raise requests.RequestException(f"Загрузка {file.url} вернула статус {response.status_code}")
+                mode = "ab" if response.status_code == 206 else "wb"
+                size = 0
+                with open(part_path, mode) as output:
+                    for chunk in response.iter_content(dictionaries.ARCHIVE_CHUNK_BYTES):
+                        output.write(chunk)
+                        size += len(chunk)
+                span.set(status=response.status_code, bytes=size)
+        os.replace(part_path, file.path)
+        return file.path
+
+    def download(self, engine: str, market: str, datatype: str, years: Iterable[int] = None) -> List[str]:
+        """
+        Скачать архивы за годы years (по умолчанию - все).
+        :return: пути скачанных файлов по порядку периодов.
+        """
+        self.errors = {}
+        files = self.files(engine, market, datatype, years)
+        paths = self._map(self._download, files)
+        return [paths[file] for file in files if file in paths]
+
+    @staticmethod
+    def read_file(
+            path: str,
+            datatype: str,
+            chunk_rows: int = dictionaries.ARCHIVE_CHUNK_ROWS,
+            column_types: Dict[str, str] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Потоково прочитать архив: распаковка и разбор csv идут фреймами по chunk_rows строк.
+        :param datatype: trades или securities. Колонки приводятся к регистру и порядку эндпоинта из ARCHIVE_SHAPES,
+        колонки, которых нет в эндпоинте, идут после них;
+        :param column_types: типы колонок блока эндпоинта из метаданных ISS (MoexApi.column_types). Числовые
+        колонки приводятся к типам ARCHIVE_DTYPES, остальные остаются строками. Типы не выводятся по каждому
+        фрейму отдельно, поэтому совпадают во всех фреймах архива.
+        """
+        api_id, block = dictionaries.ARCHIVE_SHAPES[datatype]
+        shape = MoexApi._check_and_get_api_dict(api_id)["return_data"][block]["columns"]
+        dtypes = {
+            column: dictionaries.ARCHIVE_DTYPES[column_type] for column, column_type in (column_types or {}).items()
+            if column_type in dictionaries.ARCHIVE_DTYPES
+        }
+        for stream in _open_stream(path):
+            text = io.TextIOWrapper(stream, encoding=dictionaries.ARCHIVE_CSV["encoding"], newline="")
+            reader = pd.read_csv(text, sep=dictionaries.ARCHIVE_CSV["sep"], chunksize=chunk_rows, dtype=str)
+            for frame in reader:
+                frame.columns = [str(column).strip().upper() for column in frame.columns]
+                for column in frame.columns.intersection(list(dtypes)):
+                    frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(dtypes[column])
+                columns = [column for column in shape if column in frame.columns]
+                yield frame[columns + [column for column in frame.columns if column not in columns]]
+
+    def read(
+            self, engine: str, market: str, datatype: str, years: Iterable[int] = None,
+            chunk_rows: int = dictionaries.ARCHIVE_CHUNK_ROWS,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Скачать недостающие архивы и потоково прочитать их по порядку периодов (см. read_file). Типы колонок
+        берутся из метаданных эндпоинта ARCHIVE_SHAPES.
+        """
+        api_id, block = dictionaries.ARCHIVE_SHAPES[datatype]
+        column_types = self.api.column_types(api_id, engine=engine, market=market).get(block)
+        for path in self.download(engine, market, datatype, years):
+            yield from self.read_file(path, datatype, chunk_rows, column_types)
+
+    def to_lake(self, lake: Any, engine: str, market: str, datatype: str, years: Iterable[int] = None) -> int:
+        """
+        Сложить архивы в ParquetLake под эндпоинтом и блоком из ARCHIVE_SHAPES: данные читаются так же,
+        как загруженные через ParquetLake.fetch. Запись идет в режиме upsert по ключам озера (TRADENO для сделок,
+        TRADEDATE для итогов торгов, BOARDID и SECID), поэтому повторная загрузка тех же лет не дублирует строки.
+        :return: число записанных строк.
+        """
+        api_id, block = dictionaries.ARCHIVE_SHAPES[datatype]
+        rows = 0
+        for frame in self.read(engine, market, datatype, years):
+            lake.save(api_id, frame, block=block, mode="upsert", engine=engine, market=market)
+            rows += len(frame)
+        return rows
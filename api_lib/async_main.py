@@ -0,0 +1,419 @@
+import asyncio
+import warnings
+from functools import partial
+from typing import Union, List, Dict, Any, AsyncIterator, Tuple
+
+import pandas as pd
+import requests
+
+import api_lib.dictionaries as dictionaries
+from api_lib.exceptions import MoexPartialDataError
+from api_lib.limiter import RateLimiter, parse_retry_after
+from api_lib.main import MoexApi, use_cache
+from api_lib.parsing import loads
+from api_lib.schema import get_schema
+from api_lib.singleflight import AsyncSingleFlight
+from api_lib.snapshot import read_snapshot, write_snapshot
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncMoexApi:
+    """
+    Асинхронный клиент API Мосбиржи. Справочник эндпоинтов, валидацию, разбор страниц и сборку фреймов берет
+    у MoexApi (api), а все запросы идут через одну aiohttp сессию с пулом соединений. Таймауты, повторы,
+    кэш ответов, ограничитель частоты и замеры - общие с MoexApi.
+
+    Пример:
+        async with AsyncMoexApi() as moex:
+            frames = await asyncio.gather(*(moex.request(155, ..., security=sec) for sec in securities))
+    """
+
+    # Методы MoexApi, которые не обращаются к сети
+    _DELEGATED = {"description", "api_description", "all_api", "help", "available_entities", "SECTYPE",
+                  "OPTION_SERIES_TYPE", "datatypes", "report_names", "sessions"}
+
+    def __init__(
+            self, limit: int = dictionaries.MAX_CONNECTIONS, requests_per_second: float = None, api: MoexApi = None
+    ):
+        """
+        :param limit: размер пула соединений;
+        :param requests_per_second: своя частота запросов. По умолчанию используется общий ограничитель MoexApi;
+        :param api: клиент, настройки которого (TIMEOUT, MAX_RETRIES, cache, instrumentation) используются.
+        """
+        if aiohttp is None:
+            raise ImportError("Для асинхронного клиента установите aiohttp: pip install aiohttp")
+        self.api = api or MoexApi()
+        self._limit = limit
+        self._rate_limiter = (
+            RateLimiter(requests_per_second, dictionaries.RATE_BURST) if requests_per_second is not None else None
+        )
+        self._session = None
+        self._single_flight = AsyncSingleFlight()
+
+    def __getattr__(self, name: str) -> Any:
+        entity = name[5:] if name.startswith("_set_") else name
+        if name in self._DELEGATED:
+            return getattr(self.api, name)
+        if entity not in MoexApi.available_entities or name.startswith("__"):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        if "_raw_dictionaries" not in self.api.__dict__:  # Иначе MoexApi загрузит их синхронно
+            raise RuntimeError("Справочники не загружены. Используйте 'async with AsyncMoexApi()' или вызовите open()")
+        return getattr(self.api, name)
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return self._rate_limiter or self.api.rate_limiter
+
+    @property
+    def instrumentation(self) -> Any:
+        return self.api.instrumentation
+
+    async def __aenter__(self) -> "AsyncMoexApi":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """
+        Открывает сессию и загружает глобальные справочники (из локального снимка, если он свежий).
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._limit))
+        raw = read_snapshot(dictionaries.DICTIONARY_SNAPSHOT_PATH, dictionaries.DICTIONARY_SNAPSHOT_TTL)
+        if raw is None:
+            raw = await self._download_global_dictionaries()
+        self.api._set_global_dictionaries(raw["index"], raw["indexids"])
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def use_session(self, session: Any) -> None:
+        """
+        Заменить HTTP транспорт. Подойдет любой объект с методом get(url, params, timeout), возвращающим
+        асинхронный контекстный менеджер ответа (status, headers, read()), и корутиной close(),
+        например AsyncReplaySession для работы с сохраненными ответами без сети.
+        """
+        await self.close()
+        self._session = session
+
+    async def _download_global_dictionaries(self) -> dict:
+        try:
+            moex_dict, index_ids = await asyncio.gather(
+                self._request(dictionaries.DICTIONARY_API_URL, {}),
+                self._request(dictionaries.INDEX_ID_API_URL, {}),
+            )
+        except requests.RequestException:
+            raw = read_snapshot(dictionaries.DICTIONARY_SNAPSHOT_PATH, None)
+            if raw is None:
+                raise
+            warnings.warn("Не удалось обновить справочники Мосбиржи. Используется устаревший локальный снимок")
+            return raw
+        raw = {"index": moex_dict, "indexids": index_ids}
+        write_snapshot(dictionaries.DICTIONARY_SNAPSHOT_PATH, raw)
+        return raw
+
+    async def refresh_dictionaries(self) -> None:
+        """
+        Принудительно загрузить глобальные справочники с биржи и обновить локальный снимок.
+        """
+        self._check_session()
+        raw = await self._download_global_dictionaries()
+        self.api._set_global_dictionaries(raw["index"], raw["indexids"])
+
+    def _check_session(self) -> None:
+        if self._session is None:
+            raise RuntimeError("Сессия не открыта. Используйте 'async with AsyncMoexApi()' или вызовите open()")
+
+    def _get_timeout(self) -> "aiohttp.ClientTimeout":
+        timeout = self.api.TIMEOUT
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    async def _request(self, url: str, use_params: dict) -> dict:
+        content = await self._request_content(url, use_params)
+        with self.instrumentation.span("decode", bytes=len(content)):
+            return loads(content)
+
+    async def _request_content(self, url: str, use_params: dict) -> bytes:
+        """
+        Тело ответа без разбора, как MoexApi._request_content. На ответ 429 ограничитель снижает частоту, ответы
+        из RETRY_STATUSES и обрывы соединения повторяются с задержкой BACKOFF_FACTOR * 2 ** (n - 1) секунд.
+        Всего не больше MAX_RETRIES повторов.
+        """
+        self._check_session()
+        cache = self.api.cache
+        if cache is not None and use_cache.get():
+            body = cache.get(url, use_params)
+            if body is not None:
+                self.instrumentation.event("cache_hit", bytes=len(body))
+                return body
+        status = None
+        for attempt in range(self.api.MAX_RETRIES + 1):
+            await self.rate_limiter.async_wait()
+            try:
+                with self.instrumentation.span("http", attempt=attempt) as span:
+                    async with self._session.get(url, params=use_params, timeout=self._get_timeout()) as response:
+                        status, headers = response.status, response.headers
+                        content = await response.read()
+                    span.set(status=status, bytes=len(content))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                if attempt == self.api.MAX_RETRIES:
+                    raise requests.ConnectionError(f"Ошибка соединения: {error!r}") from error
+                self.instrumentation.event("retry", error=type(error).__name__)
+                await asyncio.sleep(dictionaries.BACKOFF_FACTOR * 2 ** attempt)
+                continue
+            if status == 429:
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                self.instrumentation.event("retry", status=429, retry_after=retry_after)
+                self.rate_limiter.throttle(retry_after)
+                continue
+            if status in dictionaries.RETRY_STATUSES and attempt < self.api.MAX_RETRIES:
+                self.instrumentation.event("retry", status=status)
+                await asyncio.sleep(dictionaries.BACKOFF_FACTOR * 2 ** attempt)
+                continue
+            break
+        if status != 200:
+            raise requests.RequestException("Запрос вернул статус <> 200 (OK)")
+        if cache is not None and use_cache.get():
+            cache.set(self.api._used_api_id.get(None), url, use_params, content)
+        return content
+
+    async def _get_schema(self, url: str, use_params: dict) -> dict:
+        key = self.api._get_endpoint_key(url)
+        if key not in self.api._schemas:
+            self.api._schemas[key] = get_schema(await self._request(url, self.api._get_schema_params(use_params)))
+        return self.api._schemas[key]
+
+    @staticmethod
+    def _discard(tasks: List[asyncio.Task]) -> None:
+        """
+        Отменить незавершенные задачи, а исключения завершенных забрать, чтобы asyncio не предупреждал о них.
+        """
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+    async def _iter_with_cursor(self, url: str, api_dict: dict, use_params: dict) -> AsyncIterator[dict]:
+        """
+        Страницы курсора после первой запрашиваются конкурентно, а отдаются по порядку.
+        """
+        cursor = api_dict["cursor_name"]
+        cursor_entity = cursor.replace(".cursor", "")
+        use_params.setdefault("start", 0)
+
+        first_page, offsets = self.api._start_with_cursor(await self._request(url, use_params), cursor)
+        yield first_page
+        use_params["iss.only"] = ','.join([cursor_entity, cursor])
+        tasks = [asyncio.ensure_future(self._request(url, {**use_params, "start": offset})) for offset in offsets]
+        try:
+            for offset, task in zip(offsets, tasks):
+                try:
+                    page = await task
+                except requests.RequestException as error:
+                    raise self.api._partial_data_error(error, url, use_params, offset) from error
+                yield {cursor_entity: page[cursor_entity]}
+        finally:
+            self._discard(tasks)
+
+    async def _iter_without_cursor(self, url: str, use_params: dict) -> AsyncIterator[dict]:
+        """
+        См. MoexApi._iter_without_cursor.
+        """
+        use_params.setdefault("start", 0)
+        known_size = self.api._get_page_size(url, use_params)
+        first_page, requested_entity, page_size = self.api._start_without_cursor(
+            await self._request(url, use_params), known_size
+        )
+        yield first_page
+        last_rows = {entity: hash(tuple(first_page[entity]["data"][-1])) for entity in requested_entity}
+
+        use_params["iss.only"] = ','.join(requested_entity)
+        cnt = 1
+        while cnt < dictionaries.MAX_REQ_PER_QUERY:
+            if len(requested_entity) == 0:
+                break
+            use_params["start"] += page_size
+            try:
+                response = await self._request(url, use_params)
+            except requests.RequestException as error:
+                raise self.api._partial_data_error(error, url, use_params, use_params["start"]) from error
+            if cnt == 1 and known_size is None and "limit" not in use_params:
+                self.api._learn_page_size(url, page_size, requested_entity, response)
+            page, is_change_iss_only = self.api._next_without_cursor(last_rows, requested_entity, response, page_size)
+            if page:
+                yield page
+            if is_change_iss_only:
+                use_params["iss.only"] = ','.join(requested_entity)
+            cnt += 1
+        else:
+            warnings.warn(f"К API стучались {cnt} раз. Возвращены не все данные!!!")
+
+    async def _iter_pages(self, api_dict: dict, url: str, use_params: dict) -> AsyncIterator[dict]:
+        if not self.api._is_paginated(api_dict):
+            yield await self._request(url, use_params)
+        else:
+            pages = (
+                self._iter_with_cursor(url, api_dict, use_params) if api_dict.get("cursor_name") else
+                self._iter_without_cursor(url, use_params)
+            )
+            async for page in pages:
+                yield page
+
+    async def _request_pages(self, pages: AsyncIterator[dict]) -> dict:
+        tmp_result = {}
+        with self.instrumentation.span("pages", parallel=True) as span:
+            count = 0
+            try:
+                async for page in pages:
+                    self.api._merge_pages(tmp_result, page)
+                    count += 1
+            except MoexPartialDataError as error:
+                error.partial_data = tmp_result
+                raise
+            finally:
+                span.set(pages=count)
+        return tmp_result
+
+    async def _request_to_api(
+            self, api_dict: dict, url: str, use_params: dict, typed: bool = False
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        schema = await self._get_schema(url, use_params) if typed else None
+        return self.api._dataframe_create(
+            await self._request_pages(self._iter_pages(api_dict, url, use_params)), schema
+        )
+
+    async def request(
+            self,
+            api_id: Union[int, str],
+            only_market_data: bool = False,
+            blocks: List[str] = None,
+            typed: bool = False,
+            split_dates: bool = False,
+            **kwargs: Any,
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """
+        Асинхронный аналог MoexApi.request. Параметры те же, страницы курсора и окна split_dates запрашиваются
+        конкурентно с учетом ограничения частоты запросов.
+        """
+        self._check_session()
+        with self.instrumentation.span("request", str(api_id), typed=typed):
+            if split_dates:
+                return await self._request_split_dates(
+                    api_id, kwargs, only_market_data=only_market_data, blocks=blocks, typed=typed
+                )
+            with self.instrumentation.span("prepare", str(api_id)):
+                api_dict, url, use_params = self.api._prepare_request(api_id, only_market_data, blocks, kwargs)
+            # Одинаковые одновременные запросы из разных задач выполняются один раз
+            return await self._single_flight.do(
+                self.api._get_flight_key(url, use_params, typed),
+                partial(self._request_to_api, api_dict, url, use_params, typed=typed),
+                self.api._copy_result,
+            )
+
+    async def _request_many(self, api_id: Union[int, str], calls_kwargs: List[dict], **request_params: Any) -> list:
+        return list(await asyncio.gather(
+            *(self.request(api_id, **request_params, **kwargs) for kwargs in calls_kwargs)
+        ))
+
+    async def _request_split_dates(
+            self, api_id: Union[int, str], kwargs: dict, **request_params: Any
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        api_dict = self.api._check_and_get_api_dict(api_id)
+        date_from, date_till = self.api._pop_date_range(api_id, api_dict, kwargs)
+        total = None
+        if api_dict.get("cursor_name"):
+            url, use_params = self.api._get_total_request(api_id, api_dict, kwargs, date_from, date_till)
+            total = self.api._get_cursor_total(await self._request(url, use_params), api_dict["cursor_name"])
+        windows = self.api._get_date_windows(api_id, api_dict, kwargs, date_from, date_till, total)
+        results = await self._request_many(
+            api_id, [{**kwargs, "_from": date_from, "till": date_till} for date_from, date_till in windows],
+            **request_params,
+        )
+        return self.api._merge_date_windows(results)
+
+    async def request_bulk(
+            self,
+            api_id: Union[int, str],
+            securities: List[str],
+            param: str = "securities",
+            only_market_data: bool = False,
+            blocks: List[str] = None,
+            typed: bool = False,
+            **kwargs: Any,
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """
+        Асинхронный аналог MoexApi.request_bulk: порции инструментов запрашиваются конкурентно.
+        """
+        results = await self._request_many(
+            api_id,
+            [{**kwargs, param: chunk} for chunk in self.api._get_bulk_chunks(securities, param)],
+            only_market_data=only_market_data,
+            blocks=blocks,
+            typed=typed,
+        )
+        return self.api._concat_results(results)
+
+    async def resume(
+            self, error: MoexPartialDataError, typed: bool = False
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """
+        Асинхронный аналог MoexApi.resume: продолжить прерванную загрузку с упавшего смещения start.
+        """
+        self._check_session()
+        api_dict = self.api._check_and_get_api_dict(error.api_id)
+        self.api._used_api_id.set(error.api_id)
+        tmp_result = error.partial_data
+        try:
+            rest = await self._request_pages(
+                self._iter_pages(api_dict, error.url, {**error.params, "start": error.start})
+            )
+        except MoexPartialDataError as next_error:
+            next_error.partial_data = self.api._merge_pages(tmp_result, next_error.partial_data)
+            raise
+        schema = await self._get_schema(error.url, error.params) if typed else None
+        return self.api._dataframe_create(self.api._merge_pages(tmp_result, rest), schema)
+
+    async def request_iter(
+            self,
+            api_id: Union[int, str],
+            only_market_data: bool = False,
+            blocks: List[str] = None,
+            chunk_size: int = None,
+            typed: bool = False,
+            **kwargs: Any,
+    ) -> AsyncIterator[Tuple[str, pd.DataFrame]]:
+        """
+        Асинхронный аналог MoexApi.request_iter: async for block, frame in moex.request_iter(...).
+        """
+        self._check_session()
+        api_dict, url, use_params = self.api._prepare_request(api_id, only_market_data, blocks, kwargs)
+        schema = await self._get_schema(url, use_params) if typed else None
+
+        def create(entity: str, rows: list, columns: list) -> pd.DataFrame:
+            return self.api._dataframe_create({entity: {"data": rows, "columns": columns}}, schema)
+
+        buffers: Dict[str, dict] = {}
+        async for page in self._iter_pages(api_dict, url, use_params):
+            for entity, value in page.items():
+                if not chunk_size:
+                    if value["data"]:
+                        yield entity, create(entity, value["data"], value["columns"])
+                    continue
+                buffer = buffers.setdefault(entity, {"data": [], "columns": value["columns"]})
+                buffer["data"].extend(value["data"])
+                while len(buffer["data"]) >= chunk_size:
+                    yield entity, create(entity, buffer["data"][:chunk_size], buffer["columns"])
+                    del buffer["data"][:chunk_size]
+        for entity, buffer in buffers.items():
+            if buffer["data"]:
+                yield entity, create(entity, buffer["data"], buffer["columns"])
@@ -0,0 +1,143 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict
+from urllib.parse import urlencode
+
+import api_lib.dictionaries as dictionaries
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов API. Ответы хранятся в sqlite файле как исходный JSON. Ключ - url с параметрами пути
+    и отсортированные параметры запроса, поэтому каждая страница пагинации кэшируется отдельно.
+
+    Время жизни записи зависит от эндпоинта (см. CACHE_TTL в dictionaries):
+    - справочники и архивные списки не устаревают;
+    - история за закрытые даты не устаревает;
+    - внутридневные данные живут несколько секунд;
+    - остальное живет CACHE_TTL_DEFAULT секунд.
+    При превышении max_size байт вытесняются записи, к которым дольше всего не обращались.
+    """
+
+    def __init__(
+            self,
+            path: str = dictionaries.CACHE_PATH,
+            max_size: int = dictionaries.CACHE_MAX_SIZE,
+            ttl: Dict[str, Optional[float]] = None,
+            default_ttl: float = dictionaries.CACHE_TTL_DEFAULT,
+    ):
+        """
+        :param path: путь к файлу кэша;
+        :param max_size: максимальный размер кэша в байтах;
+        :param ttl: время жизни в секундах для отдельных api_id. None - запись не устаревает;
+        :param default_ttl: время жизни для остальных эндпоинтов.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.max_size = max_size
+        self.ttl = {**dictionaries.CACHE_TTL, **(ttl or {})}
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, api_id TEXT, body BLOB, size INTEGER, expires_at REAL, last_access REAL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        # Размер кэша ведется при записи и удалении, а не считается по всей таблице на каждый set
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(url: str, params: dict) -> str:
+        query = urlencode(sorted((str(key), str(value)) for key, value in params.items()))
+        return hashlib.sha1(f"{url}?{query}".encode()).hexdigest()
+
+    def get_ttl(self, api_id: Optional[str], url: str, params: dict) -> Optional[float]:
+        """
+        :return: время жизни записи в секундах. None - запись не устаревает.
+        """
+        if "/history/" in url and self._is_closed_date(params.get("till") or params.get("date")):
+            return None
+        return self.ttl.get(api_id, self.default_ttl)
+
+    @staticmethod
+    def _is_closed_date(value: Optional[str]) -> bool:
+        try:
+            return datetime.date.fromisoformat(str(value)) < datetime.date.today()
+        except ValueError:
+            return False
+
+    def get(self, url: str, params: dict) -> Optional[bytes]:
+        key = self.make_key(url, params)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return row[0]
+
+    def set(self, api_id: Optional[str], url: str, params: dict, body: bytes) -> None:
+        ttl = self.get_ttl(api_id, url, params)
+        if ttl == 0 or len(body) > self.max_size:
+            return
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        key = self.make_key(url, params)
+        with self._lock:
+            row = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, api_id, body, len(body), expires_at, now),
+            )
+            self._size += len(body) - (row[0] if row else 0)
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """
+        Удалить устаревшие записи, а при превышении max_size - записи, к которым дольше всего не обращались.
+        Обе выборки идут по индексам, давние записи читаются порциями по CACHE_EVICT_BATCH.
+        """
+        expired = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires_at < ?", (now,)
+        ).fetchone()[0]
+        if expired:
+            self._connection.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+            self._size -= expired
+        while self._size > self.max_size:
+            rows = self._connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT ?", (dictionaries.CACHE_EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                break
+            for key, row_size in rows:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= row_size
+                if self._size <= self.max_size:
+                    break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._size = 0
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "size": size}
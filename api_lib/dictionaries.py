@@ -1,12 +1,42 @@
+import os
+
 import pandas as pd
 
 MAX_REQ_PER_QUERY = 100  # Не больше 100 запросов на одну задачу
-SLEEP_TIME = .2  # Сон между запросами. Чтобы не ддосить апи
+MAX_WORKERS = 4  # Число потоков при параллельной загрузке страниц курсора
+REQ_PER_SECOND = 5  # Не больше 5 запросов в секунду на все потоки и задачи. Чтобы не ддосить апи
+RATE_BURST = 5  # Столько запросов подряд можно отправить без паузы
+RATE_DECREASE = .5  # После ответа 429 частота запросов снижается в 1 / RATE_DECREASE раз
+MIN_REQ_PER_SECOND = .5
+RATE_RECOVERY_TIME = 30  # За столько секунд частота линейно возвращается к REQ_PER_SECOND
+RATE_LIMIT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "moex_api", "rate_limit.json")
+MAX_CONNECTIONS = 10  # Размер пула соединений асинхронного клиента
+POOL_SIZE = 10  # Размер пула соединений сессии MoexApi
+TIMEOUT = (5, 30)  # Таймауты (соединение, чтение) в секундах
+MAX_RETRIES = 3  # Число повторов запроса при 429/5xx и обрывах соединения
+BACKOFF_FACTOR = .5  # Задержка между повторами: BACKOFF_FACTOR * 2 ** (n - 1) секунд
+RETRY_STATUSES = (500, 502, 503, 504)  # 429 обрабатывает ограничитель частоты запросов
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "moex_api", "responses.sqlite")
+CACHE_MAX_SIZE = 512 * 1024 ** 2  # Размер дискового кэша ответов, байт
+CACHE_EVICT_BATCH = 100  # Записей, читаемых за раз при вытеснении из кэша
+CACHE_TTL_DEFAULT = 60 * 60  # Время жизни ответа в кэше по умолчанию, секунд
+CACHE_TTL_INTRADAY = 10
+CACHE_TTL = {  # Время жизни ответа по api_id. None - ответ не устаревает
+    **{api_id: None for api_id in ("40", "41", "42", "43", "44", "45", "114", "115", "127", "128", "129", "130")},
+    "758": None,
+    **{api_id: CACHE_TTL_INTRADAY for api_id in ("32", "33", "34", "35", "52", "53", "55", "56")},
+}
 
 DEFAULT_GET_PARAMS = {
     "iss.meta": "off"
 }
 
+PARSE_POOL_MIN_SIZE = 256 * 1024  # Ответы меньше этого размера (байт) разбираются без пула процессов
+
+CATEGORY_MIN_ROWS = 100  # Строковая колонка типизированного фрейма становится category, если в ней не меньше
+CATEGORY_RATIO = .5  # CATEGORY_MIN_ROWS строк и доля уникальных значений не больше CATEGORY_RATIO
+
 ENDPOINT_DEFAULTS = {
     "873": {"limit": 500},
     "791": {"numtrades": 1},
@@ -14,6 +44,101 @@ ENDPOINT_DEFAULTS = {
 }
 
 PARAMS_ALLOWED_MANY = {"securities", "boardid", "assets", "sectypes"}
+MAX_SECURITIES = 10  # Ограничение биржи на число инструментов в параметре securities
+MAX_ASSETS = 5  # Ограничение биржи на число базовых активов в параметре assets
+BULK_PARAMS = {"securities": MAX_SECURITIES, "assets": MAX_ASSETS}  # Параметры, которые умеет делить request_bulk
+
+DEFAULT_PAGE_SIZE = 100  # Размер страницы пагинации, если он не указан в PAGE_SIZE
+# Известные размеры страниц эндпоинтов. Для эндпоинтов без курсора страница короче этого размера - последняя.
+# Размеры остальных эндпоинтов определяются по ответам и запоминаются по url на время работы (MoexApi._page_sizes)
+PAGE_SIZE = {
+    "5": 100, "34": 5000, "35": 5000, "46": 500, "55": 5000, "56": 5000, "65": 100, "89": 5000, "118": 100,
+    "119": 100, "155": 500, "157": 500, "649": 1000, "815": 100,
+}
+DATE_SPLIT_PAGES = 5  # При разбиении интервала дат в одно окно попадает примерно столько страниц
+ROWS_PER_DAY = {1: 840, 10: 84, 60: 14, 24: 1, 7: 1 / 7, 31: 1 / 31, 4: 1 / 92}  # Число свечей в день по interval
+# Строк в день эндпоинтов без курсора и interval (внутридневные ряды). Для эндпоинтов с курсором число строк
+# берется из TOTAL, для остальных - одна строка в день
+DATE_SPLIT_ROWS_PER_DAY = {"89": 140, "809": 340, "861": 1300}
+DATE_SPLIT_TIME_KEYS = ("begin", "TRADEDATE", "tradedate")  # Ключ времени для склейки окон
+DATE_SPLIT_ID_KEYS = ("BOARDID", "SECID", "boardid", "secid", "TRADETIME", "tradetime")
+
+SYNC_PATH = os.path.join(os.path.expanduser("~"), ".cache", "moex_api", "sync")
+SYNC_WATERMARKS = (  # (колонка водяного знака, параметр запроса) в порядке приоритета
+    ("TRADENO", "tradeno"),
+    ("begin", "from"),
+    ("TRADEDATE", "from"),
+    ("tradedate", "from"),
+)
+SYNC_SKIP_PARAMS = {"from", "_from", "till", "start", "tradeno", "next_trade"}  # Не входят в ключ набора данных
+
+LAKE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "moex_api", "lake")
+LAKE_PARTITIONS = ("engine", "market", "board", "date")  # Уровни каталогов parquet хранилища под api_id и блоком
+LAKE_DATE_FORMAT = "%Y-%m"  # Уровень date - месяц: дневное разбиение истории дает тысячи файлов по одной строке
+LAKE_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"  # Каталог строк с пустым значением уровня (читается как null)
+LAKE_TRADE_KEYS = ("TRADENO", "tradeno")  # Ключ upsert сделок
+LAKE_TRADE_TIME_KEYS = ("TRADEDATE", "SYSTIME", "tradedate", "systime")  # Колонка уровня date у сделок
+
+ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "moex_api", "archives")
+# Ссылки на файлы архивов за период (yearly, monthly, daily). В справочнике эндпоинтов есть только списки
+# годов (114) и месяцев (115)
+ARCHIVE_LINKS_URL = "http://iss.moex.com/iss/archives/engines/{engine}/markets/{market}/{datatype}/{period}.json"
+ARCHIVE_SHAPES = {"trades": ("35", "trades"), "securities": ("62", "history")}  # Эндпоинт и блок той же формы
+ARCHIVE_CSV = {"sep": ";", "encoding": "cp1251"}  # Формат csv внутри архивов
+# Типы колонок csv по типам ISS. Остальные колонки (даты, время, строки) читаются строками, как в ответе ISS
+ARCHIVE_DTYPES = {"double": "float64", "int32": "Int32", "int64": "Int64"}
+ARCHIVE_CHUNK_ROWS = 500_000  # Строк в одном фрейме при потоковом чтении архива
+ARCHIVE_CHUNK_BYTES = 1024 * 1024  # Размер блока при скачивании
+
+MASTER_COLUMNS = (  # Колонки эндпоинта 5, которые хранит справочник инструментов
+    "secid", "shortname", "regnumber", "name", "isin", "is_traded", "emitent_id", "emitent_title", "emitent_inn",
+    "type", "group", "primary_boardid", "marketprice_boardid",
+)
+MASTER_KEYS = ("secid", "isin", "regnumber", "emitent_id")  # Колонки с хеш-индексом для поиска по значению
+MASTER_SEARCH_COLUMNS = ("secid", "shortname", "name", "isin")  # Текст нечеткого поиска по триграммам
+MASTER_PREFIX_COLUMNS = ("secid", "shortname")  # Колонки поиска по началу строки
+MASTER_SEARCH_LIMIT = 20  # Строк в результате поиска по умолчанию
+
+METRICS_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)  # Корзины гистограмм этапов, с
+METRICS_PREFIX = "moex_api"  # Префикс метрик Prometheus
+METRICS_MAX_SPANS = 10000  # SpanExporter хранит не больше стольких последних спанов
+
+PANEL_FIELDS = ("CLOSE", "VOLUME")  # Поля истории панели по умолчанию
+PANEL_BOARD = "TQBR"  # Режим торгов панели по умолчанию
+PANEL_PRICE_FIELDS = (  # Цены: протягиваются на даты без торгов и делятся при сплитах
+    "OPEN", "LOW", "HIGH", "CLOSE", "LEGALCLOSEPRICE", "WAPRICE", "MARKETPRICE2", "MARKETPRICE3", "ADMITTEDQUOTE",
+)
+PANEL_VOLUME_FIELDS = ("VOLUME",)  # Объемы в штуках: умножаются при сплитах
+
+POLL_MIN_INTERVAL = 1  # Интервал опроса живых данных, пока они меняются, секунд
+POLL_MAX_INTERVAL = 30  # Предельный интервал опроса без изменений, секунд
+POLL_BACKOFF = 1.5  # Рост интервала после опроса без изменений
+POLL_BLOCKS = ("marketdata", "trades")  # Отслеживаемый блок по умолчанию
+POLL_KEYS = ("SECID", "BOARDID", "secid", "boardid")  # Ключ строки снимка
+
+REPLAY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "notebooks", "moex_api_response")
+
+# Начало непрерывных торгов в сессиях фондового рынка (время МСК, номера - как в SESSIONS). Сессия длится
+# до начала следующей
+SESSION_TIMES = {0: "07:00", 1: "10:00", 2: "19:05"}
+ALL_SESSIONS = 3  # Номер "Итого (все сессии)": бары, не привязанные к одной сессии
+
+# Параметры G-кривой Мосбиржи (кривой бескупонной доходности, Нельсон-Сигель-Свенссон с поправками):
+# центры поправок a_1 = 0, a_2 = ZCYC_A2, a_(i+1) = a_i + ZCYC_A2 * ZCYC_K^(i-1),
+# ширины b_1 = ZCYC_A2, b_(i+1) = b_i * ZCYC_K
+ZCYC_A2 = 0.6
+ZCYC_K = 1.6
+ZCYC_TERMS = 9  # Число поправок G1..G9. В старых кривых (эндпоинт 89) их три, остальные считаются нулевыми
+ZCYC_COLUMNS = {"BETA0": "B1", "BETA1": "B2", "BETA2": "B3", "TAU": "T1"}  # Старые названия параметров
+ZCYC_PARAMS_TYPE = "curr"  # Кривая эндпоинта 89 из нескольких на один момент (PARAMS_TYPE)
+ZCYC_DAYS = 365  # Дней в году срока до погашения и дюрации
+
+OPTIONS_EXPIRY_TIME = "18:50"  # Время исполнения опционов срочного рынка в день LASTDELDATE (МСК)
+OPTIONS_DAYS = 365  # Дней в году срока до исполнения
+OPTIONS_RATE = 0.  # Безрисковая ставка Black-76: опционы срочного рынка маржируемые, премия не дисконтируется
+OPTIONS_VOL_BOUNDS = (1e-4, 10.)  # Границы подбора подразумеваемой волатильности (доли)
+OPTIONS_TOLERANCE = 1e-8  # Точность подбора волатильности по цене
+OPTIONS_MAX_ITER = 50  # Предельное число итераций подбора
 
 SECTYPE = {
     "1": "Акция обыкновенная",
@@ -46,6 +171,8 @@ OPTION_SERIES_TYPE = {
 
 DICTIONARY_API_URL = "https://iss.moex.com/iss/index.json"
 INDEX_ID_API_URL = "https://iss.moex.com/iss/statistics/engines/stock/markets/index/analytics.json"
+DICTIONARY_SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "moex_api", "dictionaries.json")
+DICTIONARY_SNAPSHOT_TTL = 24 * 60 * 60  # Снимок справочников обновляется раз в сутки
 
 DATATYPES = ["securities", "trades"]
 
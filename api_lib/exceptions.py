@@ -0,0 +1,16 @@
+import requests
+
+
+class MoexPartialDataError(requests.RequestException):
+    """
+    Ошибка загрузки очередной страницы при пагинации. Уже полученные страницы не теряются: они хранятся в
+    partial_data, а продолжить загрузку с упавшего смещения start можно через MoexApi.resume(error).
+    """
+
+    def __init__(self, message: str, api_id: str, url: str, params: dict, start: int, partial_data: dict):
+        super().__init__(message)
+        self.api_id = api_id
+        self.url = url
+        self.params = params
+        self.start = start
+        self.partial_data = partial_data
@@ -0,0 +1,268 @@
+import os
+import shutil
+import uuid
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pa_fs
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+
+class ParquetLake:
+    """
+    Локальное хранилище результатов request в parquet с разбиением на каталоги
+    <path>/api_id=<id>/block=<блок>/engine=<..>/market=<..>/board=<..>/date=<..>/part-<..>.parquet.
+    Уровни engine, market и board берутся из параметров запроса или колонки BOARDID, date - из ключа времени
+    (begin, TRADEDATE, у сделок - SYSTIME), отсутствующие уровни пропускаются. Чтение ленивое: с диска через
+    memory map читаются только подходящие под фильтр каталоги и запрошенные колонки.
+
+    Пример:
+        lake = ParquetLake()
+        lake.fetch(63, engine="stock", market="shares", board="TQBR", security="GAZP", _from="2015-01-01")
+        closes = lake.read(63, columns=["TRADEDATE", "SECID", "CLOSE"], board="TQBR", date_from="2020-01")
+    """
+
+    def __init__(self, api: MoexApi = None, path: str = dictionaries.LAKE_PATH):
+        if pa is None:
+            raise ImportError("Для хранилища parquet установите pyarrow: pip install pyarrow")
+        self.api = api or MoexApi()
+        self.path = path
+        self._filesystem = pa_fs.LocalFileSystem(use_mmap=True)
+
+    @staticmethod
+    def _get_block(api_id: Union[int, str], block: Optional[str]) -> str:
+        data_entities = MoexApi._check_and_get_api_dict(api_id)["return_data"]
+        if block is None:  # Фрейм без имени блока - это первый блок эндпоинта
+            return next(iter(data_entities))
+        if block not in data_entities:
+            raise ValueError(f"Блок {block} не возвращается данным эндпоинтом!")
+        return block
+
+    def _get_block_path(self, api_id: Union[int, str], block: str) -> str:
+        return os.path.join(self.path, f"api_id={api_id}", f"block={block}")
+
+    @staticmethod
+    def _get_time_key(frame: pd.DataFrame) -> Optional[str]:
+        return next((column for column in dictionaries.DATE_SPLIT_TIME_KEYS if column in frame.columns), None)
+
+    @classmethod
+    def _get_date_key(cls, columns: List[str]) -> Optional[str]:
+        """
+        Колонка уровня date: ключ времени, а у сделок (блоков с TRADENO) - дата или время сделки.
+        """
+        time_key = next((column for column in dictionaries.DATE_SPLIT_TIME_KEYS if column in columns), None)
+        if time_key is None and any(column in columns for column in dictionaries.LAKE_TRADE_KEYS):
+            time_key = next((column for column in dictionaries.LAKE_TRADE_TIME_KEYS if column in columns), None)
+        return time_key
+
+    @staticmethod
+    def _get_upsert_keys(frame: pd.DataFrame, time_key: Optional[str]) -> List[str]:
+        trade_key = next((column for column in dictionaries.LAKE_TRADE_KEYS if column in frame.columns), None)
+        if trade_key is not None:  # Номер сделки уникален, время сделки в ключ не входит
+            return [trade_key] + [
+                column for column in dictionaries.DATE_SPLIT_ID_KEYS
+                if column in frame.columns and column.upper() != "TRADETIME"
+            ]
+        keys = [column for column in dictionaries.DATE_SPLIT_ID_KEYS if column in frame.columns]
+        return ([time_key] if time_key else []) + keys or list(frame.columns)
+
+    def _split_partitions(self, frame: pd.DataFrame, partitions: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+        """
+        Строки без режима торгов или с пустой (0000-00-00) датой попадают в каталог LAKE_NULL_PARTITION.
+        :return: части фрейма по относительным путям каталогов разбиения.
+        """
+        levels_values = {level: pd.Series(str(value), index=frame.index) for level, value in partitions.items()}
+        if "board" not in levels_values:
+            board_key = next((column for column in ("BOARDID", "boardid") if column in frame.columns), None)
+            if board_key is not None:
+                levels_values["board"] = frame[board_key].astype("string").fillna(dictionaries.LAKE_NULL_PARTITION)
+        date_key = self._get_date_key(list(frame.columns))
+        if date_key is not None:
+            dates = pd.to_datetime(frame[date_key], errors="coerce").dt.strftime(dictionaries.LAKE_DATE_FORMAT)
+            levels_values["date"] = dates.astype("string").fillna(dictionaries.LAKE_NULL_PARTITION)
+        levels = [level for level in dictionaries.LAKE_PARTITIONS if level in levels_values]
+        if not levels:
+            return {"": frame}
+        result = {}
+        for values, part in frame.groupby([levels_values[level] for level in levels], sort=False, dropna=False):
+            values = values if isinstance(values, tuple) else (values,)
+            result[os.path.join(*(f"{level}={value}" for level, value in zip(levels, values)))] = part
+        return result
+
+    @staticmethod
+    def _write_part(directory: str, frame: pd.DataFrame) -> str:
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), file_path + ".tmp")
+        os.replace(file_path + ".tmp", file_path)
+        return file_path
+
+    def _upsert_part(self, directory: str, frame: pd.DataFrame, keys: List[str]) -> None:
+        """
+        Каталог разбиения переписывается целиком: старые строки с теми же ключами заменяются новыми,
+        из повторов ключа внутри frame остается последний.
+        """
+        old_files = [
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")
+        ] if os.path.isdir(directory) else []
+        if old_files:
+            stored = ds.dataset(old_files, format="parquet", filesystem=self._filesystem).to_table().to_pandas()
+            frame = pd.concat([stored, frame], ignore_index=True)
+        self._write_part(directory, frame.drop_duplicates(subset=keys, keep="last"))
+        for file_path in old_files:
+            os.remove(file_path)
+
+    def save(
+            self,
+            api_id: Union[int, str],
+            data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+            block: str = None,
+            mode: str = "append",
+            keys: List[str] = None,
+            **partitions: Any,
+    ) -> None:
+        """
+        Сохранить результат request.
+        :param api_id: id эндпоинта;
+        :param data: фрейм или словарь фреймов по блокам. Служебные блоки (.cursor, .dates) не сохраняются;
+        :param block: имя блока для фрейма. По умолчанию - первый блок эндпоинта;
+        :param mode: "append" - дописать строки, "upsert" - заменить строки с совпадающими ключами;
+        :param keys: ключи для upsert. По умолчанию ключ времени, BOARDID, SECID и TRADETIME, если они есть в блоке,
+        у сделок - TRADENO, BOARDID и SECID;
+        :param partitions: значения уровней разбиения engine, market, board (или boardid). Остальные игнорируются,
+        поэтому можно передавать те же kwargs, что и в request.
+        """
+        if mode not in ("append", "upsert"):
+            raise ValueError(f"Неизвестный режим записи {mode}. Доступны: append, upsert")
+        if "board" not in partitions and "boardid" in partitions:
+            partitions["board"] = partitions["boardid"]
+        partitions = {level: partitions[level] for level in dictionaries.LAKE_PARTITIONS if level in partitions}
+        frames = data if isinstance(data, dict) else {self._get_block(api_id, block): data}
+        for block_name, frame in frames.items():
+            if "." in block_name or frame.empty:
+                continue
+            block_path = self._get_block_path(api_id, self._get_block(api_id, block_name))
+            upsert_keys = keys or self._get_upsert_keys(frame, self._get_time_key(frame))
+            for relative_path, part in self._split_partitions(frame, partitions).items():
+                directory = os.path.join(block_path, relative_path)
+                if mode == "append":
+                    self._write_part(directory, part)
+                else:
+                    self._upsert_part(directory, part, upsert_keys)
+
+    def fetch(
+            self,
+            api_id: Union[int, str],
+            mode: str = "upsert",
+            blocks: List[str] = None,
+            **kwargs: Any,
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """
+        Загрузить данные через request и сохранить их в хранилище.
+        :param mode: режим записи, как в save;
+        :param blocks, kwargs: как в request. Параметры engine, market и board задают уровни разбиения.
+        :return: Загруженные данные.
+        """
+        data = self.api.request(api_id, blocks=blocks, **dict(kwargs))
+        if isinstance(data, pd.DataFrame) and blocks:
+            data = {blocks[0]: data}
+        self.save(api_id, data, mode=mode, **kwargs)
+        return data
+
+    def dataset(self, api_id: Union[int, str], block: str = None) -> "ds.Dataset":
+        """
+        :return: ленивый pyarrow Dataset блока. Уровни разбиения доступны как строковые колонки.
+        """
+        block_path = self._get_block_path(api_id, self._get_block(api_id, block))
+        partitioning = ds.HivePartitioning(
+            pa.schema([(level, pa.string()) for level in dictionaries.LAKE_PARTITIONS]),
+            null_fallback=dictionaries.LAKE_NULL_PARTITION,
+        )
+        dataset = ds.dataset(block_path, format="parquet", partitioning=partitioning, filesystem=self._filesystem)
+        # Части, записанные разными запросами, могут отличаться типами (null/int64/double) - схема обобщается
+        schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+        if len(schemas) > 1:
+            schema = pa.unify_schemas(schemas + [partitioning.schema], promote_options="permissive")
+            dataset = ds.dataset(
+                block_path, schema=schema, format="parquet", partitioning=partitioning, filesystem=self._filesystem
+            )
+        return dataset
+
+    def read(
+            self,
+            api_id: Union[int, str],
+            block: str = None,
+            columns: List[str] = None,
+            date_from: str = None,
+            date_till: str = None,
+            where: "ds.Expression" = None,
+            arrow: bool = False,
+            **partitions: Any,
+    ) -> Union[pd.DataFrame, "pa.Table"]:
+        """
+        Прочитать срез блока. Каталоги, не подходящие под условия разбиения, не читаются.
+        :param block: имя блока. По умолчанию - первый блок эндпоинта;
+        :param columns: список колонок. По умолчанию - все колонки, включая уровни разбиения;
+        :param date_from, date_till: границы периода (включительно). Отбираются каталоги date, в которые попадает
+        период, а внутри них - строки по ключу времени;
+        :param where: дополнительное условие pyarrow.dataset.Expression, например ds.field("SECID") == "GAZP";
+        :param arrow: вернуть pyarrow.Table вместо фрейма;
+        :param partitions: значения уровней engine, market, board. Несколько значений передаются списком.
+        :return: Фрейм данных.
+        """
+        block = self._get_block(api_id, block)
+        if not os.path.isdir(self._get_block_path(api_id, block)):
+            return pa.table({}) if arrow else pd.DataFrame(columns=columns)
+        dataset = self.dataset(api_id, block)
+        conditions = [] if where is None else [where]
+        for level, value in partitions.items():
+            if level not in dictionaries.LAKE_PARTITIONS:
+                raise KeyError(f"Уровень {level} не используется в разбиении. Доступны: {dictionaries.LAKE_PARTITIONS}")
+            if isinstance(value, (list, set, tuple)):
+                conditions.append(ds.field(level).isin([str(item) for item in value]))
+            else:
+                conditions.append(ds.field(level) == str(value))
+        conditions.extend(self._get_date_conditions(dataset.schema, date_from, date_till))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        table = dataset.to_table(columns=columns, filter=expression)
+        return table if arrow else table.to_pandas()
+
+    @staticmethod
+    def _get_date_conditions(schema: "pa.Schema", date_from: Optional[str], date_till: Optional[str]) -> list:
+        time_key = ParquetLake._get_date_key(schema.names)
+        conditions = []
+        for bound, is_from in ((date_from, True), (date_till, False)):
+            if bound is None:
+                continue
+            bound = pd.Timestamp(bound)
+            partition = bound.strftime(dictionaries.LAKE_DATE_FORMAT)
+            conditions.append(ds.field("date") >= partition if is_from else ds.field("date") <= partition)
+            if time_key is None:
+                continue
+            time_type = schema.field(time_key).type
+            if pa.types.is_string(time_type) or pa.types.is_large_string(time_type):  # Даты нетипизированных фреймов
+                value = bound.strftime("%Y-%m-%d") if is_from else bound.strftime("%Y-%m-%d") + "~"
+            else:
+                value = pa.scalar(bound if is_from else bound + pd.Timedelta(days=1), pa.timestamp("ns"))
+            conditions.append(ds.field(time_key) >= value if is_from else ds.field(time_key) < value)
+        return conditions
+
+    def drop(self, api_id: Union[int, str], block: str = None) -> None:
+        """
+        Удалить сохраненные данные эндпоинта (или одного его блока).
+        """
+        target = os.path.join(self.path, f"api_id={api_id}")
+        if block is not None:
+            target = self._get_block_path(api_id, self._get_block(api_id, block))
+        shutil.rmtree(target, ignore_errors=True)
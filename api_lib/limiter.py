@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import api_lib.dictionaries as dictionaries
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    :return: пауза из заголовка Retry-After в секундах или None, если заголовка нет или он задан датой.
+    """
+    try:
+        return max(0., float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов - token bucket (в форме GCRA): до burst запросов подряд без паузы, дальше не чаще
+    requests_per_second в секунду. Потокобезопасен, для asyncio есть async_wait. Каждый вызов wait() получает
+    свой слот, поэтому один ограничитель на всех потоках и задачах дает общую для них частоту.
+    После ответа 429 (throttle) частота умножается на RATE_DECREASE и линейно восстанавливается за
+    RATE_RECOVERY_TIME секунд, а все ожидающие запросы выдерживают паузу Retry-After.
+    """
+
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(self, requests_per_second: float, burst: int = 1):
+        if requests_per_second <= 0:
+            raise ValueError("Частота запросов должна быть больше нуля")
+        if burst < 1:
+            raise ValueError("Размер пачки запросов должен быть не меньше 1")
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._memory_state = self._initial_state()
+
+    def _initial_state(self) -> dict:
+        """
+        tat - время, с которого ведро снова пусто; rate и throttled_at - сниженная частота и время ее снижения.
+        """
+        return {"tat": self._clock(), "rate": self.requests_per_second, "throttled_at": None}
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        with self._lock:
+            yield self._memory_state
+
+    def _get_rate(self, state: dict, now: float) -> float:
+        if state["throttled_at"] is None:
+            return self.requests_per_second
+        share = (now - state["throttled_at"]) / dictionaries.RATE_RECOVERY_TIME
+        if share >= 1:
+            state.update(rate=self.requests_per_second, throttled_at=None)
+            return self.requests_per_second
+        return state["rate"] + (self.requests_per_second - state["rate"]) * share
+
+    def _reserve(self) -> float:
+        with self._state() as state:
+            now = self._clock()
+            interval = 1 / self._get_rate(state, now)
+            tat = max(state["tat"], now)
+            state["tat"] = tat + interval
+        return tat - (self.burst - 1) * interval - now
+
+    def wait(self) -> None:
+        sleep_time = self._reserve()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+    async def async_wait(self) -> None:
+        sleep_time = self._reserve()
+        if sleep_time > 0:
+            await asyncio.sleep(sleep_time)
+
+    def throttle(self, retry_after: float = None) -> None:
+        """
+        Сообщить об ответе 429: снизить частоту и приостановить все запросы на retry_after секунд
+        (по умолчанию на один интервал новой частоты).
+        """
+        with self._state() as state:
+            now = self._clock()
+            rate = max(self._get_rate(state, now) * dictionaries.RATE_DECREASE, dictionaries.MIN_REQ_PER_SECOND)
+            state.update(rate=rate, throttled_at=now)
+            pause = 1 / rate if retry_after is None else retry_after
+            state["tat"] = max(state["tat"], now + pause + (self.burst - 1) / rate)  # После паузы без пачки
+
+
+class FileRateLimiter(RateLimiter):
+    """
+    Ограничитель, общий для всех процессов на машине: состояние ведра хранится в файле и меняется под блокировкой
+    flock. Все процессы, указавшие один path, делят между собой одну частоту запросов.
+
+    Пример:
+        MoexApi.rate_limiter = FileRateLimiter()
+    """
+
+    _clock = staticmethod(time.time)  # В отличие от monotonic одинаково для всех процессов
+
+    def __init__(
+            self,
+            path: str = dictionaries.RATE_LIMIT_PATH,
+            requests_per_second: float = dictionaries.REQ_PER_SECOND,
+            burst: int = dictionaries.RATE_BURST,
+    ):
+        if fcntl is None:
+            raise OSError("Общий для процессов ограничитель требует fcntl (Linux, macOS)")
+        super().__init__(requests_per_second, burst)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        with self._lock, os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT), "r+", encoding="utf-8") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(state_file.read())
+                except ValueError:  # Новый или поврежденный файл
+                    state = self._initial_state()
+                yield state
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(json.dumps(state))
+                state_file.flush()
+            finally:
+                fcntl.flock(state_file, fcntl.LOCK_UN)
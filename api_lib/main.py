@@ -1,20 +1,68 @@
 import pandas as pd
 import requests
+import contextvars
+import datetime
 import json
-import time
+import threading
 import warnings
-from collections import namedtuple
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 from os import path
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, Callable, Iterator, Tuple, Optional
+from urllib.parse import urlparse
 
 import api_lib.dictionaries as dictionaries
+from api_lib.cache import ResponseCache
+from api_lib.exceptions import MoexPartialDataError
+from api_lib.limiter import RateLimiter, parse_retry_after
+from api_lib.metrics import Instrumentation
 from api_lib.mixins import MoexParamCheckerMixin
+from api_lib.parsing import build_frames, loads, parse_response
+from api_lib.plan import EndpointPlan, get_param_name
+from api_lib.schema import concat_typed, get_schema
+from api_lib.session import create_session
+from api_lib.singleflight import SingleFlight
+from api_lib.snapshot import read_snapshot, write_snapshot
 
 DICT_JSON = "MOEX_API_DICT.json"
 PATH_TO_DICT = path.join(path.dirname(__file__), DICT_JSON)
+use_cache: contextvars.ContextVar[bool] = contextvars.ContextVar("use_cache", default=True)  # См. bypass_cache
 
-with open(PATH_TO_DICT, "r") as jsn_file:
-    GLOBAL_API = json.load(jsn_file)
+
+class _LazyApiDict(Mapping):
+    """
+    Справочник эндпоинтов. Json читается при первом обращении, а не при импорте библиотеки.
+    """
+
+    def __init__(self, path_to_dict: str):
+        self._path_to_dict = path_to_dict
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            with self._lock:  # Первое обращение может прийти сразу из нескольких потоков пула
+                if self._data is None:
+                    with open(self._path_to_dict, "r") as jsn_file:
+                        self._data = json.load(jsn_file)
+        return self._data
+
+    def __getitem__(self, api_id: str) -> dict:
+        return self.data[api_id]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+GLOBAL_API = _LazyApiDict(PATH_TO_DICT)
 
 
 class MoexApi(MoexParamCheckerMixin):
@@ -28,6 +76,21 @@ class MoexApi(MoexParamCheckerMixin):
     datatypes = dictionaries.DATATYPES
     report_names = dictionaries.REPORT_NAMES
     sessions = dictionaries.SESSIONS
+    MAX_WORKERS = dictionaries.MAX_WORKERS
+    TIMEOUT = dictionaries.TIMEOUT
+    MAX_RETRIES = dictionaries.MAX_RETRIES
+    # Общий для всех потоков и клиентов. Для нескольких процессов замените на FileRateLimiter()
+    rate_limiter: RateLimiter = RateLimiter(dictionaries.REQ_PER_SECOND, dictionaries.RATE_BURST)
+    cache: Optional[ResponseCache] = None  # Дисковый кэш ответов. Включается присвоением ResponseCache()
+    _schemas: Dict[str, dict] = {}  # Типы колонок из метаданных ISS по пути url (см. _get_endpoint_key)
+    _single_flight = SingleFlight()
+    _dictionaries_lock = threading.Lock()  # Однократная загрузка глобальных справочников
+    parse_pool: Optional[ProcessPoolExecutor] = None  # Пул процессов разбора ответов, см. configure_parsing
+    _plans: Dict[str, EndpointPlan] = {}  # Скомпилированные эндпоинты по api_id
+    _page_sizes: Dict[str, int] = {}  # Размеры страниц эндпоинтов без курсора по пути url, определенные по ответам
+    instrumentation = Instrumentation()  # Подписка на замеры этапов запроса, см. api_lib.metrics
+    # Локальный справочник инструментов: параметр пути security проверяется без запроса. См. api_lib.master
+    securities_master = None
 
     __main_entities = {
         "engines": __base_attr("name", "title"),
@@ -58,24 +121,137 @@ class MoexApi(MoexParamCheckerMixin):
         return cls.__instance
 
     def __init__(self):
-        moex_dict = requests.get(dictionaries.DICTIONARY_API_URL).json()
-        for entity, columns in self.__main_entities.items():
-            setattr(
-                self,
-                entity,
-                pd.DataFrame(
-                    data=moex_dict[entity]["data"], columns=moex_dict[entity]["columns"]
-                ).set_index(columns.main),
-            )
-        self.indexids = self._get_index_id()
-        self._set_set_dictionaries()
+        # Глобальные справочники загружаются при первом обращении (см. __getattr__), а не при создании объекта
+        if getattr(self, "session", None) is None:
+            self.session = create_session(on_retry=self._on_retry)
+
+    def __getattr__(self, name: str) -> Any:
+        entity = name[5:] if name.startswith("_set_") else name
+        if entity not in self.available_entities or name.startswith("__"):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        if name == entity:
+            value = self._get_entity_dataframe(entity)
+        elif entity in self.__main_entities or entity == "indexids":
+            value = self._get_entity_keys(entity)
+        else:
+            data = getattr(self, entity)
+            value = set(data.index) if isinstance(data, pd.DataFrame) else set(data)
+        setattr(self, name, value)
+        return value
+
+    @property
+    def _global_dictionaries(self) -> dict:
+        raw = self.__dict__.get("_raw_dictionaries")
+        if raw is None:
+            with self._dictionaries_lock:  # Справочники загружаются один раз, даже если нужны сразу нескольким потокам
+                raw = self.__dict__.get("_raw_dictionaries")
+                if raw is None:
+                    raw = read_snapshot(dictionaries.DICTIONARY_SNAPSHOT_PATH, dictionaries.DICTIONARY_SNAPSHOT_TTL)
+                    if raw is None:
+                        raw = self._download_global_dictionaries()
+                    self._raw_dictionaries = raw
+        return raw
+
+    def _download_global_dictionaries(self) -> dict:
+        try:
+            raw = {
+                "index": self._request(dictionaries.DICTIONARY_API_URL, {}),
+                "indexids": self._request(dictionaries.INDEX_ID_API_URL, {}),
+            }
+        except requests.RequestException:
+            raw = read_snapshot(dictionaries.DICTIONARY_SNAPSHOT_PATH, None)
+            if raw is None:
+                raise
+            warnings.warn("Не удалось обновить справочники Мосбиржи. Используется устаревший локальный снимок")
+            return raw
+        write_snapshot(dictionaries.DICTIONARY_SNAPSHOT_PATH, raw)
+        return raw
+
+    def refresh_dictionaries(self) -> None:
+        """
+        Принудительно загрузить глобальные справочники с биржи и обновить локальный снимок.
+        """
+        raw = self._download_global_dictionaries()
+        self._set_global_dictionaries(raw["index"], raw["indexids"])
+
+    def configure_parsing(self, workers: Optional[int] = None) -> None:
+        """
+        Разбирать большие ответы (json и сборку фреймов) в пуле процессов, параллельно с загрузкой страниц.
+        :param workers: число процессов, по умолчанию - по числу ядер. 0 - выключить пул и разбирать на месте.
+        """
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+        if workers != 0:
+            self.parse_pool = ProcessPoolExecutor(max_workers=workers)
+
+    def configure_session(
+            self,
+            pool_size: int = dictionaries.POOL_SIZE,
+            timeout: Union[float, Tuple[float, float]] = dictionaries.TIMEOUT,
+            retries: int = dictionaries.MAX_RETRIES,
+            backoff_factor: float = dictionaries.BACKOFF_FACTOR,
+    ) -> None:
+        """
+        Пересоздать HTTP сессию с новыми настройками.
+        :param pool_size: размер пула соединений;
+        :param timeout: таймаут запроса в секундах или пара (соединение, чтение);
+        :param retries: число повторов при 429/5xx и обрывах соединения;
+        :param backoff_factor: базовая задержка экспоненциальных повторов в секундах.
+        """
+        self.session.close()
+        self.session = create_session(pool_size, retries, backoff_factor, on_retry=self._on_retry)
+        self.TIMEOUT = timeout
+        self.MAX_RETRIES = retries
+
+    def _on_retry(self, **values: Any) -> None:
+        """
+        Повтор запроса внутри HTTP сессии (5xx, обрыв соединения) попадает в замеры так же, как повтор после 429.
+        """
+        self.instrumentation.event("retry", **values)
+
+    def use_session(self, session: Any) -> None:
+        """
+        Заменить HTTP транспорт. Подойдет любой объект с методами get(url, params, timeout) и close(),
+        например ReplaySession для работы с сохраненными ответами без сети.
+        """
+        self.session.close()
+        self.session = session
 
     @staticmethod
-    def _get_index_id() -> pd.DataFrame:
-        index_ids = requests.get(dictionaries.INDEX_ID_API_URL).json()
-        return pd.DataFrame(
-            data=index_ids["indices"]["data"], columns=index_ids["indices"]["columns"]
-        ).set_index("indexid")
+    @contextmanager
+    def bypass_cache() -> Iterator[None]:
+        """
+        Запросы внутри блока with идут мимо кэша ответов (и в потоках, запущенных с копией контекста).
+        """
+        token = use_cache.set(False)
+        try:
+            yield
+        finally:
+            use_cache.reset(token)
+
+    def _set_global_dictionaries(self, moex_dict: dict, index_ids: dict) -> None:
+        self._raw_dictionaries = {"index": moex_dict, "indexids": index_ids}
+        for entity in self.available_entities:  # Производные фреймы и множества пересоберутся при обращении
+            self.__dict__.pop(entity, None)
+            self.__dict__.pop(f"_set_{entity}", None)
+
+    def _get_entity_block(self, entity: str) -> Tuple[dict, str]:
+        if entity == "indexids":
+            return self._global_dictionaries["indexids"]["indices"], "indexid"
+        return self._global_dictionaries["index"][entity], self.__main_entities[entity].main
+
+    def _get_entity_dataframe(self, entity: str) -> pd.DataFrame:
+        block, index = self._get_entity_block(entity)
+        return pd.DataFrame(data=block["data"], columns=block["columns"]).set_index(index)
+
+    def _get_entity_keys(self, entity: str) -> set:
+        """
+        Для валидации нужны только ключи справочника, поэтому они берутся из json без построения фрейма.
+        """
+        block, index = self._get_entity_block(entity)
+        index_id = block["columns"].index(index)
+        return {row[index_id] for row in block["data"]}
 
     def description(self, entity: str, name: str) -> str:
         """
@@ -148,20 +324,8 @@ class MoexApi(MoexParamCheckerMixin):
             print(f"\nДетали: {api['faq_url']}")
             print(f"Темплейт: {api['endpoint']}")
 
-    def _set_set_dictionaries(self):
-        for entity in self.available_entities:
-            data = getattr(self, entity)
-            if isinstance(data, pd.DataFrame):
-                setattr(self, f"_set_{entity}", set(data.index))
-            else:
-                setattr(self, f"_set_{entity}", set(data))
-
     def _get_endpoint_columns(self) -> set:
-        use_api_id = self._used_api_id.get()
-        columns = set()
-        for column_data in GLOBAL_API[use_api_id]["return_data"].values():
-            columns.update(column_data.get("columns", []))
-        return columns
+        return self._get_plan(self._used_api_id.get()).columns
 
     @staticmethod
     def _check_and_get_api_dict(api_id: Union[int, str]) -> dict:
@@ -170,48 +334,44 @@ class MoexApi(MoexParamCheckerMixin):
             raise KeyError(f"Не найден api c id={api_id}")
         return result
 
-    def _get_full_endpoint(self, api_dict: dict, request_params: dict) -> str:
-        endpoint = api_dict["endpoint"] + ".json"
-        global_entities = api_dict.get("global_entities")
-        if not global_entities:
-            return endpoint
+    @classmethod
+    def _get_plan(cls, api_id: Union[int, str]) -> EndpointPlan:
+        """
+        Эндпоинт, подготовленный к запросам. Компилируется при первом обращении и переиспользуется.
+        """
+        api_id = str(api_id)
+        plan = cls._plans.get(api_id)
+        if plan is None:
+            plan = cls._plans[api_id] = EndpointPlan(api_id, cls._check_and_get_api_dict(api_id), cls)
+        return plan
 
+    def _get_full_endpoint(self, plan: EndpointPlan, request_params: dict) -> str:
         path_params = {}
-        for param in global_entities:
+        for param, validator in plan.path_validators:
             entity = request_params.pop(param, None)
             if entity is None:
                 raise KeyError(f"Параметр {param} является частью пути. Укажите его в запросе!")
-            path_params[param] = self._checker(param, entity, is_params=False)
-        return endpoint.format(**path_params)
-
-    def _get_param_for_endpoint(self, api_dict: dict, request_params: dict) -> dict:
-        use_params = {}
-        use_params.update(dictionaries.ENDPOINT_DEFAULTS.get(self._used_api_id.get(), {}))
-        api_params = set(api_dict.get("params", []))
-        if api_params:
-            for param in list(request_params):
-                if param in api_params:
-                    param_value = request_params.pop(param)
-                else:
-                    drop_alpha = (
-                        1 if param.startswith("_") else
-                        2 if param.startswith("P_") else
-                        3 if param.find("__") != -1 else
-                        0
-                    )
-                    if drop_alpha:
-                        param_value = request_params.pop(param)
-                        if drop_alpha != 3:
-                            param = param[drop_alpha:]
-                        else:
-                            param = param.replace("__", ".")
-                        if param not in api_params:
-                            raise KeyError(f"Параметр {param} не используется данным эндпоинтом!")
-                    else:
-                        continue
-                if isinstance(param_value, (list, set)) and param not in dictionaries.PARAMS_ALLOWED_MANY:
-                    raise ValueError(f"Параметр {param} не может принимать множественные значения!")
-                use_params[param] = self._checker(param, param_value)
+            if not isinstance(entity, (int, str)):
+                raise ValueError(f"Параметр пути сущности {param} принимает значение отличное от строки: {entity}")
+            path_params[param] = validator(self, entity)
+        return plan.format_url(**path_params)
+
+    def _get_param_for_endpoint(self, plan: EndpointPlan, request_params: dict) -> dict:
+        use_params = dict(plan.defaults)
+        if not plan.param_aliases:
+            return use_params
+        for key in list(request_params):
+            alias = plan.param_aliases.get(key)
+            if alias is None:
+                param = get_param_name(key)
+                if param is not None:
+                    raise KeyError(f"Параметр {param} не используется данным эндпоинтом!")
+                continue
+            param, validator = alias
+            param_value = request_params.pop(key)
+            if isinstance(param_value, (list, set)) and param not in dictionaries.PARAMS_ALLOWED_MANY:
+                raise ValueError(f"Параметр {param} не может принимать множественные значения!")
+            use_params[param] = validator(self, param_value)
         return use_params
 
     @staticmethod
@@ -229,115 +389,673 @@ class MoexApi(MoexParamCheckerMixin):
         return use_columns
 
     @staticmethod
-    def _get_block_params(data_entities: set, blocks: list) -> dict:
+    def _get_block_params(data_entities: set, blocks: list, cursor_name: str = None) -> dict:
         use_block = []
         for block in blocks:
             if block not in data_entities:
                 raise ValueError(f"Блок {block} не возвращается данным эндпоинтом!")
             use_block.append(block)
+        if cursor_name and cursor_name.replace(".cursor", "") in use_block and cursor_name not in use_block:
+            use_block.append(cursor_name)  # Без курсора пагинация остановится на первой странице
         return {"iss.only": use_block}
 
-    @staticmethod
-    def _request(url: str, use_params: dict) -> dict:
-        request = requests.get(url, params=use_params)
+    def _request(self, url: str, use_params: dict) -> dict:
+        content = self._request_content(url, use_params)
+        with self.instrumentation.span("decode", bytes=len(content)):
+            return loads(content)
+
+    def _request_content(self, url: str, use_params: dict) -> bytes:
+        """
+        Тело ответа без разбора. Обращение к сети идет через общий ограничитель частоты. На ответ 429 ограничитель
+        снижает частоту для всех потоков, запрос повторяется до MAX_RETRIES раз.
+        """
+        if self.cache is not None and use_cache.get():
+            body = self.cache.get(url, use_params)
+            if body is not None:
+                self.instrumentation.event("cache_hit", bytes=len(body))
+                return body
+        for attempt in range(self.MAX_RETRIES + 1):
+            self.rate_limiter.wait()
+            with self.instrumentation.span("http", attempt=attempt) as span:
+                request = self.session.get(url, params=use_params, timeout=self.TIMEOUT)
+                span.set(status=request.status_code, bytes=len(request.content))
+            if request.status_code != 429:
+                break
+            retry_after = parse_retry_after(request.headers.get("Retry-After"))
+            self.instrumentation.event("retry", status=429, retry_after=retry_after)
+            self.rate_limiter.throttle(retry_after)
         if request.status_code != 200:
             raise requests.RequestException("Запрос вернул статус <> 200 (OK)")
-        # print(request.url)
-        return request.json()
+        if self.cache is not None and use_cache.get():
+            self.cache.set(self._used_api_id.get(None), url, use_params, request.content)
+        return request.content
+
+    @classmethod
+    def _dataframe_create(cls, final_data: dict, schema: dict = None) -> Union[dict, pd.DataFrame]:
+        with cls.instrumentation.span("frames", typed=schema is not None) as span:
+            frames = build_frames(final_data, schema)
+            span.set(rows=sum(len(frame) for frame in frames.values()))
+        return cls._unwrap_frames(frames)
 
     @staticmethod
-    def _dataframe_create(final_data: dict) -> Union[dict, pd.DataFrame]:
-        result = {key: pd.DataFrame(data=value["data"], columns=value["columns"]) for key, value in final_data.items()}
+    def _unwrap_frames(result: Dict[str, pd.DataFrame]) -> Union[dict, pd.DataFrame]:
         return result[list(result)[0]] if len(result) == 1 else result
 
-    def _request_with_cursor(self, url: str, api_dict: dict, use_params: dict) -> Union[dict, pd.DataFrame]:
+    @staticmethod
+    def _get_schema_params(use_params: dict) -> dict:
+        # Схема запрашивается для всех блоков и колонок, чтобы ее можно было переиспользовать в любом запросе
+        schema_params = {
+            param: value for param, value in use_params.items()
+            if param != "iss.only" and not param.endswith(".columns")
+        }
+        schema_params.update({"iss.meta": "on", "iss.data": "off"})
+        return schema_params
+
+    @staticmethod
+    def _get_endpoint_key(url: str) -> str:
+        """
+        Ключ кэшей эндпоинта: путь url с подставленными параметрами пути. Метаданные одного api_id
+        на разных рынках (engine, market) различаются.
+        """
+        return urlparse(url).path
+
+    def _get_schema(self, url: str, use_params: dict) -> dict:
+        """
+        Типы колонок эндпоинта. Метаданные запрашиваются без данных один раз на url эндпоинта и кэшируются.
+        """
+        key = self._get_endpoint_key(url)
+        if key not in self._schemas:
+            self._schemas[key] = get_schema(self._request(url, self._get_schema_params(use_params)))
+        return self._schemas[key]
+
+    @staticmethod
+    def _get_cursor_offsets(cursor_block: dict) -> List[int]:
+        """
+        Курсор первой страницы содержит INDEX, TOTAL и PAGESIZE, поэтому все смещения start известны заранее.
+        """
+        cursor_idx = cursor_block["columns"].index
+        cursor_data = cursor_block["data"][0]
+        index, total, page_size = (cursor_data[cursor_idx(name)] for name in ("INDEX", "TOTAL", "PAGESIZE"))
+        if not page_size:
+            return []
+        offsets = list(range(index + page_size, total, page_size))
+        if len(offsets) >= dictionaries.MAX_REQ_PER_QUERY:
+            warnings.warn(f"Для выгрузки нужно {len(offsets) + 1} запросов. Возвращены не все данные!!!")
+            offsets = offsets[:dictionaries.MAX_REQ_PER_QUERY - 1]
+        return offsets
+
+    def _fetch_pages(
+            self, url: str, use_params: dict, offsets: List[int], raw: bool = False
+    ) -> Iterator[Union[dict, bytes]]:
+        """
+        :param raw: отдавать тела ответов без разбора.
+        """
+        request = self._request_content if raw else self._request
+        for offset in offsets:
+            yield request(url, {**use_params, "start": offset})
+
+    def _fetch_pages_parallel(
+            self, url: str, use_params: dict, offsets: List[int], raw: bool = False
+    ) -> Iterator[Union[dict, bytes]]:
+        request = self._request_content if raw else self._request
+
+        def fetch(offset: int) -> Union[dict, bytes]:
+            return request(url, {**use_params, "start": offset})
+
+        # В работе не больше MAX_WORKERS страниц: при ошибке или остановке потребителя незапрошенные страницы
+        # отменяются, а не загружаются впустую. Контекст (used_api_id) копируется в каждый поток
+        executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        pending = iter(offsets)
+        futures = deque(
+            executor.submit(contextvars.copy_context().run, fetch, offset)
+            for offset in islice(pending, self.MAX_WORKERS)
+        )
+        try:
+            while futures:
+                page = futures.popleft().result()
+                for offset in islice(pending, 1):
+                    futures.append(executor.submit(contextvars.copy_context().run, fetch, offset))
+                yield page
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def _start_with_cursor(cls, response: dict, cursor: str) -> Tuple[dict, List[int]]:
+        """
+        Разбор первой страницы эндпоинта с курсором.
+        :return: накопитель данных и смещения start оставшихся страниц.
+        """
         tmp_result = {}
+        for entity, value in response.items():
+            if entity != cursor:
+                tmp_result[entity] = {"data": value["data"], "columns": value["columns"]}
+        if cursor.replace(".cursor", "") not in response or cursor not in response:
+            return tmp_result, []
+        return tmp_result, cls._get_cursor_offsets(response[cursor])
+
+    def _partial_data_error(self, error: Exception, url: str, use_params: dict, start: int) -> MoexPartialDataError:
+        return MoexPartialDataError(
+            f"Загрузка прервана на start={start}: {error}. Полученные данные сохранены, продолжите через resume()",
+            api_id=self._used_api_id.get(),
+            url=url,
+            params=dict(use_params),
+            start=start,
+            partial_data={},
+        )
+
+    def _iter_with_cursor(
+            self, url: str, api_dict: dict, use_params: dict, parallel: bool = False, first_response: dict = None
+    ) -> Iterator[dict]:
+        """
+        :param first_response: уже загруженная первая страница.
+        """
         cursor = api_dict["cursor_name"]
         cursor_entity = cursor.replace(".cursor", "")
         use_params.setdefault("start", 0)
 
-        request = self._request(url, use_params)
-        for entity, value in request.items():
-            if entity != cursor:
-                tmp_result[entity] = {"data": value["data"], "columns": value["columns"]}
+        if first_response is None:
+            first_response = self._request(url, use_params)
+        first_page, offsets = self._start_with_cursor(first_response, cursor)
+        yield first_page
+        use_params["iss.only"] = ','.join([cursor_entity, cursor])
+        pages = (self._fetch_pages_parallel if parallel else self._fetch_pages)(url, use_params, offsets)
+        try:
+            for offset in offsets:
+                try:
+                    page = next(pages)
+                except requests.RequestException as error:
+                    raise self._partial_data_error(error, url, use_params, offset) from error
+                yield {cursor_entity: page[cursor_entity]}
+        finally:
+            pages.close()  # Остановка потребителя отменяет еще не загруженные страницы
 
-        if cursor_entity not in request:
-            return self._dataframe_create(tmp_result)
+    def _get_page_size(self, url: str, use_params: dict, api_id: str = None) -> Optional[int]:
+        """
+        Размер страницы эндпоинта без курсора: из PAGE_SIZE или подтвержденный прошлыми ответами того же url.
+        :return: None, если размер неизвестен.
+        """
+        api_id = api_id or self._used_api_id.get(None)
+        page_size = dictionaries.PAGE_SIZE.get(api_id) or self._page_sizes.get(self._get_endpoint_key(url))
+        limit = use_params.get("limit")
+        if limit is not None and page_size is not None:
+            return min(int(limit), page_size)
+        return page_size
 
-        cursor_idx = request[cursor]["columns"].index
-        index_id, total_id, page_size_id = cursor_idx("INDEX"), cursor_idx("TOTAL"), cursor_idx("PAGESIZE")
-        cursor_data = request[cursor]["data"][0]
-        use_params["iss.only"] = ','.join([cursor_entity, cursor])
-        page_size = cursor_idx("PAGESIZE")
-        cnt = 1
-        while cnt < dictionaries.MAX_REQ_PER_QUERY and cursor_data[total_id] > cursor_data[index_id] + page_size:
-            time.sleep(dictionaries.SLEEP_TIME)
-            use_params["start"] += page_size
-            request = self._request(url, use_params)
-            tmp_result[cursor_entity]["data"].extend(request[cursor_entity]["data"])
-            cursor_data = request[cursor]["data"][0]
-            cnt += 1
-        if cnt >= dictionaries.MAX_REQ_PER_QUERY:
-            warnings.warn(f"К API стучались {cnt} раз. Возвращены не все данные!!!")
-        return self._dataframe_create(tmp_result)
+    @staticmethod
+    def _start_without_cursor(response: dict, page_size: Optional[int] = None) -> Tuple[dict, set, int]:
+        """
+        Разбор первой страницы эндпоинта без курсора. Если размер страницы неизвестен, им считается
+        самый длинный блок первой страницы.
+        :param page_size: известный размер страницы.
+        :return: первая страница, блоки для дозапроса (заполнившие страницу целиком) и размер страницы.
+        """
+        page = {}
+        for entity, value in response.items():
+            page[entity] = {"data": value["data"], "columns": value["columns"]}
+        # Страница длиннее известного размера значит, что биржа его увеличила
+        page_size = max([page_size or 0] + [len(value["data"]) for value in response.values()])
+        requested_entity = {
+            entity for entity, value in response.items()
+            if entity.find(".") == -1 and len(value["data"]) != 0 and len(value["data"]) >= page_size
+        }
+        return page, requested_entity, page_size
 
-    def _request_without_cursor(self, url: str, use_params: dict) -> Union[dict, pd.DataFrame]:
-        # FIXME: Множество поинтов без курсора нужно изучать детально, так как возвращаемые сущности могут быть
-        # без пагинации. Запрос уходит в бесконечный цикл и возвращаются дубликаты.
-        # Костылем является проверка последней записи предыдущего запроса с последней записью текущего
-        tmp_result = {}
+    @staticmethod
+    def _next_without_cursor(
+            last_rows: dict, requested_entity: set, response: dict, page_size: int
+    ) -> Tuple[dict, bool]:
+        """
+        Отбирает новые данные очередной страницы. Блок заканчивается на пустой или короткой странице. Блок без
+        пагинации (страница повторяет предыдущую) отбрасывается: сравниваются только хэши последних строк
+        соседних страниц.
+        :param last_rows: хэши последних строк каждого блока с предыдущих страниц. Обновляется на месте.
+        :return: новые данные страницы и признак того, что состав запрашиваемых блоков (iss.only) изменился.
+        """
+        page = {}
+        is_change_iss_only = False
+        for entity, value in response.items():
+            if entity not in requested_entity:
+                continue
+            data = value["data"]
+            last_row = hash(tuple(data[-1])) if data else None
+            if last_row is None or last_row == last_rows.get(entity) or len(data) < page_size:
+                requested_entity.remove(entity)
+                is_change_iss_only = True
+            if last_row is not None and last_row != last_rows.get(entity):
+                page[entity] = {"data": data, "columns": value["columns"]}
+                last_rows[entity] = last_row
+        return page, is_change_iss_only
+
+    def _learn_page_size(self, url: str, page_size: int, requested_entity: set, response: dict) -> None:
+        """
+        Размер страницы, определенный по первой странице, запоминается для url эндпоинта, только если вторая
+        страница тоже заполнена целиком. Короткая первая страница (она же последняя) размер не задает: до
+        подтверждения используется PAGE_SIZE или размер первой страницы каждого запроса.
+        """
+        if page_size and any(
+                len(value["data"]) == page_size for entity, value in response.items() if entity in requested_entity
+        ):
+            self._page_sizes[self._get_endpoint_key(url)] = page_size
+
+    def _iter_without_cursor(self, url: str, use_params: dict) -> Iterator[dict]:
+        """
+        Страницы эндпоинта без курсора. Блок дозапрашивается, пока его страницы заполнены целиком: короткая
+        страница - последняя. Размер страницы берется из PAGE_SIZE, а неизвестный определяется по первой
+        странице, подтверждается второй полной страницей и запоминается для следующих запросов.
+        """
         use_params.setdefault("start", 0)
-        requested_entity = set()
-        max_cnt = 0
-        for entity, value in self._request(url, use_params).items():
-            tmp_result[entity] = {"data": value["data"], "columns": value["columns"]}
-            if max_cnt < len(value["data"]):
-                max_cnt = len(value["data"])
-            if entity.find(".") == -1 and len(value["data"]) != 0:
-                requested_entity.add(entity)
+        known_size = self._get_page_size(url, use_params)
+        first_page, requested_entity, page_size = self._start_without_cursor(
+            self._request(url, use_params), known_size
+        )
+        yield first_page
+        last_rows = {
+            entity: hash(tuple(first_page[entity]["data"][-1])) for entity in requested_entity
+        }
 
         use_params["iss.only"] = ','.join(requested_entity)
         cnt = 1
         while cnt < dictionaries.MAX_REQ_PER_QUERY:
             if len(requested_entity) == 0:
                 break
-            use_params["start"] += max_cnt
-            is_change_iss_only = False
-            time.sleep(dictionaries.SLEEP_TIME)
-
-            for entity, value in self._request(url, use_params).items():
-                if len(value["data"]) == 0 or value["data"][-1] == tmp_result[entity]["data"][-1]:  # FIXME: костыль!
-                    requested_entity.remove(entity)
-                    is_change_iss_only = True
-                else:
-                    tmp_result[entity]["data"].extend(value["data"])
-            cnt += 1
+            use_params["start"] += page_size
+
+            try:
+                response = self._request(url, use_params)
+            except requests.RequestException as error:
+                raise self._partial_data_error(error, url, use_params, use_params["start"]) from error
+            if cnt == 1 and known_size is None and "limit" not in use_params:
+                self._learn_page_size(url, page_size, requested_entity, response)
+            page, is_change_iss_only = self._next_without_cursor(last_rows, requested_entity, response, page_size)
+            if page:
+                yield page
             if is_change_iss_only:
                 use_params["iss.only"] = ','.join(requested_entity)
+            cnt += 1
         else:
             warnings.warn(f"К API стучались {cnt} раз. Возвращены не все данные!!!")
 
-        return self._dataframe_create(tmp_result)
+    @staticmethod
+    def _is_paginated(api_dict: dict) -> bool:
+        return bool(api_dict.get("has_cursor") and api_dict.get("params", {}).get("start"))
 
-    def _request_to_api(self, api_dict: dict, url: str, use_params: dict) -> Union[dict, pd.DataFrame]:
-        for param in list(use_params):  # For multivalue use comma separator
-            if isinstance(use_params[param], (list, set)):
-                use_params[param] = ','.join([str(request_value) for request_value in use_params[param]])
-        has_cursor = api_dict.get("has_cursor")
-        cursor_name = api_dict.get("cursor_name")
-        has_start_param = api_dict.get("params", {}).get("start")
-        if not has_cursor or not has_start_param:
-            return self._dataframe_create(self._request(url, use_params))
+    def _iter_pages(self, api_dict: dict, url: str, use_params: dict, parallel: bool = False) -> Iterator[dict]:
+        """
+        Страницы ответа по одной. Каждая страница - словарь блоков вида {"data": [...], "columns": [...]}.
+        """
+        if not self._is_paginated(api_dict):
+            yield self._request(url, use_params)
+        elif api_dict.get("cursor_name"):
+            yield from self._iter_with_cursor(url, api_dict, use_params, parallel)
+        else:
+            yield from self._iter_without_cursor(url, use_params)
+
+    def _request_to_api(
+            self, api_dict: dict, url: str, use_params: dict, parallel: bool = False, typed: bool = False
+    ) -> Union[dict, pd.DataFrame]:
+        schema = self._get_schema(url, use_params) if typed else None
+        if self.parse_pool is not None and (api_dict.get("cursor_name") or not self._is_paginated(api_dict)):
+            return self._request_to_api_pooled(api_dict, url, use_params, parallel, schema)
+        return self._dataframe_create(self._request_pages(api_dict, url, use_params, parallel), schema)
+
+    def _request_to_api_pooled(
+            self, api_dict: dict, url: str, use_params: dict, parallel: bool, schema: Optional[dict]
+    ) -> Union[dict, pd.DataFrame]:
+        """
+        Разбор json и сборка фреймов в процессах parse_pool: тело каждого ответа передается в пул один раз
+        и разбирается там целиком. Страницы курсора разбираются, пока загружаются следующие. Ответ меньше
+        PARSE_POOL_MIN_SIZE разбирается на месте: передача в процесс обошлась бы дороже.
+        """
+        cursor = api_dict.get("cursor_name")
+        if cursor:
+            use_params.setdefault("start", 0)
+        content = self._request_content(url, use_params)
+        if len(content) < dictionaries.PARSE_POOL_MIN_SIZE:
+            response = loads(content)
+            if not cursor:
+                return self._dataframe_create(response, schema)
+            pages = self._iter_with_cursor(url, api_dict, use_params, parallel, first_response=response)
+            return self._dataframe_create(self._request_pages(api_dict, url, use_params, parallel, pages), schema)
+
+        result = self.parse_pool.submit(parse_response, content, schema).result()
+        if not cursor:
+            return self._unwrap_frames(result)
+
+        cursor_entity = cursor.replace(".cursor", "")
+        cursor_frame = result.pop(cursor, None)
+        offsets = []
+        if cursor_frame is not None and not cursor_frame.empty and cursor_entity in result:
+            offsets = self._get_cursor_offsets(
+                {"columns": list(cursor_frame.columns), "data": cursor_frame.to_numpy().tolist()}
+            )
+        use_params["iss.only"] = ','.join([cursor_entity, cursor])
+        pages = (self._fetch_pages_parallel if parallel else self._fetch_pages)(url, use_params, offsets, raw=True)
+        contents, futures = [content], []
+        for offset in offsets:
+            try:
+                page = next(pages)
+            except requests.RequestException as error:
+                partial_error = self._partial_data_error(error, url, use_params, offset)
+                partial_error.partial_data, _ = self._start_with_cursor(loads(contents[0]), cursor)
+                for page_content in contents[1:]:
+                    self._merge_pages(partial_error.partial_data, {cursor_entity: loads(page_content)[cursor_entity]})
+                raise partial_error from error
+            contents.append(page)
+            futures.append(self.parse_pool.submit(parse_response, page, schema, [cursor_entity]))
+
+        frames = [frame for frame in [result.get(cursor_entity)] + [future.result().get(cursor_entity)
+                                                                    for future in futures] if frame is not None]
+        if frames:
+            result[cursor_entity] = (
+                concat_typed(frames, schema[cursor_entity]) if schema and cursor_entity in schema else
+                pd.concat(frames, ignore_index=True)
+            )
+        return self._unwrap_frames(result)
+
+    def _request_pages(
+            self, api_dict: dict, url: str, use_params: dict, parallel: bool = False, pages: Iterator[dict] = None
+    ) -> dict:
+        """
+        :param pages: страницы, если их загрузка уже начата. По умолчанию загружаются через _iter_pages.
+        """
+        tmp_result = {}
+        if pages is None:
+            pages = self._iter_pages(api_dict, url, use_params, parallel)
+        with self.instrumentation.span("pages", parallel=parallel) as span:
+            count = 0
+            try:
+                for page in pages:
+                    self._merge_pages(tmp_result, page)
+                    count += 1
+            except MoexPartialDataError as error:
+                error.partial_data = tmp_result
+                raise
+            finally:
+                span.set(pages=count)
+        return tmp_result
+
+    def resume(
+            self, error: MoexPartialDataError, parallel: bool = False, typed: bool = False
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """
+        Продолжить прерванную загрузку с того смещения start, на котором она упала.
+        :param error: исключение, которое вернул request;
+        :param parallel: загружать оставшиеся страницы параллельно;
+        :param typed: привести колонки к типам из метаданных ISS.
+        :return: Все данные: полученные до ошибки и догруженные.
+        """
+        api_dict = self._check_and_get_api_dict(error.api_id)
+        self._used_api_id.set(error.api_id)
+        tmp_result = error.partial_data
+        try:
+            rest = self._request_pages(api_dict, error.url, {**error.params, "start": error.start}, parallel)
+        except MoexPartialDataError as next_error:
+            next_error.partial_data = self._merge_pages(tmp_result, next_error.partial_data)
+            raise
+        schema = self._get_schema(error.url, error.params) if typed else None
+        return self._dataframe_create(self._merge_pages(tmp_result, rest), schema)
+
+    @staticmethod
+    def _merge_pages(tmp_result: dict, rest: dict) -> dict:
+        for entity, value in rest.items():
+            if entity in tmp_result:
+                tmp_result[entity]["data"].extend(value["data"])
+            else:
+                tmp_result[entity] = value
+        return tmp_result
+
+    @staticmethod
+    def _concat_results(results: List[Union[pd.DataFrame, Dict[str, pd.DataFrame]]]) -> Union[dict, pd.DataFrame]:
+        if isinstance(results[0], pd.DataFrame):
+            return pd.concat(results, ignore_index=True)
+        return {block: pd.concat([result[block] for result in results], ignore_index=True) for block in results[0]}
+
+    def request_bulk(
+            self,
+            api_id: Union[int, str],
+            securities: List[str],
+            param: str = "securities",
+            only_market_data: bool = False,
+            blocks: List[str] = None,
+            typed: bool = False,
+            **kwargs: Any,
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """
+        Запрос по произвольному числу инструментов. Список делится на порции по ограничению биржи (см. BULK_PARAMS),
+        порции запрашиваются параллельно в MAX_WORKERS потоков через общий ограничитель частоты rate_limiter,
+        результаты склеиваются.
+        :param api_id: id эндпоинта;
+        :param securities: список инструментов (или базовых активов для param="assets");
+        :param param: имя параметра эндпоинта, в который передается список;
+        :param only_market_data, blocks, typed, kwargs: как в request. Колонки COLUMNS_* применяются к каждой порции.
+        :return: Как в request: фрейм или словарь фреймов по блокам.
+        """
+        results = self._request_many(
+            api_id,
+            [{**kwargs, param: chunk} for chunk in self._get_bulk_chunks(securities, param)],
+            only_market_data=only_market_data,
+            blocks=blocks,
+            typed=typed,
+        )
+        return self._concat_results(results)
 
-        if cursor_name:
-            return self._request_with_cursor(url, api_dict, use_params)
-        return self._request_without_cursor(url, use_params)
+    @staticmethod
+    def _get_bulk_chunks(securities: List[str], param: str) -> List[List[str]]:
+        """
+        Список инструментов без дубликатов (порядок сохраняется), поделенный на порции по ограничению биржи.
+        """
+        chunk_size = dictionaries.BULK_PARAMS.get(param)
+        if chunk_size is None:
+            raise KeyError(
+                f"Параметр {param} не поддерживает пакетный запрос. Доступны: {sorted(dictionaries.BULK_PARAMS)}"
+            )
+        securities = list(dict.fromkeys(securities))
+        if not securities:
+            raise ValueError("Передан пустой список инструментов")
+        return [securities[idx:idx + chunk_size] for idx in range(0, len(securities), chunk_size)]
+
+    def _request_many(self, api_id: Union[int, str], calls_kwargs: List[dict], **request_params: Any) -> list:
+        """
+        Выполнить несколько запросов request к одному эндпоинту параллельно в MAX_WORKERS потоков.
+        Частоту обращений к сети ограничивает общий rate_limiter.
+        :param calls_kwargs: параметры API для каждого запроса;
+        :param request_params: общие параметры request (only_market_data, blocks, typed ...).
+        :return: Результаты в порядке calls_kwargs.
+        """
+        def fetch(kwargs: dict) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+            return self.request(api_id, **request_params, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, fetch, kwargs) for kwargs in calls_kwargs]
+            return [future.result() for future in futures]
+
+    def map_threads(
+            self, function: Callable[[Any], Any], keys: List[Any]
+    ) -> Tuple[Dict[Any, Any], Dict[Any, Exception]]:
+        """
+        Вызвать function для каждого ключа параллельно в MAX_WORKERS потоках с копией контекста (used_api_id).
+        :return: результаты и ошибки по ключам. Ошибка одного ключа не прерывает остальные.
+        """
+        results, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = {key: executor.submit(contextvars.copy_context().run, function, key) for key in keys}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as error:
+                    errors[key] = error
+        return results, errors
+
+    def _pop_date_range(
+            self, api_id: Union[int, str], api_dict: dict, kwargs: dict
+    ) -> Tuple[datetime.date, datetime.date]:
+        """
+        Интервал [from, till] для разбиения на окна. Параметры from и till забираются из kwargs.
+        """
+        api_params = api_dict.get("params", {})
+        if "from" not in api_params or "till" not in api_params:
+            raise KeyError(f"Эндпоинт {api_id} не принимает интервал дат from/till")
+        date_from = kwargs.pop("_from", None) or kwargs.pop("from", None)
+        date_till = kwargs.pop("till", None) or datetime.date.today()
+        if date_from is None:
+            raise ValueError("Для разбиения интервала дат укажите его начало в параметре _from")
+        return (
+            datetime.date.fromisoformat(self._check_date(date_from)),
+            datetime.date.fromisoformat(self._check_date(date_till)),
+        )
+
+    def _get_total_request(
+            self, api_id: Union[int, str], api_dict: dict, kwargs: dict, date_from: datetime.date,
+            date_till: datetime.date,
+    ) -> Tuple[str, dict]:
+        """
+        Запрос одного блока курсора за весь интервал: его TOTAL - число строк, которые придется загрузить.
+        """
+        _, url, use_params = self._prepare_request(
+            api_id, False, None, {**kwargs, "_from": date_from.isoformat(), "till": date_till.isoformat()}
+        )
+        use_params["iss.only"] = api_dict["cursor_name"]
+        return url, use_params
+
+    @staticmethod
+    def _get_cursor_total(response: dict, cursor: str) -> Optional[Tuple[int, int]]:
+        """
+        :return: TOTAL и PAGESIZE курсора или None, если курсора в ответе нет.
+        """
+        cursor_block = response.get(cursor)
+        if not cursor_block or not cursor_block["data"]:
+            return None
+        columns = cursor_block["columns"]
+        return tuple(cursor_block["data"][0][columns.index(name)] for name in ("TOTAL", "PAGESIZE"))
+
+    def _get_date_windows(
+            self, api_id: Union[int, str], api_dict: dict, kwargs: dict, date_from: datetime.date,
+            date_till: datetime.date, total: Optional[Tuple[int, int]] = None,
+    ) -> List[Tuple[str, str]]:
+        """
+        Делит интервал [date_from, date_till] на окна, в каждое из которых попадает около DATE_SPLIT_PAGES страниц.
+        Число строк в день берется из TOTAL курсора за весь интервал, для свечей - по interval, для остальных
+        эндпоинтов - из DATE_SPLIT_ROWS_PER_DAY.
+        :param total: TOTAL и PAGESIZE курсора за весь интервал (см. _get_total_request).
+        """
+        api_params = api_dict.get("params", {})
+        if total is not None and total[1]:
+            page_size = total[1]
+        else:
+            url = self._get_full_endpoint(self._get_plan(api_id), dict(kwargs))
+            page_size = self._get_page_size(url, {}, str(api_id)) or dictionaries.DEFAULT_PAGE_SIZE
+        if total is not None:
+            rows_per_day = max(total[0], 1) / ((date_till - date_from).days + 1)
+        elif "interval" in api_params:
+            interval = int(kwargs.get("interval", api_params["interval"]["default"]))
+            rows_per_day = dictionaries.ROWS_PER_DAY.get(interval, 1)
+        else:
+            rows_per_day = dictionaries.DATE_SPLIT_ROWS_PER_DAY.get(str(api_id), 1)
+        window = datetime.timedelta(days=max(1, int(page_size * dictionaries.DATE_SPLIT_PAGES / rows_per_day)))
+
+        windows = []
+        while date_from <= date_till:
+            window_till = min(date_from + window - datetime.timedelta(days=1), date_till)
+            windows.append((date_from.isoformat(), window_till.isoformat()))
+            date_from = window_till + datetime.timedelta(days=1)
+        return windows
+
+    @staticmethod
+    def _drop_date_duplicates(frame: pd.DataFrame) -> pd.DataFrame:
+        time_key = next((column for column in dictionaries.DATE_SPLIT_TIME_KEYS if column in frame.columns), None)
+        if time_key is None:  # Служебные блоки (.dates, .cursor) повторяются в каждом окне
+            return frame.drop_duplicates(ignore_index=True)
+        keys = [time_key] + [column for column in dictionaries.DATE_SPLIT_ID_KEYS if column in frame.columns]
+        frame = frame.drop_duplicates(subset=keys)
+        return frame.sort_values(time_key, kind="stable", ignore_index=True)
+
+    def _request_split_dates(
+            self, api_id: Union[int, str], kwargs: dict, **request_params: Any
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        api_dict = self._check_and_get_api_dict(api_id)
+        date_from, date_till = self._pop_date_range(api_id, api_dict, kwargs)
+        total = None
+        if api_dict.get("cursor_name"):
+            url, use_params = self._get_total_request(api_id, api_dict, kwargs, date_from, date_till)
+            total = self._get_cursor_total(self._request(url, use_params), api_dict["cursor_name"])
+        windows = self._get_date_windows(api_id, api_dict, kwargs, date_from, date_till, total)
+        results = self._request_many(
+            api_id, [{**kwargs, "_from": date_from, "till": date_till} for date_from, date_till in windows],
+            **request_params,
+        )
+        return self._merge_date_windows(results)
+
+    @classmethod
+    def _merge_date_windows(
+            cls, results: List[Union[pd.DataFrame, Dict[str, pd.DataFrame]]]
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        result = cls._concat_results(results)
+        if isinstance(result, pd.DataFrame):
+            return cls._drop_date_duplicates(result)
+        return {block: cls._drop_date_duplicates(frame) for block, frame in result.items()}
+
+    def request_iter(
+            self,
+            api_id: Union[int, str],
+            only_market_data: bool = False,
+            blocks: List[str] = None,
+            parallel: bool = False,
+            chunk_size: int = None,
+            arrow: bool = False,
+            typed: bool = False,
+            **kwargs: Any,
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Потоковый аналог request: данные отдаются по мере загрузки и не накапливаются в памяти.
+        Параметры api_id, only_market_data, blocks, parallel и kwargs те же, что и у request.
+        :param chunk_size: отдавать строки блока порциями ровно по chunk_size (последняя порция может быть меньше).
+        По умолчанию отдается каждая загруженная страница;
+        :param arrow: отдавать pyarrow.RecordBatch вместо фрейма (требуется pyarrow);
+        :param typed: привести колонки к типам из метаданных ISS.
+        :return: Итератор пар (имя блока, фрейм данных).
+        """
+        if arrow:
+            import pyarrow
+
+        def create(entity: str, rows: list, columns: list):
+            frame = self._dataframe_create({entity: {"data": rows, "columns": columns}}, schema)
+            return pyarrow.RecordBatch.from_pandas(frame, preserve_index=False) if arrow else frame
+
+        api_dict, url, use_params = self._prepare_request(api_id, only_market_data, blocks, kwargs)
+        schema = self._get_schema(url, use_params) if typed else None
+        buffers = {}
+        for page in self._iter_pages(api_dict, url, use_params, parallel):
+            for entity, value in page.items():
+                if not chunk_size:
+                    if value["data"]:
+                        yield entity, create(entity, value["data"], value["columns"])
+                    continue
+                buffer = buffers.setdefault(entity, {"data": [], "columns": value["columns"]})
+                buffer["data"].extend(value["data"])
+                while len(buffer["data"]) >= chunk_size:
+                    yield entity, create(entity, buffer["data"][:chunk_size], buffer["columns"])
+                    del buffer["data"][:chunk_size]
+        for entity, buffer in buffers.items():
+            if buffer["data"]:
+                yield entity, create(entity, buffer["data"], buffer["columns"])
+
+    def column_types(self, api_id: Union[int, str], **kwargs: Any) -> Dict[str, Dict[str, str]]:
+        """
+        Типы колонок эндпоинта из метаданных ISS (как для typed) без загрузки данных.
+        :param kwargs: глобальные сущности и параметры эндпоинта, как в request;
+        :return: {блок: {колонка: тип ISS}}.
+        """
+        _, url, use_params = self._prepare_request(api_id, False, None, kwargs)
+        return self._get_schema(url, use_params)
 
     def request(
             self,
             api_id: Union[int, str],
             only_market_data: bool = False,
             blocks: List[str] = None,
+            parallel: bool = False,
+            typed: bool = False,
+            split_dates: bool = False,
             **kwargs: Any,
     ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
         """
@@ -346,6 +1064,13 @@ class MoexApi(MoexParamCheckerMixin):
         :param only_market_data: включать или нет непосредственно рыночные данные. По умолчанию не указываем;
         :param blocks: ответ может содержать несколько блоков данных и этот параметр позволяет выбрать только нужные.
         См. список возвращаемых данных в справочнике эндпоинтов.
+        :param parallel: для эндпоинтов с курсором загружать страницы параллельно. Число потоков задается в
+        MAX_WORKERS, частоту запросов ограничивает общий rate_limiter;
+        :param typed: привести колонки к типам из метаданных ISS (числа, даты, время, category для повторяющихся
+        строк). Метаданные запрашиваются один раз на эндпоинт;
+        :param split_dates: для эндпоинтов с параметрами from/till разбить интервал на окна по размеру страницы
+        и interval, загрузить окна параллельно и склеить без дубликатов по ключу времени. Начало интервала _from
+        обязательно, till по умолчанию - сегодня;
         :param kwargs:
         1. Обязательно указываем значения всех требуемых глобальных сущностей;
         2. Указываем значения параметров;
@@ -360,17 +1085,48 @@ class MoexApi(MoexParamCheckerMixin):
         :return: Если запрашивается только одна сущность то вернется фрейм данных. Если много, то в словаре, где
         ключом является имя сущности.
         """
-        api_dict = self._check_and_get_api_dict(api_id)
-        self._used_api_id.set(str(api_id))
-        url = self._get_full_endpoint(api_dict, kwargs)
-        use_params = self._get_param_for_endpoint(api_dict, kwargs)
+        with self.instrumentation.span("request", str(api_id), parallel=parallel, typed=typed):
+            if split_dates:
+                return self._request_split_dates(
+                    api_id, kwargs, only_market_data=only_market_data, blocks=blocks, parallel=parallel, typed=typed
+                )
+            with self.instrumentation.span("prepare", str(api_id)):
+                api_dict, url, use_params = self._prepare_request(api_id, only_market_data, blocks, kwargs)
+            # Одинаковые одновременные запросы из разных потоков выполняются один раз
+            return self._single_flight.do(
+                self._get_flight_key(url, use_params, typed),
+                partial(self._request_to_api, api_dict, url, use_params, parallel, typed),
+                self._copy_result,
+            )
 
-        if blocks or kwargs:
-            data_entities = set(api_dict.get("return_data", []))
-            if kwargs:
-                use_params.update(self._get_use_columns(data_entities, kwargs))
-            if blocks:
-                use_params.update(self._get_block_params(data_entities, blocks))
+    @staticmethod
+    def _get_flight_key(url: str, use_params: dict, typed: bool) -> tuple:
+        return url, tuple(sorted(use_params.items())), typed
+
+    @staticmethod
+    def _copy_result(
+            result: Union[pd.DataFrame, Dict[str, pd.DataFrame]]
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        if isinstance(result, pd.DataFrame):
+            return result.copy()
+        return {block: frame.copy() for block, frame in result.items()}
+
+    def _prepare_request(
+            self, api_id: Union[int, str], only_market_data: bool, blocks: List[str], kwargs: dict
+    ) -> Tuple[dict, str, dict]:
+        """
+        Валидация запроса без обращения к сети.
+        :return: описание эндпоинта, url и параметры GET запроса.
+        """
+        plan = self._get_plan(api_id)
+        self._used_api_id.set(plan.api_id)
+        url = self._get_full_endpoint(plan, kwargs)
+        use_params = self._get_param_for_endpoint(plan, kwargs)
+
+        if kwargs:
+            use_params.update(self._get_use_columns(plan.blocks, kwargs))
+        if blocks:
+            use_params.update(self._get_block_params(plan.blocks, blocks, plan.cursor_name))
 
         if kwargs:
             raise KeyError(f"Переданы неопределенные для API параметры: {kwargs}")
@@ -378,4 +1134,7 @@ class MoexApi(MoexParamCheckerMixin):
         if only_market_data:
             use_params["iss.data"] = "on"
         use_params.update(dictionaries.DEFAULT_GET_PARAMS)
-        return self._request_to_api(api_dict, url, use_params)
+        for param in list(use_params):  # For multivalue use comma separator
+            if isinstance(use_params[param], (list, set)):
+                use_params[param] = ','.join([str(request_value) for request_value in use_params[param]])
+        return plan.api_dict, url, use_params
@@ -0,0 +1,309 @@
+import sys
+import warnings
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+
+def _normalize(values: Iterable[Any]) -> np.ndarray:
+    """
+    Ключ индекса: строка в верхнем регистре без пробелов по краям. Целые числа, прочитанные как float
+    (emitent_id в колонке с пропусками), - без дробной части. Пустые значения - None.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values))
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype("Int64")
+    return series.astype("string").str.strip().str.upper().to_numpy(dtype=object, na_value=None)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    """
+    Уникальные значения по возрастанию. np.unique для целых строит хеш-таблицу, что на десятках миллионов
+    значений в разы медленнее сортировки.
+    """
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+
+def _pack_trigrams(codes: np.ndarray, bits: int) -> np.ndarray:
+    """
+    Три соседних номера символов по bits бит в одном int64.
+    """
+    return (codes[:-2] << 2 * bits) | (codes[1:-1] << bits) | codes[2:]
+
+
+class _Column:
+    """
+    Колонка справочника: коды (int32) и уникальные значения. Строки интернируются, поэтому повторяющиеся
+    значения (type, group, primary_boardid, emitent_title) хранятся один раз.
+    """
+
+    def __init__(self, values: pd.Series):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        self.codes = codes.astype(np.int32)
+        uniques = np.asarray(uniques, dtype=object)
+        self.uniques = np.array(
+            [sys.intern(value) if isinstance(value, str) else value for value in uniques] + [None], dtype=object
+        )  # Последний элемент - пустое значение для кода -1
+
+    def __getitem__(self, rows: Any) -> np.ndarray:
+        return self.uniques[self.codes[rows]]
+
+
+class _HashIndex:
+    """
+    Индекс значение -> строки. Строки одного значения лежат подряд в order: сначала торгуемые инструменты,
+    затем остальные, каждые - в порядке загрузки.
+    """
+
+    def __init__(self, keys: np.ndarray, is_traded: np.ndarray):
+        codes, uniques = pd.factorize(pd.Series(keys, dtype=object), use_na_sentinel=True)
+        self.keys = pd.Index(uniques)
+        present = codes >= 0
+        rows = np.flatnonzero(present)
+        self.order = rows[np.lexsort((rows, ~is_traded[present], codes[present]))]
+        self.starts = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[present], minlength=len(uniques)), out=self.starts[1:])
+
+    def first(self, values: Iterable[Any]) -> np.ndarray:
+        """
+        :return: первая строка каждого значения, -1 - если значение не найдено.
+        """
+        idx = self.keys.get_indexer(_normalize(values))
+        return np.where(idx >= 0, self.order[self.starts[np.maximum(idx, 0)]], -1) if len(self.order) else \
+            np.full(len(idx), -1)
+
+    def rows(self, value: Any) -> np.ndarray:
+        idx = self.keys.get_indexer(_normalize([value]))[0]
+        return self.order[self.starts[idx]:self.starts[idx + 1]] if idx >= 0 else np.zeros(0, dtype=np.int64)
+
+
+class SecuritiesMaster:
+    """
+    Локальный справочник инструментов по эндпоинту 5 (/securities) и спискам инструментов рынков (33).
+    Колонки хранятся массивами кодов с интернированными строками, по MASTER_KEYS строятся хеш-индексы,
+    по MASTER_SEARCH_COLUMNS - триграммный индекс нечеткого поиска, по MASTER_PREFIX_COLUMNS - поиск по началу.
+    Поиск, сопоставление ISIN -> SECID и проверка инструментов идут без обращения к сети.
+    Справочник, присвоенный MoexApi.securities_master, используется для проверки параметра пути security.
+
+    Пример:
+        master = SecuritiesMaster.crawl(markets=[("stock", "shares"), ("stock", "bonds")], is_trading=1)
+        master.save("securities.parquet")
+        master.lookup(isins, by="isin")[["isin", "secid", "primary_boardid"]]
+        master.search("сбер")
+        MoexApi.securities_master = master
+    """
+
+    API_ID = "5"
+    BOARDS_API_ID = "33"
+
+    def __init__(self, frame: pd.DataFrame, boards: pd.DataFrame = None):
+        """
+        :param frame: инструменты (колонки эндпоинта 5 в нижнем регистре, как минимум secid);
+        :param boards: пары (secid, boardid) режимов торгов инструментов.
+        """
+        frame = frame.rename(columns=str.lower).drop_duplicates("secid", keep="first").reset_index(drop=True)
+        self.columns = [column for column in dictionaries.MASTER_COLUMNS if column in frame.columns]
+        self._columns = {column: _Column(frame[column]) for column in self.columns}
+        if "is_traded" in frame.columns:
+            self._is_traded = pd.to_numeric(frame["is_traded"], errors="coerce").fillna(0).to_numpy(dtype=bool)
+        else:
+            self._is_traded = np.ones(len(frame), dtype=bool)
+        self._indexes = {
+            column: _HashIndex(_normalize(frame[column]), self._is_traded)
+            for column in dictionaries.MASTER_KEYS if column in frame.columns
+        }
+        self._boards = boards if boards is not None else pd.DataFrame(columns=["secid", "boardid"])
+        self._board_index = _HashIndex(_normalize(self._boards["secid"]), np.ones(len(self._boards), dtype=bool))
+        self._trigrams: Optional[Tuple[np.ndarray, np.ndarray]] = None  # Строится при первом поиске
+        self._prefixes: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._alphabet: Optional[np.ndarray] = None  # Символы текста поиска по возрастанию
+        self._char_bits = 0
+
+    @classmethod
+    def crawl(
+            cls, api: MoexApi = None, markets: Iterable[Tuple[str, str]] = (), **kwargs: Any
+    ) -> "SecuritiesMaster":
+        """
+        Загрузить справочник целиком.
+        :param markets: (engine, market), списки инструментов которых (эндпоинт 33) дают режимы торгов
+        и дополняют справочник инструментами, которых нет в ответе эндпоинта 5;
+        :param kwargs: параметры эндпоинта 5: engine, market, is_trading ...
+        """
+        api = api or MoexApi()
+        frame = cls._crawl_securities(api, kwargs)
+        boards = []
+        for engine, market in markets:
+            securities = api.request(cls.BOARDS_API_ID, blocks=["securities"], engine=engine, market=market)
+            securities = securities.rename(columns=str.lower)
+            boards.append(securities[["secid", "boardid"]])
+            missing = securities[~securities["secid"].isin(frame["secid"])].drop_duplicates("secid")
+            frame = pd.concat([frame, missing[["secid", "shortname"]].assign(
+                name=missing["secname"] if "secname" in missing.columns else None, primary_boardid=missing["boardid"]
+            )], ignore_index=True)
+        boards = pd.concat(boards, ignore_index=True).drop_duplicates() if boards else None
+        return cls(frame, boards)
+
+    @classmethod
+    def _crawl_securities(cls, api: MoexApi, kwargs: dict) -> pd.DataFrame:
+        """
+        Эндпоинт 5 целиком. Один запрос request останавливается на MAX_REQ_PER_QUERY страницах, поэтому список
+        загружается окнами: следующее окно начинается со смещения start, на котором остановилось предыдущее.
+        Окно короче MAX_REQ_PER_QUERY полных страниц - последнее.
+        """
+        capacity = dictionaries.MAX_REQ_PER_QUERY * (
+            dictionaries.PAGE_SIZE.get(cls.API_ID) or dictionaries.DEFAULT_PAGE_SIZE
+        )
+        frames, start = [], int(kwargs.pop("start", 0))
+        seen = pd.Index([])
+        while True:
+            with warnings.catch_warnings():  # Остановка окна на лимите запросов ожидаема
+                warnings.filterwarnings("ignore", message=".*Возвращены не все данные")
+                window = api.request(cls.API_ID, start=start, **kwargs)
+            if len(window) < capacity:
+                frames.append(window)
+                break
+            secids = pd.Index(window["secid"])
+            if secids.isin(seen).all():
+                raise RuntimeError(
+                    f"Справочник загружен не полностью: окно эндпоинта {cls.API_ID} со start={start} "
+                    f"повторяет уже загруженные инструменты"
+                )
+            frames.append(window)
+            seen = seen.append(secids)
+            start += len(window)
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    @classmethod
+    def load(cls, path: str) -> "SecuritiesMaster":
+        """
+        Прочитать справочник, сохраненный save.
+        """
+        frame = pd.read_parquet(path)
+        boards = frame.attrs.get("boards")
+        return cls(frame, pd.DataFrame(boards, columns=["secid", "boardid"]) if boards else None)
+
+    def save(self, path: str) -> None:
+        """
+        Сохранить справочник в parquet (требуется pyarrow).
+        """
+        frame = self.to_frame()
+        frame.attrs["boards"] = self._boards[["secid", "boardid"]].to_numpy().tolist()
+        frame.to_parquet(path, index=False)
+
+    def __len__(self) -> int:
+        return len(self._is_traded)
+
+    def __contains__(self, security: Any) -> bool:
+        return bool(self._indexes["secid"].first([security])[0] >= 0)
+
+    def to_frame(self, rows: Any = slice(None)) -> pd.DataFrame:
+        return pd.DataFrame({column: self._columns[column][rows] for column in self.columns})
+
+    def lookup(self, values: Iterable[Any], by: str = "isin") -> pd.DataFrame:
+        """
+        Сопоставить значения ключа инструментам: по строке на значение, в порядке values. Если значению
+        соответствует несколько инструментов (у ISIN - бумага и ее дубли на разных рынках), берется торгуемый.
+        :param by: колонка из MASTER_KEYS;
+        :return: строки справочника и колонка key. Для ненайденных значений - пустые строки.
+        """
+        if by not in self._indexes:
+            raise KeyError(f"Нет индекса по колонке {by}. Доступны: {list(self._indexes)}")
+        values = list(values)
+        rows = self._indexes[by].first(values)
+        if not len(self):  # В пустом справочнике нет строки, которую можно взять за образец
+            frame = pd.DataFrame(None, index=range(len(values)), columns=self.columns)
+        else:
+            frame = self.to_frame(np.maximum(rows, 0))
+            frame.loc[rows < 0] = None
+        frame.insert(0, "key", values)
+        return frame
+
+    def find(self, value: Any, by: str = "emitent_id") -> pd.DataFrame:
+        """
+        Все инструменты с заданным значением ключа, например все бумаги эмитента.
+        """
+        return self.to_frame(self._indexes[by].rows(value))
+
+    def boards(self, security: str) -> List[str]:
+        """
+        :return: режимы торгов инструмента из списков рынков (markets в crawl).
+        """
+        return self._boards["boardid"].to_numpy()[self._board_index.rows(security)].tolist()
+
+    def _get_strings(self, column: str) -> pd.Series:
+        """
+        Значения колонки в нижнем регистре, пустые - "".
+        """
+        return pd.Series(self._columns[column][slice(None)], dtype=object).fillna("").astype(str).str.lower()
+
+    def _build_search(self) -> None:
+        """
+        Триграммы всех строк строятся одним массивом: тексты склеиваются через "\0", символы заменяются
+        номерами в алфавите справочника, а триграмма и номер строки упаковываются в одно int64. Сортировка
+        этих чисел дает триграммы по возрастанию со строками каждой подряд и убирает повторы в строке.
+        """
+        columns = [column for column in dictionaries.MASTER_SEARCH_COLUMNS if column in self._columns]
+        texts = pd.Series(" ", index=range(len(self)), dtype=object)
+        for column in columns:
+            texts += self._get_strings(column) + " "
+        chars = np.frombuffer("\0".join(texts).encode("utf-32-le"), dtype=np.uint32)
+        self._alphabet = _sorted_unique(np.append(chars, np.uint32(0)))  # Номер 0 - разделитель строк
+        self._char_bits = max(len(self._alphabet) - 1, 1).bit_length()
+        row_bits = max(len(self), 1).bit_length()
+        if 3 * self._char_bits + row_bits > 63:
+            raise ValueError(f"Слишком много различных символов для триграммного индекса: {len(self._alphabet)}")
+        codes = np.searchsorted(self._alphabet, chars).astype(np.int64)
+        char_rows = np.repeat(np.arange(len(self), dtype=np.int64), texts.str.len().to_numpy() + 1)[:len(codes)]
+        valid = (codes[:-2] != 0) & (codes[1:-1] != 0) & (codes[2:] != 0)  # Триграммы внутри одной строки
+        keys = _sorted_unique((_pack_trigrams(codes, self._char_bits)[valid] << row_bits) | char_rows[:-2][valid])
+        self._trigrams = (keys >> row_bits, keys & ((1 << row_bits) - 1))
+
+        keys, rows = [], []
+        for column in dictionaries.MASTER_PREFIX_COLUMNS:
+            if column in self._columns:
+                values = self._get_strings(column).to_numpy(dtype=str)
+                present = values != ""
+                keys.append(values[present])
+                rows.append(np.flatnonzero(present))
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=str)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self._prefixes = (keys[order], rows[order])
+
+    def search(self, query: str, limit: int = dictionaries.MASTER_SEARCH_LIMIT) -> pd.DataFrame:
+        """
+        Нечеткий поиск по тикеру, названию и ISIN: вместо request(5, q=...). Выше в выдаче точное совпадение
+        тикера, затем совпадение начала тикера или краткого названия, затем доля общих триграмм с запросом.
+        :return: до limit инструментов с колонкой score.
+        """
+        if self._trigrams is None:
+            self._build_search()
+        query = " ".join(query.lower().split())
+        scores = np.zeros(len(self), dtype=np.float64)
+        chars = np.frombuffer(f" {query} ".encode("utf-32-le"), dtype=np.uint32)
+        codes = np.minimum(np.searchsorted(self._alphabet, chars), len(self._alphabet) - 1)
+        known = self._alphabet[codes] == chars  # Триграммы с символами вне алфавита не встречаются в справочнике
+        grams = _pack_trigrams(codes.astype(np.int64), self._char_bits)
+        total = len(np.unique(grams))
+        grams = np.unique(grams[known[:-2] & known[1:-1] & known[2:]])
+        all_grams, all_rows = self._trigrams
+        starts, stops = np.searchsorted(all_grams, grams), np.searchsorted(all_grams, grams, side="right")
+        postings = [all_rows[start:stop] for start, stop in zip(starts, stops)]
+        if postings:
+            scores += np.bincount(np.concatenate(postings), minlength=len(self)) / total
+        keys, rows = self._prefixes
+        start, stop = np.searchsorted(keys, [query, query + "\uffff"])
+        scores[rows[start:stop]] += 1
+        exact = self._indexes["secid"].first([query])[0] if "secid" in self._indexes else -1
+        if exact >= 0:
+            scores[exact] += 2
+        found = np.flatnonzero(scores)
+        found = found[np.lexsort((found, ~self._is_traded[found], -scores[found]))][:limit]
+        return self.to_frame(found).assign(score=scores[found])
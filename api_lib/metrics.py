@@ -0,0 +1,331 @@
+import bisect
+import json
+import os
+import threading
+import time
+import warnings
+from collections import defaultdict, deque, namedtuple
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.mixins import used_api_id
+
+# Событие этапа запроса. start - время начала (unix, нс), duration - длительность в секундах,
+# values - счетчики этапа: bytes, pages, rows, status, attempt и т.п.
+MetricEvent = namedtuple("MetricEvent", "stage api_id start duration trace_id span_id parent_id values")
+Hook = Callable[[MetricEvent], Any]
+
+_current_span: ContextVar[Optional[Tuple[str, str]]] = ContextVar("current_span", default=None)  # trace_id, span_id
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+class _NullSpan:
+    """
+    Замер без подписчиков: ничего не считает, чтобы не замедлять запросы.
+    """
+
+    __slots__ = ()
+
+    def set(self, **values: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    Замер одного этапа. Вложенные замеры (в том числе в потоках с копией контекста) становятся дочерними.
+    """
+
+    __slots__ = ("_instrumentation", "stage", "api_id", "values", "trace_id", "span_id", "parent_id",
+                 "_start", "_started", "_token")
+
+    def __init__(self, instrumentation: "Instrumentation", stage: str, api_id: Optional[str], values: dict):
+        self._instrumentation = instrumentation
+        self.stage = stage
+        self.api_id = api_id
+        self.values = values
+
+    def set(self, **values: Any) -> None:
+        self.values.update(values)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.trace_id = parent[0] if parent is not None else _new_id(16)
+        self.parent_id = parent[1] if parent is not None else None
+        self.span_id = _new_id(8)
+        self._token = _current_span.set((self.trace_id, self.span_id))
+        self._start = time.time_ns()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Optional[type], *exc_info: Any) -> bool:
+        duration = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.values["error"] = exc_type.__name__
+        self._instrumentation.emit(MetricEvent(
+            self.stage, self.api_id or used_api_id.get(None), self._start, duration,
+            self.trace_id, self.span_id, self.parent_id, self.values,
+        ))
+        return False
+
+
+class Instrumentation:
+    """
+    Точка подписки на этапы запроса MoexApi: prepare, http, cache_hit, retry, decode, pages, frames, request.
+    Подписчик (hook) - любой вызываемый объект, принимающий MetricEvent. Без подписчиков замеры не ведутся.
+
+    Пример:
+        collector = MoexApi.instrumentation.add_hook(MetricsCollector())
+        MOEX.request(63, engine="stock", market="shares", security="GAZP")
+        collector.to_frame()
+    """
+
+    def __init__(self):
+        self._hooks: List[Hook] = []
+
+    def add_hook(self, hook: Hook) -> Hook:
+        self._hooks = self._hooks + [hook]  # Копия списка: emit из других потоков не увидит его изменения
+        return hook
+
+    def remove_hook(self, hook: Hook) -> None:
+        self._hooks = [item for item in self._hooks if item is not hook]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._hooks)
+
+    def span(self, stage: str, api_id: Optional[str] = None, **values: Any) -> Any:
+        """
+        Замер этапа: with instrumentation.span("http") as span: ... span.set(bytes=...).
+        :param api_id: по умолчанию - эндпоинт текущего запроса.
+        """
+        if not self._hooks:
+            return _NULL_SPAN
+        return Span(self, stage, api_id, values)
+
+    def event(self, stage: str, duration: float = 0, api_id: Optional[str] = None, **values: Any) -> None:
+        """
+        Событие без замера времени: попадание в кэш, повтор запроса.
+        """
+        if not self._hooks:
+            return
+        parent = _current_span.get()
+        self.emit(MetricEvent(
+            stage, api_id or used_api_id.get(None), time.time_ns(), duration,
+            parent[0] if parent is not None else _new_id(16), _new_id(8),
+            parent[1] if parent is not None else None, values,
+        ))
+
+    def emit(self, event: MetricEvent) -> None:
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as error:  # Ошибка подписчика не должна ломать запрос
+                warnings.warn(f"Подписчик {hook!r} упал на событии {event.stage}: {error}")
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Последняя корзина - +Inf
+        self.count = 0
+        self.sum = 0.
+        self.max = 0.
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, share: float) -> float:
+        """
+        Оценка квантиля по корзинам с линейной интерполяцией внутри корзины, как histogram_quantile в Prometheus.
+        """
+        if not self.count:
+            return float("nan")
+        rank = share * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[idx - 1] if idx > 0 else 0.
+                upper = self.bounds[idx] if idx < len(self.bounds) else self.max
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class MetricsCollector:
+    """
+    Подписчик, собирающий в памяти гистограммы длительностей по этапам и api_id и суммы счетчиков
+    (байты, страницы, строки). Результат - таблица to_frame() или текст в формате Prometheus.
+    """
+
+    _COUNTERS = ("bytes", "pages", "rows")
+
+    def __init__(self, buckets: Tuple[float, ...] = dictionaries.METRICS_BUCKETS):
+        """
+        :param buckets: верхние границы корзин гистограмм в секундах.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], _Histogram] = {}
+        self._totals: Dict[Tuple[str, str, str], float] = defaultdict(float)
+
+    def __call__(self, event: MetricEvent) -> None:
+        key = (event.stage, event.api_id or "")
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(event.duration)
+            for counter in self._COUNTERS:
+                value = event.values.get(counter)
+                if value is not None:
+                    self._totals[(counter,) + key] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._totals.clear()
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Сводка по этапам и эндпоинтам, самые затратные по суммарному времени - первыми.
+        """
+        with self._lock:
+            rows = [
+                {
+                    "stage": stage, "api_id": api_id, "count": histogram.count, "total_s": histogram.sum,
+                    "mean_ms": histogram.sum / histogram.count * 1000, "p50_ms": histogram.quantile(.5) * 1000,
+                    "p95_ms": histogram.quantile(.95) * 1000, "max_ms": histogram.max * 1000,
+                    **{counter: self._totals.get((counter, stage, api_id), 0) for counter in self._COUNTERS},
+                }
+                for (stage, api_id), histogram in self._histograms.items()
+            ]
+        columns = ["stage", "api_id", "count", "total_s", "mean_ms", "p50_ms", "p95_ms", "max_ms", *self._COUNTERS]
+        return pd.DataFrame(rows, columns=columns).sort_values("total_s", ascending=False, ignore_index=True)
+
+    @staticmethod
+    def _labels(**labels: str) -> str:
+        return ",".join(
+            '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for name, value in labels.items()
+        )
+
+    def to_prometheus(self, prefix: str = dictionaries.METRICS_PREFIX) -> str:
+        """
+        Метрики в текстовом формате Prometheus: гистограмма <prefix>_stage_duration_seconds и счетчики
+        <prefix>_<bytes|pages|rows>_total с метками stage и api_id.
+        """
+        name = f"{prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Длительность этапов запроса MoexApi.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for (stage, api_id), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{{{self._labels(stage=stage, api_id=api_id, le=le)}}} {cumulative}")
+                labels = self._labels(stage=stage, api_id=api_id)
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+            for counter in self._COUNTERS:
+                totals = sorted((key[1:], value) for key, value in self._totals.items() if key[0] == counter)
+                if not totals:
+                    continue
+                counter_name = f"{prefix}_{counter}_total"
+                lines += [f"# HELP {counter_name} Сумма {counter} по этапам запроса MoexApi.",
+                          f"# TYPE {counter_name} counter"]
+                lines += [f"{counter_name}{{{self._labels(stage=stage, api_id=api_id)}}} {value:g}"
+                          for (stage, api_id), value in totals]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = dictionaries.METRICS_PREFIX) -> None:
+        """
+        Запись для textfile collector node_exporter. Файл заменяется атомарно, чтобы не прочитать его наполовину.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.to_prometheus(prefix))
+        os.replace(tmp_path, path)
+
+
+class SpanExporter:
+    """
+    Подписчик, превращающий события в спаны в формате OTLP JSON (OpenTelemetry). Спаны копятся в памяти
+    (не больше max_spans последних) и выгружаются методом export, например для файлового приемника
+    OpenTelemetry Collector.
+    """
+
+    def __init__(self, service_name: str = "api_lib", max_spans: int = dictionaries.METRICS_MAX_SPANS):
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._spans: Deque[dict] = deque(maxlen=max_spans)
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> dict:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def __call__(self, event: MetricEvent) -> None:
+        values = {"moex.api_id": event.api_id, **{f"moex.{key}": value for key, value in event.values.items()}}
+        span = {
+            "traceId": event.trace_id,
+            "spanId": event.span_id,
+            "name": event.stage,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(event.start),
+            "endTimeUnixNano": str(event.start + int(event.duration * 1e9)),
+            "attributes": [self._attribute(key, value) for key, value in values.items() if value is not None],
+            "status": {"code": 2, "message": event.values["error"]} if "error" in event.values else {"code": 1},
+        }
+        if event.parent_id is not None:
+            span["parentSpanId"] = event.parent_id
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[dict]:
+        with self._lock:
+            return list(self._spans)
+
+    def export(self, path: Optional[str] = None) -> dict:
+        """
+        Забрать накопленные спаны.
+        :param path: дописать их строкой JSON в этот файл.
+        :return: запрос ExportTraceServiceRequest в формате OTLP JSON.
+        """
+        with self._lock:
+            spans = list(self._spans)
+            self._spans.clear()
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "api_lib"}, "spans": spans}],
+        }]}
+        if path is not None:
+            with open(path, "a", encoding="utf-8") as spans_file:
+                spans_file.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return request
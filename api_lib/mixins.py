@@ -3,13 +3,26 @@ import warnings
 
 from abc import abstractmethod
 from contextvars import ContextVar
+from functools import lru_cache
 from typing import Any, Union, List
 
-from api_lib.dictionaries import OPTION_SERIES_TYPE, SECTYPE
+from api_lib.dictionaries import MAX_ASSETS, MAX_SECURITIES, OPTION_SERIES_TYPE, SECTYPE
 
 used_api_id: ContextVar[str] = ContextVar("used_api_id")  # for futures objects
 
 
+@lru_cache(maxsize=4096)
+def _is_valid_datetime(value: str, value_format: str) -> bool:
+    """
+    strptime - самая дорогая часть валидации, а в циклах запросов одни и те же даты повторяются.
+    """
+    try:
+        datetime.datetime.strptime(value, value_format)
+    except ValueError:
+        return False
+    return True
+
+
 # FIXME: DRY IT AFTER FUNCTIONAL TEST !!!
 class MoexParamCheckerMixin:
     _used_api_id = used_api_id
@@ -77,25 +90,26 @@ class MoexParamCheckerMixin:
         "indexid": "_check_indexid",
         "market": "_check_markets",
         "news_id": "_check_int",
-        "security": "_check_instrument_find",
+        "security": "_check_security_entity",
         "securitygroup": "_check_security_group",
         "session": "_check_session",
         "year": "_check_int",
     }
 
-    # Добавить в основной класс
-    _set_boards: set = set()
-    _set_boardgroups: set = set()
-    _set_datatypes: set = set()
-    _set_durations: set[int] = set()
-    _set_engines: set = set()
-    _set_indexids: set = set()
-    _set_markets: set = set()
-    _set_report_names: set = set()
-    _set_securitycollections: set = set()
-    _set_securitygroups: set = set()
-    _set_securitytypes: set = set()
-    _set_sessions: set[int] = set()
+    # Заполняются основным классом при первом обращении
+    _set_boards: set
+    _set_boardgroups: set
+    _set_datatypes: set
+    _set_durations: set
+    _set_engines: set
+    _set_indexids: set
+    _set_markets: set
+    _set_report_names: set
+    _set_securitycollections: set
+    _set_securitygroups: set
+    _set_securitytypes: set
+    _set_sessions: set
+    securities_master: Any  # Локальный справочник инструментов (api_lib.master.SecuritiesMaster) или None
 
     # other_params
     _set_market: set = {"EQ", "FI", "MX"}
@@ -135,6 +149,13 @@ class MoexParamCheckerMixin:
                 raise ValueError("Запрос инструментов длиной менее трёх букв игнорируются.")
         return q
 
+    def _check_security_entity(self, security: Any) -> str:
+        # Инструмент из справочника проверен без сети. Справочник может быть неполным или устаревшим,
+        # поэтому остальные инструменты проверяются как раньше и не отклоняются
+        if self.securities_master is not None and str(security) in self.securities_master:
+            return str(security)
+        return self._check_instrument_find(security)
+
     def _check_engine(self, engine: str) -> str:
         if engine not in self._set_engines:
             raise ValueError(f"Engine: '{engine}' не найден")
@@ -174,11 +195,9 @@ class MoexParamCheckerMixin:
     def _check_date(value_date: Union[str, datetime.date, datetime.datetime]) -> str:
         if isinstance(value_date, (datetime.date, datetime.datetime)):
             return value_date.strftime('%Y-%m-%d')
-        try:
-            datetime.datetime.strptime(value_date, '%Y-%m-%d')
-            return value_date
-        except ValueError:
+        if not _is_valid_datetime(value_date, '%Y-%m-%d'):
             raise ValueError(f"Значение даты {value_date} не является датой или не удовлетворяет формату ГГГГ-ММ-ДД")
+        return value_date
 
     def _check_security_group(self, security_group: str) -> str:
         if security_group not in self._set_securitygroups:
@@ -189,11 +208,9 @@ class MoexParamCheckerMixin:
     def _check_time(value_time: Union[str, datetime.time, datetime.datetime]) -> str:
         if isinstance(value_time, (datetime.time, datetime.datetime)):
             return value_time.strftime('%H:%M:%S')
-        try:
-            datetime.datetime.strptime(value_time, '%H:%M:%S')
-            return value_time
-        except ValueError:
+        if not _is_valid_datetime(value_time, '%H:%M:%S'):
             raise ValueError(f"Значение времени {value_time} не удовлетворяет формату ЧЧ:ММ:CC")
+        return value_time
 
     def _check_asset_type(self, asset_type: str) -> str:
         upper_asset_type = asset_type.upper()
@@ -227,7 +244,7 @@ class MoexParamCheckerMixin:
         return lower_value_type
 
     @staticmethod
-    def _check_securities(securities: Union[str, List[str]], max_security=10) -> Union[str, List[str]]:
+    def _check_securities(securities: Union[str, List[str]], max_security=MAX_SECURITIES) -> Union[str, List[str]]:
         if isinstance(securities, list) and len(securities) > max_security:
             raise ValueError(f"Запросить можно не более {max_security} фин. инструментов")
         return securities
@@ -264,7 +281,7 @@ class MoexParamCheckerMixin:
         return column
 
     def _check_assets(self, securities: Union[str, List[str]]) -> Union[str, List[str]]:
-        return self._check_securities(securities, 5)
+        return self._check_securities(securities, MAX_ASSETS)
 
     @staticmethod
     def _check_sectype(values: Union[str, List[str]]) -> List[str]:
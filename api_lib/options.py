@@ -0,0 +1,342 @@
+import warnings
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+_SQRT_2PI = np.sqrt(2 * np.pi)
+_ERFC = (  # Коэффициенты erfc по Numerical Recipes (erfcc): относительная ошибка меньше 1.2e-7
+    -1.26551223, 1.00002368, 0.37409196, 0.09678418, -0.18628806,
+    0.27886807, -1.13520398, 1.48851587, -0.82215223, 0.17087277,
+)
+_PRICES = {"BID": "IV_BID", "OFFER": "IV_OFFER", "LAST": "IV_LAST", "MID": "IV_MID"}
+
+
+def _norm_cdf(x: np.ndarray) -> np.ndarray:
+    z = np.abs(x) / np.sqrt(2)
+    t = 1 / (1 + 0.5 * z)
+    poly = np.zeros_like(t)
+    for coefficient in _ERFC[:0:-1]:
+        poly = (poly + coefficient) * t
+    erfc = t * np.exp(-z * z + _ERFC[0] + poly)
+    return np.where(x >= 0, 1 - 0.5 * erfc, 0.5 * erfc)
+
+
+def _norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def _price_and_vega(
+        forward: np.ndarray, strike: np.ndarray, tenor: np.ndarray, vol: np.ndarray, is_call: np.ndarray,
+        discount: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: цена Black-76, вега (на единицу волатильности) и d1.
+    """
+    deviation = vol * np.sqrt(tenor)
+    d1 = (np.log(forward / strike) + 0.5 * deviation * deviation) / deviation
+    d2 = d1 - deviation
+    # Колл и пут считаются каждый по своим хвостам распределения, а не через паритет: у дальних опционов
+    # цена - разность малых величин, и ошибка _norm_cdf остается относительной
+    sign = np.where(is_call, 1., -1.)
+    price = discount * sign * (forward * _norm_cdf(sign * d1) - strike * _norm_cdf(sign * d2))
+    return price, discount * forward * _norm_pdf(d1) * np.sqrt(tenor), d1
+
+
+def black76_price(
+        forward: Any, strike: Any, tenor: Any, vol: Any, is_call: Any, rate: float = dictionaries.OPTIONS_RATE
+) -> np.ndarray:
+    """
+    Цена опциона по Black-76. Аргументы - числа или массивы, совместимые по форме.
+    :param forward: цена базового фьючерса;
+    :param tenor: срок до исполнения в годах;
+    :param vol: волатильность в долях;
+    :param is_call: колл (True) или пут (False).
+    """
+    forward, strike, tenor, vol = (np.asarray(value, dtype=np.float64) for value in (forward, strike, tenor, vol))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _price_and_vega(forward, strike, tenor, vol, np.asarray(is_call), np.exp(-rate * tenor))[0]
+
+
+def black76_greeks(
+        forward: Any, strike: Any, tenor: Any, vol: Any, is_call: Any, rate: float = dictionaries.OPTIONS_RATE
+) -> Dict[str, np.ndarray]:
+    """
+    Цена и греки Black-76. Аргументы - как у black76_price.
+    :return: PRICE, DELTA, GAMMA, VEGA (на 1 п.п. волатильности), THETA (за календарный день).
+    """
+    forward, strike, tenor, vol = (np.asarray(value, dtype=np.float64) for value in (forward, strike, tenor, vol))
+    is_call = np.asarray(is_call)
+    discount = np.exp(-rate * tenor)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price, vega, d1 = _price_and_vega(forward, strike, tenor, vol, is_call, discount)
+        deviation = vol * np.sqrt(tenor)
+        delta = discount * (_norm_cdf(d1) - np.where(is_call, 0., 1.))
+        gamma = discount * _norm_pdf(d1) / (forward * deviation)
+        theta = -discount * forward * _norm_pdf(d1) * vol / (2 * np.sqrt(tenor)) + rate * price
+    return {
+        "PRICE": price,
+        "DELTA": delta,
+        "GAMMA": gamma,
+        "VEGA": vega / 100,
+        "THETA": theta / dictionaries.OPTIONS_DAYS,
+    }
+
+
+def implied_volatility(
+        price: Any,
+        forward: Any,
+        strike: Any,
+        tenor: Any,
+        is_call: Any,
+        rate: float = dictionaries.OPTIONS_RATE,
+        initial: Any = None,
+) -> np.ndarray:
+    """
+    Подразумеваемая волатильность Black-76 сразу для всех опционов: метод Ньютона по веге, шаг которого
+    заменяется делением пополам, если выходит за интервал, где лежит корень. Итерации идут только по
+    еще не сошедшимся опционам. Опционы в деньгах по паритету заменяются опционами вне денег того же страйка:
+    их цена - только временная стоимость, и волатильность по ней определяется точнее.
+    :param price: цены опционов;
+    :param initial: начальное приближение в долях, например VOLAT биржи. По умолчанию - приближение
+    Бреннера-Субраманьяма;
+    :return: волатильность в долях формы аргументов. NaN - если цена пустая или вне границ безарбитражных цен.
+    """
+    price, forward, strike, tenor, is_call = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (price, forward, strike, tenor)), np.asarray(is_call)
+    )
+    shape = price.shape
+    if initial is not None:
+        initial = np.broadcast_to(np.asarray(initial, dtype=np.float64), shape).ravel()
+    # Расчет идет по плоским массивам: у чисел (0-d) нет индексации по номерам опционов
+    price, forward, strike, tenor = (
+        np.array(value, dtype=np.float64).ravel() for value in (price, forward, strike, tenor)
+    )
+    is_call = is_call.ravel()
+    discount = np.exp(-rate * tenor)
+    with np.errstate(invalid="ignore"):
+        price = price - discount * np.maximum(np.where(is_call.astype(bool), forward - strike, strike - forward), 0)
+        is_call = strike >= forward
+        upper = discount * np.where(is_call, forward, strike)
+        valid = (price > 0) & (price < upper) & (tenor > 0) & (forward > 0) & (strike > 0)
+
+    low_bound, high_bound = dictionaries.OPTIONS_VOL_BOUNDS
+    low, high = np.full(price.shape, low_bound), np.full(price.shape, high_bound)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        guess = np.sqrt(2 * np.pi / tenor) * price / (discount * forward)
+    if initial is not None:
+        guess = np.where(np.isfinite(initial) & (initial > 0), initial, guess)
+    vol = np.where(np.isfinite(guess), np.clip(guess, low_bound * 2, high_bound / 2), 0.5)
+
+    active = np.flatnonzero(valid)
+    for _ in range(dictionaries.OPTIONS_MAX_ITER):
+        if not active.size:
+            break
+        current = vol[active]
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            model, vega, _ = _price_and_vega(
+                forward[active], strike[active], tenor[active], current, is_call[active], discount[active]
+            )
+            diff = model - price[active]
+            above = diff > 0
+            high[active] = np.where(above, current, high[active])
+            low[active] = np.where(above, low[active], current)
+            step = current - diff / vega
+        bisect = ~np.isfinite(step) | (step <= low[active]) | (step >= high[active])
+        vol[active] = np.where(bisect, (low[active] + high[active]) / 2, step)
+        done = (np.abs(diff) < dictionaries.OPTIONS_TOLERANCE) | (high[active] - low[active] < 1e-12)
+        vol[active[done]] = current[done]
+        active = active[~done]
+    vol[~valid] = np.nan
+    return vol.reshape(shape)
+
+
+def get_board_frame(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Доска опционов одной серии (эндпоинт 881) одним фреймом: строки call и put с колонкой OPTIONTYPE (C/P)
+    и колонками блока asset (UNDERLYINGASSET, UNDERLYINGSETTLEPRICE, LASTDELDATE ...).
+    """
+    parts = [frames[block].assign(OPTIONTYPE=option_type)
+             for block, option_type in (("call", "C"), ("put", "P")) if block in frames]
+    board = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    asset = frames.get("asset")
+    if asset is not None and not asset.empty:
+        for column, value in asset.iloc[0].items():
+            board[column] = value
+    return board
+
+
+def analyze_options(
+        board: pd.DataFrame,
+        moment: Any = None,
+        rate: float = dictionaries.OPTIONS_RATE,
+) -> pd.DataFrame:
+    """
+    Подразумеваемые волатильности и греки для всех строк фрейма досок (см. get_board_frame) одним вызовом.
+    :param moment: момент оценки (время МСК). По умолчанию - текущий;
+    :return: board с колонками TENOR (лет), IV_BID, IV_OFFER, IV_LAST, IV_MID (волатильности в %, как VOLAT)
+    и греками PRICE, DELTA, GAMMA, VEGA, THETA по IV_MID, а без нее - по VOLAT.
+    """
+    moment = pd.Timestamp.now(tz="Europe/Moscow").tz_localize(None) if moment is None else pd.Timestamp(moment)
+    result = board.copy()
+    expiration = pd.to_datetime(result["LASTDELDATE"].astype(str)) + pd.Timedelta(
+        f"{dictionaries.OPTIONS_EXPIRY_TIME}:00"
+    )
+    tenor = ((expiration - moment) / pd.Timedelta(days=dictionaries.OPTIONS_DAYS)).to_numpy(dtype=np.float64)
+    forward = result["UNDERLYINGSETTLEPRICE"].to_numpy(dtype=np.float64, na_value=np.nan)
+    strike = result["STRIKE"].to_numpy(dtype=np.float64, na_value=np.nan)
+    is_call = (result["OPTIONTYPE"] == "C").to_numpy(dtype=bool)
+    exchange_vol = result["VOLAT"].to_numpy(dtype=np.float64, na_value=np.nan) / 100 \
+        if "VOLAT" in result.columns else None
+
+    prices = {column: result[column].to_numpy(dtype=np.float64, na_value=np.nan)
+              for column in ("BID", "OFFER", "LAST") if column in result.columns}
+    if "BID" in prices and "OFFER" in prices:
+        prices["MID"] = (prices["BID"] + prices["OFFER"]) / 2
+    # Все цены всех серий решаются одним массивом
+    names = list(prices)
+    vols = implied_volatility(
+        np.concatenate([prices[name] for name in names]) if names else np.zeros(0),
+        np.tile(forward, len(names)), np.tile(strike, len(names)), np.tile(tenor, len(names)),
+        np.tile(is_call, len(names)), rate, None if exchange_vol is None else np.tile(exchange_vol, len(names)),
+    ).reshape(len(names), len(result))
+
+    result["TENOR"] = tenor
+    for name, values in zip(names, vols):
+        result[_PRICES[name]] = values * 100
+    vol = vols[names.index("MID")] if "MID" in names else np.full(len(result), np.nan)
+    if exchange_vol is not None:
+        vol = np.where(np.isfinite(vol), vol, exchange_vol)
+    for column, values in black76_greeks(forward, strike, tenor, vol, is_call, rate).items():
+        result[column] = values
+    return result
+
+
+class OptionSurface:
+    """
+    Поверхность волатильности опционов срочного рынка: доски (881) всех серий (877) базовых активов из 873.
+    Доски загружаются в MAX_WORKERS потоков через общий ограничитель частоты, а волатильности и греки
+    всех серий считаются одним векторным вызовом, поэтому пересчет поверхности занимает миллисекунды,
+    а обновление - время загрузки досок.
+
+    Пример:
+        surface = OptionSurface()
+        surface.load(["Si", "RI"])
+        surface.surface("Si")  # экспирации x страйки, IV_MID
+        surface.refresh()  # повторная загрузка досок мимо кэша и пересчет
+    """
+
+    ASSETS_API_ID = "873"
+    EXPIRATIONS_API_ID = "877"
+    BOARD_API_ID = "881"
+    POSITIONS_API_ID = "883"
+
+    def __init__(self, api: MoexApi = None, rate: float = dictionaries.OPTIONS_RATE):
+        self.api = api or MoexApi()
+        self.rate = rate
+        self.series: List[Tuple[str, str]] = []  # (базовый актив, дата экспирации)
+        self.boards = pd.DataFrame()  # Доски всех серий
+        self.frame = pd.DataFrame()  # Доски с волатильностями и греками
+        self.errors: Dict[Any, Exception] = {}  # Не загруженные активы и серии
+
+    def _map(self, function: Callable[[Any], Any], keys: List[Any]) -> Dict[Any, Any]:
+        results, errors = self.api.map_threads(function, keys)
+        self.errors.update(errors)
+        return results
+
+    def _fetch_expirations(self, asset: str) -> List[str]:
+        expirations = self.api.request(self.EXPIRATIONS_API_ID, blocks=["expirations"], asset=asset)
+        return [str(date) for date in expirations["expiration_date"]] if not expirations.empty else []
+
+    def _fetch_board(self, series: Tuple[str, str]) -> pd.DataFrame:
+        asset, expiration = series
+        frames = self.api.request(
+            self.BOARD_API_ID, blocks=["call", "put", "asset"], asset=asset, expiration_date=expiration
+        )
+        return get_board_frame(frames).assign(ASSET=asset, EXPIRATION=expiration)
+
+    def _fetch_boards(self) -> None:
+        self.errors = {key: value for key, value in self.errors.items() if key not in self.series}
+        boards = self._map(self._fetch_board, self.series)
+        if len(boards) < len(self.series):
+            warnings.warn(f"Не загружены серии: {sorted(set(self.series) - set(boards))}. Ошибки в errors")
+        boards = [board for board in boards.values() if not board.empty]
+        self.boards = pd.concat(boards, ignore_index=True) if boards else pd.DataFrame()
+
+    def load(
+            self, assets: Iterable[str] = None, asset_type: str = None, date: str = None, moment: Any = None
+    ) -> pd.DataFrame:
+        """
+        :param assets: базовые активы (Si, RI, GAZP ...). По умолчанию - все активы эндпоинта 873;
+        :param asset_type: тип базового актива для 873 (S - акции, F - фьючерсы ...);
+        :param date: дата списка активов 873;
+        :param moment: момент оценки, см. analyze_options;
+        :return: доски всех серий с волатильностями и греками.
+        """
+        self.errors = {}
+        if assets is None:
+            params = {key: value for key, value in (("asset_type", asset_type), ("date", date)) if value}
+            assets = self.api.request(self.ASSETS_API_ID, blocks=["asset_volumes"], **params)["asset"]
+        assets = list(dict.fromkeys(assets))
+        expirations = self._map(self._fetch_expirations, assets)
+        self.series = [(asset, expiration) for asset in assets for expiration in expirations.get(asset, [])]
+        self._fetch_boards()
+        return self.analyze(moment)
+
+    def refresh(self, moment: Any = None) -> pd.DataFrame:
+        """
+        Загрузить доски тех же серий заново мимо кэша ответов и пересчитать поверхность.
+        """
+        with self.api.bypass_cache():
+            self._fetch_boards()
+        return self.analyze(moment)
+
+    def analyze(self, moment: Any = None) -> pd.DataFrame:
+        """
+        Пересчитать волатильности и греки загруженных досок (например, на другой момент оценки).
+        """
+        self.frame = analyze_options(self.boards, moment, self.rate) if not self.boards.empty else self.boards
+        return self.frame
+
+    def smile(self, asset: str, expiration: str) -> pd.DataFrame:
+        frame = self.frame
+        return frame[(frame["ASSET"] == asset) & (frame["EXPIRATION"] == str(expiration))].sort_values("STRIKE")
+
+    def surface(self, asset: str, value: str = "IV_MID", option_type: Optional[str] = None) -> pd.DataFrame:
+        """
+        :param value: колонка поверхности: волатильность или грек;
+        :param option_type: C или P. По умолчанию - OTM-опционы: путы ниже центрального страйка, коллы от него;
+        :return: экспирации x страйки.
+        """
+        frame = self.frame[self.frame["ASSET"] == asset]
+        if option_type is not None:
+            frame = frame[frame["OPTIONTYPE"] == option_type]
+        else:
+            is_call = frame["STRIKE"] >= frame["CENTRALSTRIKE"]
+            frame = frame[is_call == (frame["OPTIONTYPE"] == "C")]
+        return frame.pivot_table(index="EXPIRATION", columns="STRIKE", values=value, aggfunc="first")
+
+    def _fetch_positions(self, key: Tuple[str, str, Optional[str]]) -> pd.DataFrame:
+        asset, option_type, date = key
+        params = {"date": date} if date else {}
+        return self.api.request(self.POSITIONS_API_ID, asset=asset, option_type=option_type, **params)
+
+    def positions(self, assets: Iterable[str] = None, date: str = None) -> pd.DataFrame:
+        """
+        Открытые позиции по опционам (эндпоинт 883): длинные позиции коллов и путов всех участников
+        и отношение путов к коллам PUT_CALL.
+        :param assets: базовые активы. По умолчанию - активы загруженных серий.
+        """
+        assets = list(dict.fromkeys(assets if assets is not None else (asset for asset, _ in self.series)))
+        keys = [(asset, option_type, date) for asset in assets for option_type in ("C", "P")]
+        frames = [frame for frame in self._map(self._fetch_positions, keys).values() if not frame.empty]
+        table = pd.DataFrame(0, index=pd.Index(assets, name="asset"), columns=["C", "P"])
+        if frames:
+            positions = pd.concat(frames, ignore_index=True)
+            totals = positions.groupby(["asset", "option_type"])["open_position_long"].sum().unstack()
+            table = totals.reindex(index=assets, columns=["C", "P"]).fillna(0)
+        table["PUT_CALL"] = table["P"] / table["C"].where(table["C"] != 0)
+        return table
@@ -0,0 +1,167 @@
+import warnings
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+
+class Panel:
+    """
+    Панель дата x инструмент: по матрице на поле истории (CLOSE, VOLUME ...), строки - даты dates,
+    столбцы - инструменты securities.
+    """
+
+    def __init__(self, dates: np.ndarray, securities: List[str], values: Dict[str, np.ndarray]):
+        self.dates = dates
+        self.securities = securities
+        self.values = values
+        self.errors: Dict[str, Exception] = {}  # Инструменты, которые не удалось загрузить
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.values[field]
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.values)
+
+    def to_frame(self, field: str) -> pd.DataFrame:
+        return pd.DataFrame(self.values[field], index=pd.DatetimeIndex(self.dates, name="TRADEDATE"),
+                            columns=pd.Index(self.securities, name="SECID"))
+
+    def ffill(self, fields: Iterable[str] = None) -> "Panel":
+        """
+        Протянуть последнее известное значение на даты без торгов. По умолчанию - только цены (PANEL_PRICE_FIELDS):
+        объем в день без торгов равен нулю, а не вчерашнему.
+        """
+        if fields is None:
+            fields = [field for field in self.values if field in dictionaries.PANEL_PRICE_FIELDS]
+        for field in fields:
+            matrix = self.values[field]
+            rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+            np.maximum.accumulate(rows, axis=0, out=rows)
+            self.values[field] = matrix[rows, np.arange(matrix.shape[1])]
+        return self
+
+    def adjust_splits(self, splits: pd.DataFrame) -> "Panel":
+        """
+        Привести историю к текущему количеству бумаг после сплитов и консолидаций: цены до даты сплита
+        умножаются на before / after, объемы (PANEL_VOLUME_FIELDS) - на after / before.
+        :param splits: фрейм эндпоинта 758 с колонками tradedate, secid, before, after.
+        """
+        columns = {security: idx for idx, security in enumerate(self.securities)}
+        splits = splits[splits["secid"].isin(columns)]
+        if splits.empty:
+            return self
+        factors = np.ones((len(self.dates), len(self.securities)), dtype=np.float64)
+        split_rows = np.searchsorted(self.dates, splits["tradedate"].to_numpy(dtype="datetime64[D]"))
+        ratios = splits["before"].to_numpy(dtype=np.float64) / splits["after"].to_numpy(dtype=np.float64)
+        for row, column, ratio in zip(split_rows, splits["secid"].map(columns), ratios):
+            factors[:row, column] *= ratio
+        for field, matrix in self.values.items():
+            if field in dictionaries.PANEL_PRICE_FIELDS:
+                self.values[field] = (matrix * factors).astype(matrix.dtype)
+            elif field in dictionaries.PANEL_VOLUME_FIELDS:
+                self.values[field] = (matrix / factors).astype(matrix.dtype)
+        return self
+
+
+class PanelBuilder:
+    """
+    Сборка панели истории торгов по множеству инструментов. История каждого инструмента (эндпоинт 63) грузится
+    в MAX_WORKERS потоков через общий ограничитель частоты. Страницы не превращаются во фреймы: нужные колонки
+    сразу складываются в массивы numpy, которые после загрузки раскладываются в заранее выделенные матрицы
+    по общей оси дат. Пропуски протягиваются, история приводится к сплитам из эндпоинта 758.
+
+    Пример:
+        panel = PanelBuilder().build(securities, engine="stock", market="shares", board="TQBR", _from="2020-01-01")
+        closes = panel.to_frame("CLOSE")
+    """
+
+    API_ID = "63"
+    SPLITS_API_ID = "758"
+
+    def __init__(self, api: MoexApi = None, dtype: Any = np.float32):
+        """
+        :param dtype: тип значений матриц.
+        """
+        self.api = api or MoexApi()
+        self.dtype = dtype
+        self._splits: Optional[pd.DataFrame] = None
+
+    @property
+    def splits(self) -> pd.DataFrame:
+        if self._splits is None:
+            self._splits = self.api.request(self.SPLITS_API_ID)
+        return self._splits
+
+    def _fetch_security(
+            self, security: str, fields: Sequence[str], board: Optional[str], kwargs: dict
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: даты и матрица значений fields (строка на дату) одного инструмента.
+        """
+        kwargs = {**kwargs, "security": security, "COLUMNS_history": ["TRADEDATE", "BOARDID", *fields]}
+        api_dict, url, use_params = self.api._prepare_request(self.API_ID, False, ["history"], kwargs)
+        dates, values = [], []
+        for page in self.api._iter_pages(api_dict, url, use_params, parallel=True):
+            block = page.get("history")
+            if not block or not block["data"]:
+                continue
+            columns = {column: idx for idx, column in enumerate(block["columns"])}
+            rows = block["data"]
+            if board is not None:
+                board_idx = columns["BOARDID"]
+                rows = [row for row in rows if row[board_idx] == board]
+            dates.append(np.array([row[columns["TRADEDATE"]] for row in rows], dtype="datetime64[D]"))
+            values.append(np.array([[row[columns[field]] for field in fields] for row in rows], dtype=np.float64)
+                          .reshape(len(rows), len(fields)))
+        if not dates:
+            return np.zeros(0, dtype="datetime64[D]"), np.zeros((0, len(fields)), dtype=self.dtype)
+        return np.concatenate(dates), np.concatenate(values).astype(self.dtype)
+
+    def build(
+            self,
+            securities: Iterable[str],
+            fields: Sequence[str] = dictionaries.PANEL_FIELDS,
+            board: Optional[str] = dictionaries.PANEL_BOARD,
+            ffill: bool = True,
+            adjust: bool = True,
+            **kwargs: Any,
+    ) -> Panel:
+        """
+        :param securities: инструменты;
+        :param fields: колонки истории, из которых строятся матрицы;
+        :param board: режим торгов. None - все режимы, при нескольких строках на дату остается последняя;
+        :param ffill: протянуть цены на даты без торгов;
+        :param adjust: привести историю к сплитам;
+        :param kwargs: параметры эндпоинта 63: engine, market, _from, till ...
+        :return: панель. Инструменты, которые не удалось загрузить, остаются пустыми и перечислены в errors.
+        """
+        securities = list(dict.fromkeys(securities))
+        fields = list(fields)
+
+        def fetch(security: str) -> Tuple[np.ndarray, np.ndarray]:
+            return self._fetch_security(security, fields, board, kwargs)
+
+        results, errors = self.api.map_threads(fetch, securities)
+        if errors:
+            warnings.warn(f"Не загружены инструменты: {sorted(errors)}. Ошибки в Panel.errors")
+
+        dates = np.unique(np.concatenate(
+            [result[0] for result in results.values()] or [np.zeros(0, dtype="datetime64[D]")]
+        ))
+        matrices = np.full((len(fields), len(dates), len(securities)), np.nan, dtype=self.dtype)
+        for column, security in enumerate(securities):
+            if security in results:
+                security_dates, values = results[security]
+                matrices[:, np.searchsorted(dates, security_dates), column] = values.T
+        panel = Panel(dates, securities, {field: matrices[idx] for idx, field in enumerate(fields)})
+        panel.errors = errors
+        if adjust:
+            panel.adjust_splits(self.splits)
+        if ffill:
+            panel.ffill()
+        return panel
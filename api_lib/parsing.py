@@ -0,0 +1,52 @@
+import json
+from typing import Any, Collection, Dict, Optional
+
+import pandas as pd
+
+from api_lib.schema import typed_dataframe
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(content: bytes) -> Any:
+    """
+    Разбор json ответа. orjson, если он установлен, в несколько раз быстрее стандартного json.
+    """
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+def build_frames(
+        response: dict,
+        schema: dict = None,
+        blocks: Optional[Collection[str]] = None,
+        exclude: Collection[str] = (),
+) -> Dict[str, pd.DataFrame]:
+    """
+    Фреймы блоков ответа. Блоки из schema приводятся к типам из метаданных ISS.
+    :param blocks: собрать только эти блоки (по умолчанию все);
+    :param exclude: блоки, которые собирать не нужно.
+    """
+    schema = schema or {}
+    return {
+        key: (
+            typed_dataframe(value["data"], value["columns"], schema[key]) if key in schema else
+            pd.DataFrame(data=value["data"], columns=value["columns"])
+        )
+        for key, value in response.items()
+        if (blocks is None or key in blocks) and key not in exclude
+    }
+
+
+def parse_response(
+        content: bytes,
+        schema: dict = None,
+        blocks: Optional[Collection[str]] = None,
+        exclude: Collection[str] = (),
+) -> Dict[str, pd.DataFrame]:
+    """
+    Разбор тела ответа и сборка фреймов. Выполняется в процессе пула разбора (см. MoexApi.configure_parsing).
+    """
+    return build_frames(loads(content), schema, blocks, exclude)
@@ -0,0 +1,81 @@
+import inspect
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+import api_lib.dictionaries as dictionaries
+
+Validator = Callable[[Any, Any], Any]  # validator(api, value)
+
+
+def _missing_validator(message: str) -> Validator:
+    def validator(api: Any, value: Any) -> Any:
+        raise KeyError(message)
+    return validator
+
+
+def _get_validator(owner: type, key: str, validators: Dict[str, str]) -> Validator:
+    """
+    Метод валидации из словаря _check_params/_check_entity миксина без привязки к объекту.
+    Отсутствующий валидатор не ломает компиляцию эндпоинта, ошибка будет при передаче параметра.
+    """
+    name = validators.get(key)
+    if name is None:
+        return _missing_validator(f"Параметр: {key} не найден в словаре валидации! Проверьте библиотеку.")
+    method = inspect.getattr_static(owner, name, None)
+    if method is None:
+        return _missing_validator(f"Не найден метод валидации для переданного параметра: {key}. Проверьте библиотеку.")
+    if isinstance(method, staticmethod):
+        func = method.__func__
+        return lambda api, value: func(value)
+    return method
+
+
+def get_param_name(key: str) -> Optional[str]:
+    """
+    Имя параметра ISS по имени аргумента request: _from -> from, P_market -> market, iss__reverse -> iss.reverse.
+    :return: None, если у аргумента нет префикса.
+    """
+    if key.startswith("_"):
+        return key[1:]
+    if key.startswith("P_"):
+        return key[2:]
+    if key.find("__") != -1:
+        return key.replace("__", ".")
+    return None
+
+
+class EndpointPlan:
+    """
+    Эндпоинт из справочника, подготовленный к запросам один раз: шаблон url и валидаторы сущностей пути,
+    таблица имя аргумента request (с префиксами _, P_ и __) -> (параметр ISS, валидатор), множества блоков
+    и колонок ответа.
+    """
+
+    __slots__ = (
+        "api_id", "api_dict", "format_url", "path_validators", "param_aliases", "defaults", "blocks", "columns",
+        "cursor_name",
+    )
+
+    def __init__(self, api_id: str, api_dict: dict, owner: type):
+        """
+        :param owner: класс с валидаторами (наследник MoexParamCheckerMixin).
+        """
+        self.api_id = api_id
+        self.api_dict = api_dict
+        self.format_url: Callable[..., str] = (api_dict["endpoint"] + ".json").format
+        self.path_validators: Tuple[Tuple[str, Validator], ...] = tuple(
+            (entity, _get_validator(owner, entity, owner._check_entity))
+            for entity in api_dict.get("global_entities") or []
+        )
+        params = api_dict.get("params") or {}
+        validators = {param: _get_validator(owner, param, owner._check_params) for param in params}
+        self.param_aliases: Dict[str, Tuple[str, Validator]] = {param: (param, validators[param]) for param in params}
+        for param in params:  # Точное имя параметра важнее совпадения по префиксу
+            for alias in ("_" + param, "P_" + param, param.replace(".", "__")):
+                self.param_aliases.setdefault(alias, (param, validators[param]))
+        self.defaults: Dict[str, Any] = dictionaries.ENDPOINT_DEFAULTS.get(api_id, {})
+        return_data = api_dict.get("return_data", {})
+        self.blocks: FrozenSet[str] = frozenset(return_data)
+        self.columns: FrozenSet[str] = frozenset(
+            column for block in return_data.values() for column in block.get("columns", [])
+        )
+        self.cursor_name: Optional[str] = api_dict.get("cursor_name")
@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+import warnings
+from collections import namedtuple
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+# Изменения одного опроса. added - новые строки (новые сделки или новые инструменты снимка), changed - строки
+# снимка с изменившимися значениями, removed - пропавшие из снимка строки (в прежнем виде).
+# version - seqnum снимка или TRADENO последней сделки.
+PollDelta = namedtuple("PollDelta", "api_id params block added changed removed version")
+Callback = Callable[[PollDelta], Any]
+
+
+class Feed:
+    """
+    Подписка на один эндпоинт с параметрами. Снимки (эндпоинты с блоком dataversion) сначала проверяются
+    дешевым запросом одного блока dataversion: при прежнем seqnum полный снимок не загружается и не разбирается.
+    Сделки (эндпоинты с параметром tradeno) запрашиваются начиная со следующей за последней полученной.
+    Интервал опроса сокращается до min_interval при изменениях и растет в POLL_BACKOFF раз без них.
+    """
+
+    def __init__(
+            self,
+            api: MoexApi,
+            api_id: Union[int, str],
+            block: Optional[str],
+            min_interval: float,
+            max_interval: float,
+            kwargs: dict,
+    ):
+        api_dict = MoexApi._check_and_get_api_dict(api_id)
+        return_data = api_dict["return_data"]
+        self.api = api
+        self.api_id = str(api_id)
+        self.kwargs = kwargs
+        self.is_trades = "tradeno" in api_dict.get("params", {}) and any(
+            "TRADENO" in value.get("columns", []) for value in return_data.values()
+        )
+        if not self.is_trades and "dataversion" not in return_data:
+            raise KeyError(f"Эндпоинт {api_id} не возвращает ни dataversion, ни номера сделок")
+        self.block = block or next(
+            (entity for entity in dictionaries.POLL_BLOCKS if entity in return_data), next(iter(return_data))
+        )
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.next_poll = 0.
+        self.version: Optional[int] = None  # seqnum снимка или TRADENO последней сделки
+        self.callbacks: List[Callback] = []
+        self._rows: Dict[tuple, tuple] = {}  # Последний снимок: ключ строки -> строка
+
+    def _get_keys(self, columns: List[str]) -> List[int]:
+        keys = [columns.index(column) for column in dictionaries.POLL_KEYS if column in columns]
+        if not keys:
+            raise KeyError(f"В блоке {self.block} нет ключевых колонок {dictionaries.POLL_KEYS}")
+        return keys
+
+    def _poll_snapshot(self) -> Optional[PollDelta]:
+        api_dict, url, use_params = self.api._prepare_request(self.api_id, False, None, dict(self.kwargs))
+        probe = self.api._request(url, {**use_params, "iss.only": "dataversion", "iss.meta": "off"})
+        version = probe.get("dataversion")
+        seqnum = None
+        if version and version["data"] and "seqnum" in version["columns"]:
+            seqnum = version["data"][0][version["columns"].index("seqnum")]
+        if seqnum is not None and seqnum == self.version:
+            return None
+
+        response = self.api._request(url, {**use_params, "iss.only": self.block})
+        block = response[self.block]
+        columns, keys = block["columns"], self._get_keys(block["columns"])
+        rows = {tuple(row[idx] for idx in keys): tuple(row) for row in block["data"]}
+        previous, self._rows = self._rows, rows
+        self.version = seqnum
+        added = [row for key, row in rows.items() if key not in previous]
+        changed = [row for key, row in rows.items() if key in previous and previous[key] != row]
+        removed = [row for key, row in previous.items() if key not in rows]
+        if not (added or changed or removed):
+            return None
+        return PollDelta(
+            self.api_id, self.kwargs, self.block,
+            pd.DataFrame(added, columns=columns), pd.DataFrame(changed, columns=columns),
+            pd.DataFrame(removed, columns=columns), seqnum,
+        )
+
+    def _poll_trades(self) -> Optional[PollDelta]:
+        kwargs = dict(self.kwargs)
+        if self.version is not None:
+            kwargs.update(tradeno=self.version, next_trade=1)
+        trades = self.api.request(self.api_id, blocks=[self.block], **kwargs)
+        if trades.empty:
+            return None
+        # На срочном рынке номера сделок не монотонны, поэтому версия - номер последней сделки, как в IncrementalSync
+        self.version = int(trades["TRADENO"].iloc[-1])
+        empty = trades.iloc[:0]
+        return PollDelta(self.api_id, self.kwargs, self.block, trades, empty, empty, self.version)
+
+    def poll(self) -> Optional[PollDelta]:
+        """
+        Опросить эндпоинт, запланировать следующий опрос и отдать изменения подписчикам.
+        :return: изменения или None.
+        """
+        try:
+            with self.api.bypass_cache():  # Кэш отдал бы прежние данные
+                delta = self._poll_trades() if self.is_trades else self._poll_snapshot()
+        except Exception as error:
+            warnings.warn(f"Опрос {self.api_id} {self.kwargs} не удался: {error}")
+            delta = None
+        if delta is None:
+            self.interval = min(self.max_interval, self.interval * dictionaries.POLL_BACKOFF)
+        else:
+            self.interval = self.min_interval
+        self.next_poll = time.monotonic() + self.interval
+        if delta is not None:
+            for callback in self.callbacks:
+                try:
+                    callback(delta)
+                except Exception as error:  # Ошибка подписчика не должна останавливать опрос
+                    warnings.warn(f"Подписчик {callback!r} упал на изменениях {self.api_id}: {error}")
+        return delta
+
+
+class LivePoller:
+    """
+    Опрос живых данных: снимков рынка (32, 33, 52, 53) и сделок (34, 35, 55, 56) с передачей изменений
+    подписчикам вместо полной перезагрузки фреймов. Опрос идет в фоновом потоке (start/stop) или
+    в асинхронном итераторе updates.
+
+    Пример:
+        poller = LivePoller()
+        poller.subscribe(33, print, engine="stock", market="shares", securities=["GAZP", "SBER"])
+        poller.subscribe(56, print, engine="stock", market="shares", board="TQBR", security="GAZP")
+        poller.start()
+        ...
+        poller.stop()
+
+        async for delta in poller.updates():
+            ...
+    """
+
+    def __init__(
+            self,
+            api: MoexApi = None,
+            min_interval: float = dictionaries.POLL_MIN_INTERVAL,
+            max_interval: float = dictionaries.POLL_MAX_INTERVAL,
+    ):
+        """
+        :param min_interval: интервал опроса, пока данные меняются, секунд;
+        :param max_interval: предельный интервал опроса без изменений, секунд.
+        """
+        self.api = api or MoexApi()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.feeds: Dict[Tuple[str, tuple], Feed] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(
+            self, api_id: Union[int, str], callback: Callback = None, block: str = None, **kwargs: Any
+    ) -> Feed:
+        """
+        :param api_id: эндпоинт снимка или сделок;
+        :param callback: вызывается с PollDelta при каждом изменении;
+        :param block: блок, изменения которого отслеживаются. По умолчанию - первый из POLL_BLOCKS;
+        :param kwargs: параметры request. Одинаковые подписки используют один опрос.
+        """
+        key = (str(api_id), tuple(sorted((param, str(value)) for param, value in kwargs.items())))
+        with self._lock:
+            feed = self.feeds.get(key)
+            if feed is None:
+                feed = self.feeds[key] = Feed(
+                    self.api, api_id, block, self.min_interval, self.max_interval, kwargs
+                )
+            if callback is not None:
+                feed.callbacks.append(callback)
+        return feed
+
+    def unsubscribe(self, feed: Feed) -> None:
+        with self._lock:
+            self.feeds = {key: value for key, value in self.feeds.items() if value is not feed}
+
+    def poll_due(self) -> List[PollDelta]:
+        """
+        Опросить подписки, время опроса которых наступило.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [feed for feed in self.feeds.values() if feed.next_poll <= now]
+        return [delta for delta in (feed.poll() for feed in due) if delta is not None]
+
+    def _time_to_next_poll(self) -> float:
+        with self._lock:
+            next_poll = min((feed.next_poll for feed in self.feeds.values()), default=time.monotonic() + 1)
+        return max(0., next_poll - time.monotonic())
+
+    def run(self) -> None:
+        """
+        Опрашивать до вызова stop.
+        """
+        while not self._stop.is_set():
+            self.poll_due()
+            self._stop.wait(self._time_to_next_poll())
+
+    def start(self) -> None:
+        """
+        Запустить опрос в фоновом потоке.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="moex-live-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def updates(self) -> AsyncIterator[PollDelta]:
+        """
+        Асинхронный поток изменений всех подписок. Запросы выполняются в отдельном потоке и не блокируют event loop.
+        """
+        while True:
+            for delta in await asyncio.to_thread(self.poll_due):
+                yield delta
+            await asyncio.sleep(self._time_to_next_poll())
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import GLOBAL_API
+
+
+class ReplayResponse:
+    """
+    Минимальный аналог requests.Response: статус, тело и его разбор.
+    """
+
+    def __init__(self, content: bytes, status_code: int = 200, url: str = ""):
+        self.content = content
+        self.status_code = status_code
+        self.url = url
+        self.headers = {}
+
+    def json(self) -> dict:
+        return json.loads(self.content)
+
+
+class ReplaySession:
+    """
+    Транспорт для работы без сети: отвечает на запросы MoexApi сохраненными ответами ISS из каталога
+    <path>/<api_id>.json. Эндпоинт определяется по пути url и шаблонам справочника эндпоинтов.
+    Для эндпоинтов с пагинацией строки сохраненного ответа размножаются на pages страниц: с курсором
+    (INDEX, TOTAL, PAGESIZE) или без него (последняя страница пустая). Учитываются iss.only, <блок>.columns,
+    iss.meta, iss.data и tradeno/next_trade.
+
+    Пример:
+        MOEX.use_session(ReplaySession(pages=10))
+        MOEX.request(63, engine="stock", market="shares", security="GAZP")  # 10 страниц курсора
+    """
+
+    def __init__(self, path: str = dictionaries.REPLAY_PATH, pages: int = 1, latency: float = 0):
+        """
+        :param path: каталог с ответами ISS;
+        :param pages: число страниц, на которое размножаются ответы эндпоинтов с пагинацией;
+        :param latency: задержка каждого ответа в секундах, имитирующая сеть.
+        """
+        self.path = path
+        self.pages = pages
+        self.latency = latency
+        self._routes = self._compile_routes()
+        self._fixtures: Dict[str, Optional[dict]] = {}
+        self._responses: Dict[Tuple[str, tuple], bytes] = {}
+
+    @staticmethod
+    def _compile_routes() -> List[Tuple["re.Pattern", str]]:
+        routes = []
+        for api_id, api_dict in GLOBAL_API.items():
+            template = urlparse(api_dict["endpoint"]).path
+            pattern = re.sub(r"\\{\w+\\}", "[^/]+", re.escape(template))
+            routes.append((template.count("{"), re.compile(pattern + r"\.json"), api_id))
+        # Шаблоны без подстановок проверяются первыми: /securities/indices не должен попасть в /securities/{security}
+        return [(pattern, api_id) for _, pattern, api_id in sorted(routes, key=lambda route: route[0])]
+
+    def _get_api_id(self, url: str) -> Optional[str]:
+        url_path = urlparse(url).path
+        return next((api_id for pattern, api_id in self._routes if pattern.fullmatch(url_path)), None)
+
+    def _get_fixture(self, api_id: str) -> Optional[dict]:
+        if api_id not in self._fixtures:
+            try:
+                with open(os.path.join(self.path, f"{api_id}.json"), "r", encoding="utf-8") as fixture_file:
+                    self._fixtures[api_id] = json.load(fixture_file)
+            except FileNotFoundError:
+                self._fixtures[api_id] = None
+        return self._fixtures[api_id]
+
+    @staticmethod
+    def _get_rows(rows: list, start: int, count: int, total: int) -> list:
+        """
+        Строки [start, start + count) размноженного блока из total строк. Каждая копия сдвинута на одну строку,
+        чтобы соседние страницы не совпадали.
+        """
+        size = len(rows)
+        return [rows[(idx + idx // size) % size] for idx in range(start, min(start + count, total))]
+
+    def _paginate(self, api_id: str, fixture: dict, start: int) -> dict:
+        api_dict = GLOBAL_API[api_id]
+        if not (api_dict.get("has_cursor") and api_dict.get("params", {}).get("start")):
+            return fixture
+        response = dict(fixture)
+        cursor = api_dict.get("cursor_name")
+        if cursor:
+            entity = cursor.replace(".cursor", "")
+            rows = fixture.get(entity, {}).get("data", [])
+            total = len(rows) * self.pages
+            response[entity] = {**fixture[entity], "data": self._get_rows(rows, start, len(rows), total)}
+            response[cursor] = {
+                **fixture.get(cursor, {}),
+                "columns": ["INDEX", "TOTAL", "PAGESIZE"],
+                "data": [[start, total, len(rows)]],
+            }
+            return response
+        page_size = max((len(value["data"]) for value in fixture.values()), default=0)
+        for entity, value in fixture.items():
+            if "." not in entity and value["data"]:  # Короткий блок помещается на первую страницу целиком
+                total = len(value["data"]) * self.pages if len(value["data"]) == page_size else len(value["data"])
+                response[entity] = {**value, "data": self._get_rows(value["data"], start, page_size, total)}
+        return response
+
+    @staticmethod
+    def _apply_params(response: dict, params: dict) -> dict:
+        tradeno = params.get("tradeno")
+        if tradeno is not None:  # Сделки начиная с tradeno (next_trade=1 - со следующей)
+            response = dict(response)
+            for entity, value in response.items():
+                if "TRADENO" in value["columns"]:
+                    idx = value["columns"].index("TRADENO")
+                    first = int(tradeno) + (params.get("next_trade") == "1")
+                    response[entity] = {**value, "data": [row for row in value["data"] if row[idx] >= first]}
+        only = params.get("iss.only")
+        if only:
+            response = {entity: value for entity, value in response.items() if entity in only.split(",")}
+        result = {}
+        for entity, value in response.items():
+            block = {"metadata": value.get("metadata", {}), "columns": value["columns"], "data": value["data"]}
+            columns = params.get(f"{entity}.columns")
+            if columns:
+                column_ids = [block["columns"].index(column) for column in columns.split(",")
+                              if column in block["columns"]]
+                block["columns"] = [block["columns"][idx] for idx in column_ids]
+                block["data"] = [[row[idx] for idx in column_ids] for row in block["data"]]
+                block["metadata"] = {column: block["metadata"][column] for column in block["columns"]
+                                     if column in block["metadata"]}
+            if params.get("iss.meta") == "off":
+                del block["metadata"]
+            if params.get("iss.data") == "off":
+                block["data"] = []
+            result[entity] = block
+        return result
+
+    def get(self, url: str, params: dict = None, **kwargs) -> ReplayResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(url, params)
+
+    def _respond(self, url: str, params: Optional[dict]) -> ReplayResponse:
+        params = {key: str(value) for key, value in (params or {}).items()}
+        key = (urlparse(url).path, tuple(sorted(params.items())))
+        content = self._responses.get(key)
+        if content is None:
+            api_id = self._get_api_id(url)
+            fixture = self._get_fixture(api_id) if api_id is not None else None
+            if fixture is None:
+                return ReplayResponse(b'{"error": "not found"}', 404, url)
+            response = self._paginate(api_id, fixture, int(params.get("start", 0)))
+            content = json.dumps(self._apply_params(response, params), ensure_ascii=False).encode()
+            self._responses[key] = content
+        return ReplayResponse(content, 200, url)
+
+    def close(self) -> None:
+        self._responses.clear()
+
+
+class _AsyncReplayResponse:
+    """
+    Ответ AsyncReplaySession в форме ответа aiohttp: асинхронный контекстный менеджер со status, headers и read().
+    """
+
+    def __init__(self, response: ReplayResponse, latency: float):
+        self.status = response.status_code
+        self.headers = response.headers
+        self.url = response.url
+        self._content = response.content
+        self._latency = latency
+
+    async def read(self) -> bytes:
+        return self._content
+
+    async def __aenter__(self) -> "_AsyncReplayResponse":
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return self
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+
+class AsyncReplaySession(ReplaySession):
+    """
+    ReplaySession для AsyncMoexApi: get отвечает так же, как aiohttp.ClientSession.get, задержка latency
+    не блокирует event loop.
+
+    Пример:
+        moex = AsyncMoexApi()
+        await moex.use_session(AsyncReplaySession(pages=10))
+        await moex.open()  # Справочники - из локального снимка или сохраненных ответов
+        await moex.request(63, engine="stock", market="shares", security="GAZP")
+    """
+
+    def get(self, url: str, params: dict = None, **kwargs) -> _AsyncReplayResponse:
+        return _AsyncReplayResponse(self._respond(url, params), self.latency)
+
+    async def close(self) -> None:
+        super().close()
@@ -0,0 +1,168 @@
+from typing import Any, Dict, Hashable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+
+_DAY = 24 * 60 * 60 * 10 ** 9
+_MONDAY = 4 * _DAY  # 1970-01-05: многодневные бары начинаются с понедельника
+_SUMS = ("value", "volume")
+_COLUMNS = ("open", "close", "high", "low") + _SUMS + ("begin", "end", "session")
+
+
+def _to_ns(values: Any) -> np.ndarray:
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class CandleResampler:
+    """
+    Агрегация свечей эндпоинтов candles (46, 155, 157) в бары произвольного интервала: 5 минут, 15 минут, 4 часа,
+    несколько дней. Внутридневные бары отсчитываются от начала торговой сессии и не переходят через границу
+    сессий (SESSION_TIMES), многодневные - от полуночи понедельника.
+    Свечи подаются постранично через update: готовые бары отдаются сразу, последний незакрытый бар каждого
+    инструмента хранится до следующей страницы. Страницы одного инструмента должны идти по возрастанию времени.
+
+    Пример:
+        resampler = CandleResampler("15min")
+        for security in ("GAZP", "SBER"):
+            for _, frame in MOEX.request_iter(155, engine="stock", market="shares", security=security, interval=1):
+                bars = resampler.update(frame, key=security)
+        bars = resampler.flush()
+    """
+
+    def __init__(
+            self,
+            rule: Union[int, str, pd.Timedelta],
+            sessions: Optional[Dict[int, str]] = dictionaries.SESSION_TIMES,
+            by: Optional[str] = None,
+    ):
+        """
+        :param rule: интервал бара: число минут или строка pandas ("15min", "4h", "1D"). Должен быть кратен
+        интервалу исходных свечей, иначе свеча попадет в бар, в котором она началась;
+        :param sessions: время начала сессий {номер сессии (см. SESSIONS): "ЧЧ:ММ"}. None - бары от полуночи;
+        :param by: колонка инструмента, если во фрейме несколько инструментов.
+        """
+        step = pd.Timedelta(minutes=rule) if isinstance(rule, int) else pd.Timedelta(rule)
+        self.step = step.value
+        if self.step <= 0:
+            raise ValueError(f"Интервал бара должен быть положительным: {rule}")
+        if self.step >= _DAY and self.step % _DAY:
+            raise ValueError(f"Интервал больше суток должен быть кратен суткам: {rule}")
+        self.by = by
+        starts = sorted(
+            (pd.Timedelta(f"{start}:00").value, session) for session, start in (sessions or {}).items()
+        )
+        if not starts or starts[0][0] != 0:  # До первой сессии - бары от полуночи, без номера сессии
+            starts.insert(0, (0, -1 if starts else dictionaries.ALL_SESSIONS))
+        self._session_starts = np.array([start for start, _ in starts], dtype=np.int64)
+        self._session_ids = np.array([session for _, session in starts], dtype=np.int64)
+        self._state: Optional[Dict[str, np.ndarray]] = None  # Незакрытые бары: по одному на инструмент
+        self._has_keys = by is not None
+
+    def _get_buckets(self, begin: np.ndarray) -> tuple:
+        """
+        :return: начало бара и номер сессии для каждой свечи.
+        """
+        if self.step >= _DAY:
+            bucket = (begin - _MONDAY) // self.step * self.step + _MONDAY
+            return bucket, np.full(len(begin), dictionaries.ALL_SESSIONS, dtype=np.int64)
+        day = begin - begin % _DAY
+        time_of_day = begin - day
+        idx = np.searchsorted(self._session_starts, time_of_day, side="right") - 1
+        anchor = self._session_starts[idx]
+        return day + anchor + (time_of_day - anchor) // self.step * self.step, self._session_ids[idx]
+
+    def _read_frame(self, frame: pd.DataFrame, key: Hashable) -> Dict[str, np.ndarray]:
+        missing = [column for column in _COLUMNS[:-1] if column not in frame.columns]
+        if missing:
+            raise ValueError(f"Во фрейме нет колонок свечей: {missing}")
+        begin = _to_ns(frame["begin"])
+        bucket, session = self._get_buckets(begin)
+        data = {
+            column: frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            for column in ("open", "close", "high", "low")
+        }
+        data.update({column: frame[column].to_numpy(dtype=np.float64, na_value=0) for column in _SUMS})
+        data.update({"begin": begin, "end": _to_ns(frame["end"]), "bucket": bucket, "session": session})
+        data["key"] = frame[self.by].to_numpy(dtype=object) if self.by else np.full(len(frame), key, dtype=object)
+        return data
+
+    def _aggregate(self, data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        codes, _ = pd.factorize(data["key"], use_na_sentinel=False)
+        order = np.lexsort((data["begin"], codes))
+        codes, bucket = codes[order], data["bucket"][order]
+        change = np.empty(len(order), dtype=bool)
+        change[0] = True
+        np.not_equal(codes[1:], codes[:-1], out=change[1:])
+        change[1:] |= bucket[1:] != bucket[:-1]
+        firsts = np.flatnonzero(change)
+        lasts = np.append(firsts[1:] - 1, len(order) - 1)
+        rows_first, rows_last = order[firsts], order[lasts]
+        bars = {
+            "key": data["key"][rows_first],
+            "open": data["open"][rows_first],
+            "close": data["close"][rows_last],
+            "high": np.fmax.reduceat(data["high"][order], firsts),
+            "low": np.fmin.reduceat(data["low"][order], firsts),
+            **{column: np.add.reduceat(data[column][order], firsts) for column in _SUMS},
+            "begin": bucket[firsts],
+            "bucket": bucket[firsts],
+            "end": data["end"][rows_last],
+            "session": data["session"][rows_first],
+        }
+        bar_codes = codes[firsts]
+        bars["is_open"] = np.append(bar_codes[1:] != bar_codes[:-1], True)  # Последний бар инструмента
+        return bars
+
+    def _create_frame(self, bars: Dict[str, np.ndarray], mask: np.ndarray) -> pd.DataFrame:
+        result = {self.by or "secid": bars["key"][mask]} if self._has_keys else {}
+        for column in _COLUMNS:
+            values = bars[column][mask]
+            result[column] = values.astype("datetime64[ns]") if column in ("begin", "end") else values
+        return pd.DataFrame(result)
+
+    def update(self, frame: pd.DataFrame, key: Hashable = None) -> pd.DataFrame:
+        """
+        Добавить страницу свечей.
+        :param key: инструмент, к которому относится вся страница (если не задан by). Попадает в колонку secid.
+        :return: закрытые бары: за которыми у того же инструмента уже есть более поздние свечи.
+        """
+        self._has_keys = self._has_keys or key is not None
+        if frame.empty:
+            return self._create_frame(self._empty_bars(), np.zeros(0, dtype=bool))
+        data = self._read_frame(frame, key)
+        if self._state is not None:  # Незакрытый бар - та же свеча, начинающаяся с начала бара
+            data = {column: np.concatenate([self._state[column], values]) for column, values in data.items()}
+        bars = self._aggregate(data)
+        is_open = bars.pop("is_open")
+        self._state = {column: bars[column][is_open] for column in data}
+        return self._create_frame(bars, ~is_open)
+
+    def flush(self) -> pd.DataFrame:
+        """
+        Отдать незакрытые бары всех инструментов и начать заново.
+        """
+        bars = self._state if self._state is not None else self._empty_bars()
+        self._state = None
+        return self._create_frame(bars, np.ones(len(bars["key"]), dtype=bool))
+
+    @staticmethod
+    def _empty_bars() -> Dict[str, np.ndarray]:
+        bars = {column: np.zeros(0, dtype=np.float64) for column in ("open", "close", "high", "low") + _SUMS}
+        bars.update({column: np.zeros(0, dtype=np.int64) for column in ("begin", "end", "bucket", "session")})
+        bars["key"] = np.zeros(0, dtype=object)
+        return bars
+
+
+def resample_candles(
+        frame: pd.DataFrame,
+        rule: Union[int, str, pd.Timedelta],
+        sessions: Optional[Dict[int, str]] = dictionaries.SESSION_TIMES,
+        by: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Бары интервала rule из фрейма свечей целиком. Параметры - как у CandleResampler.
+    """
+    resampler = CandleResampler(rule, sessions, by)
+    return pd.concat([resampler.update(frame), resampler.flush()], ignore_index=True)
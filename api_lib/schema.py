@@ -0,0 +1,95 @@
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+
+
+def _to_float(values: tuple) -> Any:
+    try:
+        return np.array(values, dtype="float64")
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy()
+
+
+def _to_int(dtype: str) -> Callable[[tuple], Any]:
+    def convert(values: tuple) -> Any:
+        try:
+            array = pd.array(values, dtype=dtype.capitalize())  # Nullable Int32/Int64
+        except (TypeError, ValueError):
+            return _to_float(values)
+        return array if array.isna().any() else array.to_numpy(dtype=dtype)
+    return convert
+
+
+def _to_datetime(date_format: str) -> Callable[[tuple], Any]:
+    def convert(values: tuple) -> Any:  # Нули вида 0000-00-00 становятся NaT
+        return pd.to_datetime(pd.Series(values, dtype=object), format=date_format, errors="coerce")
+    return convert
+
+
+def _to_time(values: tuple) -> Any:
+    return pd.to_timedelta(pd.Series(values, dtype=object), errors="coerce")
+
+
+def _to_string(values: tuple) -> Any:
+    if len(values) >= dictionaries.CATEGORY_MIN_ROWS and len(set(values)) / len(values) <= dictionaries.CATEGORY_RATIO:
+        return pd.Categorical(values)
+    return np.array(values, dtype=object)
+
+
+ISS_TYPES: Dict[str, Callable[[tuple], Any]] = {
+    "double": _to_float,
+    "int32": _to_int("int32"),
+    "int64": _to_int("int64"),
+    "date": _to_datetime("%Y-%m-%d"),
+    "datetime": _to_datetime("%Y-%m-%d %H:%M:%S"),
+    "time": _to_time,
+    "string": _to_string,
+}
+
+
+def get_schema(response: dict) -> Dict[str, Dict[str, str]]:
+    """
+    :param response: ответ ISS, запрошенный с iss.meta=on.
+    :return: типы колонок по блокам: {блок: {колонка: тип ISS}}.
+    """
+    return {
+        block: {column: meta.get("type") for column, meta in value["metadata"].items()}
+        for block, value in response.items()
+        if isinstance(value, dict) and isinstance(value.get("metadata"), dict)
+    }
+
+
+def typed_dataframe(data: List[list], columns: List[str], column_types: Dict[str, str]) -> pd.DataFrame:
+    """
+    Собирает фрейм по колонкам, приводя каждую к типу из метаданных ISS: числа - к float64/int, даты и время -
+    к datetime64/timedelta64, строки с малым числом уникальных значений - к category.
+    Колонки с неизвестным типом (undefined) остаются как есть.
+    """
+    if not data:
+        return pd.DataFrame(data=data, columns=columns)
+    result = {}
+    for column, values in zip(columns, zip(*data)):
+        convert = ISS_TYPES.get(column_types.get(column))
+        result[column] = convert(values) if convert is not None else list(values)
+    return pd.DataFrame(result, columns=columns)
+
+
+def concat_typed(frames: List[pd.DataFrame], column_types: Dict[str, str]) -> pd.DataFrame:
+    """
+    Склейка типизированных фреймов страниц одного блока. Решение о category для строковых колонок принимается
+    заново по всем строкам: категории страниц различаются, и pd.concat превратил бы такие колонки в строки.
+    """
+    result = pd.concat(frames, ignore_index=True)
+    strings = [column for column in result.columns if column_types.get(column) == "string"]
+    if not strings or result.empty:
+        return result
+    data = {}
+    for column in result.columns:
+        values = result[column]
+        if column in strings:  # Пропуски страниц возвращаются к None, как в ответе ISS
+            values = _to_string(tuple(values.astype(object).where(values.notna(), None)))
+        data[column] = values
+    return pd.DataFrame(data, columns=result.columns)
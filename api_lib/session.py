@@ -0,0 +1,67 @@
+from typing import Any, Callable, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import api_lib.dictionaries as dictionaries
+
+
+class ObservedRetry(Retry):
+    """
+    Retry, сообщающий о каждом повторе: on_retry(status=...) при повторе по статусу ответа,
+    on_retry(error=...) - при обрыве соединения. Вызывается в потоке запроса.
+    """
+
+    def __init__(self, *args: Any, on_retry: Optional[Callable[..., Any]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.on_retry = on_retry
+
+    def new(self, **kwargs: Any) -> "ObservedRetry":
+        retry = super().new(**kwargs)
+        retry.on_retry = self.on_retry
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None) -> Retry:
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)  # MaxRetryError, если повторов нет
+        if self.on_retry is not None:
+            if response is not None and error is None:
+                self.on_retry(status=response.status)
+            else:
+                self.on_retry(error=type(error).__name__)
+        return retry
+
+
+def create_session(
+        pool_size: int = dictionaries.POOL_SIZE,
+        retries: int = dictionaries.MAX_RETRIES,
+        backoff_factor: float = dictionaries.BACKOFF_FACTOR,
+        retry_statuses: Iterable[int] = dictionaries.RETRY_STATUSES,
+        on_retry: Optional[Callable[..., Any]] = None,
+) -> requests.Session:
+    """
+    Сессия с keep-alive и пулом соединений. Запросы, упавшие по статусу из retry_statuses или по обрыву
+    соединения, повторяются до retries раз с экспоненциальной задержкой backoff_factor * 2 ** (n - 1).
+    :param pool_size: число соединений, которые держит пул. Стоит держать не меньше MAX_WORKERS;
+    :param retries: число повторов запроса;
+    :param backoff_factor: базовая задержка между повторами в секундах;
+    :param retry_statuses: статусы ответа, при которых запрос повторяется;
+    :param on_retry: вызывается на каждом повторе (см. ObservedRetry).
+    """
+    retry = ObservedRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=tuple(retry_statuses),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        on_retry=on_retry,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
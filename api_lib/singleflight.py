@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: Any):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных вызовов: пока вызов с ключом key выполняется, остальные вызовы с тем же
+    ключом не запускают свой, а ждут и получают его результат (или его исключение).
+    Если результат достался нескольким вызовам, каждый получает свою копию copy(result), чтобы изменения
+    одного вызывающего не были видны остальным.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Any], copy: Callable[[Any], Any] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call(Future())
+            else:
+                call.waiters += 1
+        if not is_leader:
+            result = call.future.result()
+            return copy(result) if copy is not None else result
+
+        try:
+            result = func()
+        except BaseException as error:
+            with self._lock:
+                del self._calls[key]
+            call.future.set_exception(error)
+            raise
+        with self._lock:  # После удаления ключа новые вызовы не присоединятся и waiters не изменится
+            del self._calls[key]
+        call.future.set_result(result)
+        return copy(result) if copy is not None and call.waiters else result
+
+
+class AsyncSingleFlight:
+    """
+    То же, что SingleFlight, для корутин одного event loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(
+            self, key: Hashable, func: Callable[[], Awaitable[Any]], copy: Callable[[Any], Any] = None
+    ) -> Any:
+        call = self._calls.get(key)
+        if call is not None:
+            call.waiters += 1
+            result = await asyncio.shield(call.future)  # Отмена ожидающего не отменяет общий вызов
+            return copy(result) if copy is not None else result
+
+        call = self._calls[key] = _Call(asyncio.get_running_loop().create_future())
+        try:
+            result = await func()
+        except BaseException as error:
+            del self._calls[key]
+            if isinstance(error, asyncio.CancelledError):
+                call.future.cancel()
+                raise
+            call.future.set_exception(error)
+            if not call.waiters:
+                call.future.exception()  # Исключение получит вызывающий, ожидающих нет
+            raise
+        del self._calls[key]
+        call.future.set_result(result)
+        return copy(result) if copy is not None and call.waiters else result
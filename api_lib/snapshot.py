@@ -0,0 +1,38 @@
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+
+def read_snapshot(path: str, ttl: Optional[float]) -> Optional[dict]:
+    """
+    Прочитать локальный снимок глобальных справочников.
+    :param path: путь к файлу снимка;
+    :param ttl: срок годности снимка в секундах. None - снимок читается независимо от возраста.
+    :return: содержимое снимка или None, если снимка нет, он устарел или поврежден.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    if ttl is not None and time.time() - snapshot.get("saved_at", 0) > ttl:
+        return None
+    return snapshot
+
+
+def write_snapshot(path: str, data: dict) -> None:
+    """
+    Атомарно сохранить снимок: параллельно стартующие процессы не увидят недописанный файл.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as snapshot_file:
+            json.dump({**data, "saved_at": time.time()}, snapshot_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
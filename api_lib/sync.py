@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+from typing import Any, Optional, Tuple, Union
+
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+
+class IncrementalSync:
+    """
+    Инкрементальная загрузка: для каждого набора данных (эндпоинт + параметры запроса) хранится локальная копия
+    и водяной знак - последний TRADENO для сделок или последняя дата (TRADEDATE, begin свечи) для истории и свечей.
+    Очередной sync запрашивает только данные начиная с водяного знака и дописывает их в копию без дубликатов.
+
+    Пример:
+        sync = IncrementalSync()
+        new_rows = sync.sync(155, engine="stock", market="shares", security="GAZP", interval=24, _from="2010-01-01")
+        history = sync.load(155, engine="stock", market="shares", security="GAZP", interval=24)
+    """
+
+    def __init__(self, api: MoexApi = None, path: str = dictionaries.SYNC_PATH):
+        self.api = api or MoexApi()
+        self.path = path
+
+    @staticmethod
+    def _get_watermark_rule(api_id: Union[int, str]) -> Tuple[str, str, str]:
+        """
+        :return: блок данных, колонка водяного знака и параметр запроса, в который он передается.
+        """
+        api_dict = MoexApi._check_and_get_api_dict(api_id)
+        api_params = api_dict.get("params", {})
+        for block, block_data in api_dict["return_data"].items():
+            for column, param in dictionaries.SYNC_WATERMARKS:
+                if column in block_data.get("columns", []) and param in api_params:
+                    return block, column, param
+        raise KeyError(f"Эндпоинт {api_id} не поддерживает инкрементальную загрузку")
+
+    def _get_dataset_path(self, api_id: Union[int, str], kwargs: dict) -> str:
+        key_params = sorted(
+            (param, str(value)) for param, value in kwargs.items() if param not in dictionaries.SYNC_SKIP_PARAMS
+        )
+        key = hashlib.sha1(json.dumps([str(api_id), key_params], ensure_ascii=False).encode()).hexdigest()
+        return os.path.join(self.path, str(api_id), key)
+
+    def watermark(self, api_id: Union[int, str], **kwargs: Any) -> Optional[Any]:
+        """
+        :return: текущий водяной знак набора данных или None, если данные еще не загружались.
+        """
+        try:
+            with open(self._get_dataset_path(api_id, kwargs) + ".json", "r", encoding="utf-8") as state_file:
+                return json.load(state_file)["watermark"]
+        except FileNotFoundError:
+            return None
+
+    def load(self, api_id: Union[int, str], **kwargs: Any) -> pd.DataFrame:
+        """
+        :return: локальная копия набора данных (пустой фрейм, если данные еще не загружались).
+        """
+        try:
+            return pd.read_pickle(self._get_dataset_path(api_id, kwargs) + ".pkl")
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+    def sync(self, api_id: Union[int, str], **kwargs: Any) -> pd.DataFrame:
+        """
+        Догрузить новые данные набора.
+        :param api_id: id эндпоинта;
+        :param kwargs: параметры request. Начало периода (_from, tradeno) используется только при первой загрузке.
+        :return: Строки, полученные этим вызовом.
+        """
+        block, column, param = self._get_watermark_rule(api_id)
+        dataset_path = self._get_dataset_path(api_id, kwargs)
+        stored = self.load(api_id, **kwargs)
+        watermark = self.watermark(api_id, **kwargs)
+
+        request_kwargs = dict(kwargs)
+        if watermark is not None:
+            if param == "tradeno":
+                request_kwargs.update(tradeno=int(watermark), next_trade=1)
+            else:  # Последний день перезапрашивается: он мог быть загружен до окончания торгов
+                request_kwargs.pop("from", None)
+                request_kwargs["_from"] = str(watermark)[:10]
+        new_rows = self.api.request(api_id, blocks=[block], **request_kwargs)
+        if new_rows.empty:
+            return new_rows
+
+        keys = [column] + [key for key in dictionaries.DATE_SPLIT_ID_KEYS if key in new_rows.columns]
+        merged = pd.concat([stored, new_rows], ignore_index=True) if not stored.empty else new_rows
+        merged = merged.drop_duplicates(subset=keys, keep="last", ignore_index=True)
+        # На срочном рынке номера сделок не монотонны, поэтому водяной знак сделок - номер последней из них
+        new_watermark = new_rows[column].iloc[-1] if param == "tradeno" else new_rows[column].max()
+
+        os.makedirs(os.path.dirname(dataset_path), exist_ok=True)
+        merged.to_pickle(dataset_path + ".pkl.tmp")
+        os.replace(dataset_path + ".pkl.tmp", dataset_path + ".pkl")
+        with open(dataset_path + ".json", "w", encoding="utf-8") as state_file:
+            json.dump(
+                {"api_id": str(api_id), "params": {key: str(value) for key, value in kwargs.items()},
+                 "watermark": new_watermark.item() if hasattr(new_watermark, "item") else str(new_watermark)},
+                state_file,
+                ensure_ascii=False,
+            )
+        return new_rows
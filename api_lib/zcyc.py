@@ -0,0 +1,286 @@
+import warnings
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+
+_PARAMS = ["B1", "B2", "B3", "T1"] + [f"G{idx}" for idx in range(1, dictionaries.ZCYC_TERMS + 1)]
+Tenors = Union[float, Iterable[float], np.ndarray]
+
+
+def _get_terms() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: центры a и ширины b поправок G1..G9.
+    """
+    steps = dictionaries.ZCYC_A2 * dictionaries.ZCYC_K ** np.arange(dictionaries.ZCYC_TERMS - 1)
+    centers = np.concatenate([[0.], np.cumsum(steps)])
+    widths = dictionaries.ZCYC_A2 * dictionaries.ZCYC_K ** np.arange(dictionaries.ZCYC_TERMS)
+    return centers, widths
+
+
+_CENTERS, _WIDTHS = _get_terms()
+
+
+def _get_column(frame: pd.DataFrame, name: str) -> Optional[str]:
+    """
+    Колонка frame без учета регистра: эндпоинты отдают одни и те же поля то строчными, то прописными буквами.
+    """
+    columns = {column.upper(): column for column in frame.columns}
+    return columns.get(name.upper())
+
+
+def _get_moments(frame: pd.DataFrame) -> np.ndarray:
+    date, time = _get_column(frame, "TRADEDATE"), _get_column(frame, "TRADETIME")
+    moments = pd.to_datetime(frame[date].astype(str))
+    if time is not None:
+        moments += pd.to_timedelta(frame[time].astype(str))
+    return moments.to_numpy(dtype="datetime64[s]")
+
+
+def _g_curve(params: np.ndarray, tenors: np.ndarray) -> np.ndarray:
+    """
+    Значение G-кривой в базисных пунктах (непрерывно начисляемая доходность).
+    :param params: параметры кривых, строка на кривую (n, 13);
+    :param tenors: сроки в годах, совместимые с (n, m).
+    """
+    b1, b2, b3, t1 = (params[:, idx, None] for idx in range(4))
+    gs = params[:, 4:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decay = np.exp(-tenors / t1)
+        # (T1 / t) * (1 - exp(-t / T1)) -> 1 при t -> 0
+        factor = np.where(tenors > 0, -np.expm1(-tenors / t1) * t1 / tenors, 1.)
+    humps = gs * np.exp(-(tenors[..., None, :] - _CENTERS[:, None]) ** 2 / _WIDTHS[:, None] ** 2)
+    return b1 + (b2 + b3) * factor - b3 * decay + humps.sum(axis=-2)
+
+
+class ZeroCurve:
+    """
+    Набор G-кривых (кривых бескупонной доходности) Мосбиржи: по строке параметров B1..B3, T1, G1..G9 на момент
+    расчета (tradedate, tradetime). Доходности и дисконт-факторы считаются сразу для всех кривых на сетке сроков
+    одной операцией numpy: результат - матрица (кривые, сроки).
+
+    Пример:
+        curve = ZeroCurve.from_frame(MOEX.request(783, date="2023-05-18"))
+        curve.yields([0.25, 0.5, 1, 2, 5, 10, 30])
+    """
+
+    def __init__(self, moments: np.ndarray, params: np.ndarray):
+        """
+        :param moments: моменты расчета кривых по возрастанию (datetime64);
+        :param params: параметры кривых (кривые, 13) в порядке B1, B2, B3, T1, G1..G9.
+        """
+        self.moments = moments
+        self.params = params
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "ZeroCurve":
+        """
+        :param frame: блок params эндпоинтов 634, 783 или блоки parameters, intraday эндпоинта 89.
+        Из нескольких кривых на момент (PARAMS_TYPE) остается ZCYC_PARAMS_TYPE.
+        """
+        params_type = _get_column(frame, "PARAMS_TYPE")
+        if params_type is not None:
+            frame = frame[frame[params_type] == dictionaries.ZCYC_PARAMS_TYPE]
+        columns = {
+            dictionaries.ZCYC_COLUMNS.get(column.upper(), column.upper()): column for column in frame.columns
+        }
+        missing = [column for column in _PARAMS[:4] if column not in columns]
+        if missing:
+            raise ValueError(f"Во фрейме нет параметров кривой: {missing}")
+        params = np.zeros((len(frame), len(_PARAMS)), dtype=np.float64)
+        for idx, column in enumerate(_PARAMS):
+            if column in columns:
+                params[:, idx] = frame[columns[column]].to_numpy(dtype=np.float64, na_value=0)
+        moments = _get_moments(frame)
+        order = np.argsort(moments, kind="stable")
+        return cls(moments[order], params[order])
+
+    def __len__(self) -> int:
+        return len(self.moments)
+
+    def __getitem__(self, idx: Any) -> "ZeroCurve":
+        return ZeroCurve(self.moments[idx], self.params[idx])
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.params, index=pd.DatetimeIndex(self.moments, name="moment"), columns=_PARAMS)
+
+    def g_values(self, tenors: Tenors) -> np.ndarray:
+        """
+        :return: G-кривые в базисных пунктах, матрица (кривые, сроки).
+        """
+        tenors = np.atleast_1d(np.asarray(tenors, dtype=np.float64))
+        return _g_curve(self.params, tenors[None, :])
+
+    def yields(self, tenors: Tenors) -> np.ndarray:
+        """
+        :param tenors: сроки в годах;
+        :return: доходности в процентах годовых (как в yearyields эндпоинта 634), матрица (кривые, сроки).
+        """
+        return np.expm1(self.g_values(tenors) / 10000) * 100
+
+    def discount_factors(self, tenors: Tenors) -> np.ndarray:
+        """
+        :return: дисконт-факторы exp(-G * t), матрица (кривые, сроки).
+        """
+        tenors = np.atleast_1d(np.asarray(tenors, dtype=np.float64))
+        return np.exp(-self.g_values(tenors) / 10000 * tenors)
+
+    def yield_frame(self, tenors: Tenors) -> pd.DataFrame:
+        tenors = np.atleast_1d(np.asarray(tenors, dtype=np.float64))
+        return pd.DataFrame(self.yields(tenors), index=pd.DatetimeIndex(self.moments, name="moment"),
+                            columns=pd.Index(tenors, name="period"))
+
+    def locate(self, moments: Any) -> np.ndarray:
+        """
+        :param moments: моменты или даты. Для даты берется последняя кривая этого дня;
+        :return: номера последних кривых, рассчитанных не позже moments. -1, если таких нет.
+        """
+        moments = np.asarray(moments)
+        if np.issubdtype(moments.dtype, np.datetime64):
+            moments = moments.astype("datetime64[s]")
+        else:
+            moments = pd.to_datetime(pd.Series(moments)).to_numpy(dtype="datetime64[s]")
+        # Дата без времени - конец дня
+        moments = np.where(moments == moments.astype("datetime64[D]"), moments + np.timedelta64(86399, "s"), moments)
+        return np.searchsorted(self.moments, moments, side="right") - 1
+
+    def yields_at(self, moments: Any, tenors: Tenors) -> np.ndarray:
+        """
+        Поэлементно: доходность кривой, действующей на moments[i], для срока tenors[i].
+        :return: доходности в процентах, NaN - если на момент нет кривой.
+        """
+        idx = self.locate(moments)
+        tenors = np.broadcast_to(np.asarray(tenors, dtype=np.float64), idx.shape)
+        params = self.params[np.maximum(idx, 0)] if len(self) else np.full((len(idx), len(_PARAMS)), np.nan)
+        values = np.expm1(_g_curve(params, tenors[:, None])[:, 0] / 10000) * 100
+        values[idx < 0] = np.nan
+        return values
+
+
+class ZeroCurveStore:
+    """
+    Кэш G-кривых по (tradedate, tradetime). Кривые недостающих дат загружаются из эндпоинта 783 (все кривые
+    дня) в MAX_WORKERS потоков через общий ограничитель частоты, уже загруженные даты повторно не запрашиваются.
+
+    Пример:
+        store = ZeroCurveStore()
+        curve = store.curve(pd.bdate_range("2020-01-01", "2023-05-18").date)  # последняя кривая каждого дня
+        curve.yields(np.arange(0.25, 30.25, 0.25))
+    """
+
+    API_ID = "783"
+
+    def __init__(self, api: MoexApi = None, api_id: Union[int, str] = API_ID, **kwargs: Any):
+        """
+        :param api_id: эндпоинт кривых с параметром date: 783 (история внутри дня) или 634 (кривая на конец дня);
+        :param kwargs: прочие параметры эндпоинта, например engine="stock" для 634.
+        """
+        self.api = api or MoexApi()
+        self.api_id = str(api_id)
+        self.kwargs = kwargs
+        self._curves: Dict[Tuple[str, str], np.ndarray] = {}
+        self._dates: set = set()  # Загруженные даты, в том числе без кривых
+        self._curve: Optional[ZeroCurve] = None  # Все кривые кэша, собираются при изменении
+
+    def add(self, frame: pd.DataFrame) -> None:
+        """
+        Добавить в кэш кривые из фрейма параметров (см. ZeroCurve.from_frame).
+        """
+        curve = ZeroCurve.from_frame(frame)
+        for moment, params in zip(curve.moments, curve.params):
+            date, time = str(moment).split("T")
+            self._curves[(date, time)] = params
+            self._dates.add(date)
+        self._curve = None
+
+    def _fetch(self, date: str) -> pd.DataFrame:
+        return self.api.request(self.api_id, blocks=["params"], **self.kwargs, date=date)
+
+    def load(self, dates: Iterable[Any]) -> None:
+        """
+        Загрузить кривые дат, которых еще нет в кэше.
+        """
+        dates = [date for date in dict.fromkeys(str(pd.Timestamp(date).date()) for date in dates)
+                 if date not in self._dates]
+        if not dates:
+            return
+        frames, errors = self.api.map_threads(self._fetch, dates)
+        for date, frame in frames.items():
+            if not frame.empty:
+                self.add(frame)
+            self._dates.add(date)
+        if errors:
+            warnings.warn(f"Не загружены кривые на даты: {sorted(errors)}: {next(iter(errors.values()))}")
+
+    def curve(self, dates: Iterable[Any] = None, last: bool = True) -> ZeroCurve:
+        """
+        :param dates: даты кривых. Недостающие загружаются. None - все кривые кэша;
+        :param last: для каждой даты только последняя кривая дня;
+        :return: кривые по возрастанию момента расчета.
+        """
+        if dates is not None:
+            dates = list(dates)
+            self.load(dates)
+        if self._curve is None:
+            keys = sorted(self._curves)
+            moments = np.array([f"{date}T{time}" for date, time in keys], dtype="datetime64[s]")
+            params = np.array([self._curves[key] for key in keys]).reshape(len(keys), len(_PARAMS))
+            self._curve = ZeroCurve(moments, params)
+        curve = self._curve
+        days = curve.moments.astype("datetime64[D]")
+        mask = np.ones(len(curve), dtype=bool)
+        if dates is not None:
+            mask &= np.isin(days, np.array([str(pd.Timestamp(date).date()) for date in dates], dtype="datetime64[D]"))
+        if last:
+            mask &= np.append(days[1:] != days[:-1], True)
+        return curve[mask]
+
+
+def price_bonds(
+        bonds: pd.DataFrame,
+        curve: ZeroCurve,
+        accints: Optional[pd.DataFrame] = None,
+        yield_column: str = "EFFECTIVEYIELD",
+        duration_column: str = "DURATION",
+        price_column: str = "PRICE",
+) -> pd.DataFrame:
+    """
+    Оценка облигаций по G-кривой сразу для всего фрейма: каждая строка сравнивается с последней кривой своей даты.
+    Графиков купонов эндпоинты не дают, поэтому облигация приводится к бескупонной со сроком, равным дюрации,
+    а цена по кривой - к первому порядку по модифицированной дюрации.
+    :param bonds: фрейм доходностей (блок history_yields эндпоинта 791 или securities эндпоинта 634);
+    :param curve: кривые (ZeroCurve или ZeroCurveStore.curve(даты));
+    :param accints: накопленный купонный доход из эндпоинта 933: заполняет пустой ACCINT по (tradedate, secid);
+    :param yield_column: колонка доходности облигации, %;
+    :param duration_column: колонка дюрации, дней;
+    :param price_column: колонка чистой цены, % от номинала;
+    :return: bonds с колонками CURVEYIELD (%), GSPREAD (б.п.), DISCOUNT (дисконт-фактор на дюрацию),
+    CURVEPRICE (цена по кривой, % от номинала).
+    """
+    result = bonds.copy()
+    date = _get_column(result, "TRADEDATE")
+    if accints is not None:
+        secid, accint = _get_column(result, "SECID"), _get_column(result, "ACCINT") or "ACCINT"
+        keys = pd.MultiIndex.from_arrays([accints[_get_column(accints, "TRADEDATE")].astype(str),
+                                          accints[_get_column(accints, "SECID")]])
+        values = pd.Series(accints[_get_column(accints, "ACCINT")].to_numpy(), index=keys)
+        values = values[~values.index.duplicated(keep="last")]
+        found = values.reindex(pd.MultiIndex.from_arrays([result[date].astype(str), result[secid]])).to_numpy()
+        current = result[accint] if accint in result.columns else pd.Series(np.nan, index=result.index)
+        result[accint] = current.fillna(pd.Series(found, index=result.index))
+
+    tenors = result[_get_column(result, duration_column)].to_numpy(dtype=np.float64, na_value=np.nan)
+    tenors = tenors / dictionaries.ZCYC_DAYS
+    bond_yields = result[_get_column(result, yield_column)].to_numpy(dtype=np.float64, na_value=np.nan)
+    prices = result[_get_column(result, price_column)].to_numpy(dtype=np.float64, na_value=np.nan)
+    curve_yields = curve.yields_at(result[date].astype(str).to_numpy(), tenors)
+
+    result["CURVEYIELD"] = curve_yields
+    result["GSPREAD"] = (bond_yields - curve_yields) * 100
+    result["DISCOUNT"] = (1 + curve_yields / 100) ** -tenors
+    modified_duration = tenors / (1 + bond_yields / 100)
+    result["CURVEPRICE"] = prices * (1 + modified_duration * (bond_yields - curve_yields) / 100)
+    return result
@@ -0,0 +1,183 @@
+"""
+Бенчмарк MoexApi.request без сети на сохраненных ответах ISS (notebooks/moex_api_response).
+
+Для каждого эндпоинта и числа страниц замеряются:
+    - время этапов: валидация и сборка url/параметров (_prepare_request), загрузка и склейка страниц
+      (_request_pages), сборка фреймов (_dataframe_create);
+    - сквозная задержка request (p50/p95/p99), пропускная способность в запросах и строках в секунду;
+    - пиковая память одного вызова request (tracemalloc).
+
+Запуск:
+    python benchmarks/bench_request.py --api-ids 63 33 155 --pages 1 10 50 --repeat 20
+    python benchmarks/bench_request.py --save baseline.json
+    python benchmarks/bench_request.py --compare baseline.json --threshold 0.2  # код 1 при регрессии p50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_lib.dictionaries as dictionaries  # noqa: E402
+from api_lib.limiter import RateLimiter  # noqa: E402
+from api_lib.main import GLOBAL_API, MoexApi  # noqa: E402
+from api_lib.replay import ReplaySession  # noqa: E402
+
+ENTITY_VALUES = {  # Значения сущностей пути, проходящие валидацию по сохраненным справочникам
+    "asset": "Si",
+    "board": "TQBR",
+    "boardgroup": "stock_shares_tplus",
+    "collection": "stock_index_all",
+    "datatype": "trades",
+    "engine": "stock",
+    "event_id": 1,
+    "indexid": "IMOEX",
+    "market": "shares",
+    "news_id": 1,
+    "security": "GAZP",
+    "securitygroup": "stock_index",
+    "session": 1,
+    "year": 2020,
+}
+
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def create_api(pages: int) -> MoexApi:
+    moex = MoexApi()
+    moex.use_session(ReplaySession(pages=pages))
+    # Справочники берутся из сохраненных ответов, локальный снимок пользователя не читается и не перезаписывается
+    moex._set_global_dictionaries(
+        moex.session.get(dictionaries.DICTIONARY_API_URL).json(), moex.session.get(dictionaries.INDEX_ID_API_URL).json()
+    )
+    return moex
+
+
+def get_cases(api_ids: Optional[List[str]]) -> Dict[str, dict]:
+    if not api_ids:
+        api_ids = sorted(
+            (file_name[:-5] for file_name in os.listdir(dictionaries.REPLAY_PATH) if file_name.endswith(".json")),
+            key=int,
+        )
+    return {
+        api_id: {entity: ENTITY_VALUES[entity] for entity in GLOBAL_API[api_id].get("global_entities") or []}
+        for api_id in api_ids if api_id in GLOBAL_API
+    }
+
+
+def count_rows(result) -> int:
+    frames = result.values() if isinstance(result, dict) else [result]
+    return sum(len(frame) for frame in frames)
+
+
+def bench_case(moex: MoexApi, api_id: str, kwargs: dict, repeat: int) -> dict:
+    stages = {"prepare": [], "pages": [], "frames": []}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        api_dict, url, use_params = moex._prepare_request(api_id, False, None, dict(kwargs))
+        prepared = time.perf_counter()
+        data = moex._request_pages(api_dict, url, use_params)
+        fetched = time.perf_counter()
+        moex._dataframe_create(data)
+        stages["prepare"].append(prepared - started)
+        stages["pages"].append(fetched - prepared)
+        stages["frames"].append(time.perf_counter() - fetched)
+
+    latencies = []
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = count_rows(moex.request(api_id, **kwargs))
+        latencies.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    moex.request(api_id, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        "rows": rows,
+        "p50_ms": percentile(latencies, .5) * 1000,
+        "p95_ms": percentile(latencies, .95) * 1000,
+        "p99_ms": percentile(latencies, .99) * 1000,
+        "req_per_s": repeat / total,
+        "rows_per_s": rows * repeat / total,
+        "peak_mb": peak / 1024 ** 2,
+        **{f"{stage}_ms": statistics.median(values) * 1000 for stage, values in stages.items()},
+    }
+
+
+def run(api_ids: Optional[List[str]], pages_list: List[int], repeat: int) -> Dict[str, dict]:
+    MoexApi.rate_limiter = RateLimiter(10 ** 9)  # Ограничение частоты нужно только живому API
+    results = {}
+    cases = get_cases(api_ids)
+    for pages in pages_list:
+        moex = create_api(pages)
+        for api_id, kwargs in cases.items():
+            try:
+                results[f"{api_id}/{pages}"] = bench_case(moex, api_id, kwargs, repeat)
+            except Exception as error:  # Эндпоинт без подходящих параметров или сохраненного ответа
+                print(f"{api_id}/{pages}: пропущен ({type(error).__name__}: {error})", file=sys.stderr)
+    return results
+
+
+def report(results: Dict[str, dict]) -> str:
+    columns = ["rows", "p50_ms", "p95_ms", "p99_ms", "req_per_s", "rows_per_s", "peak_mb",
+               "prepare_ms", "pages_ms", "frames_ms"]
+    lines = ["{:<10}".format("api/pages") + "".join(f"{column:>12}" for column in columns)]
+    for case, values in results.items():
+        lines.append(f"{case:<10}" + "".join(
+            f"{values[column]:>12d}" if column == "rows" else f"{values[column]:>12.3f}" for column in columns
+        ))
+    return "\n".join(lines)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    regressions = []
+    for case, values in results.items():
+        base = baseline.get(case)
+        if base and values["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            regressions.append(f"{case}: p50 {base['p50_ms']:.3f} -> {values['p50_ms']:.3f} ms")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-ids", nargs="*", help="id эндпоинтов. По умолчанию - все сохраненные ответы")
+    parser.add_argument("--pages", nargs="*", type=int, default=[1, 10], help="число страниц пагинации")
+    parser.add_argument("--repeat", type=int, default=10, help="число повторов каждого замера")
+    parser.add_argument("--output", help="сохранить таблицу результатов в файл")
+    parser.add_argument("--save", help="сохранить результаты в json для последующего сравнения")
+    parser.add_argument("--compare", help="json с результатами предыдущего запуска")
+    parser.add_argument("--threshold", type=float, default=.2, help="допустимый рост p50 относительно --compare")
+    args = parser.parse_args()
+
+    results = run(args.api_ids, args.pages, args.repeat)
+    table = report(results)
+    print(table)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(table + "\n")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as save_file:
+            json.dump(results, save_file, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"Регрессия {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+from typing import Callable, Dict, Iterable, Optional
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_lib.dictionaries as dictionaries  # noqa: E402
+from api_lib.limiter import RateLimiter  # noqa: E402
+from api_lib.main import MoexApi  # noqa: E402
+from api_lib.replay import ReplayResponse, ReplaySession  # noqa: E402
+
+# Общее состояние класса MoexApi, которое тесты меняют и возвращают обратно
+_CLASS_STATE = ("rate_limiter", "cache", "parse_pool", "securities_master", "MAX_RETRIES")
+
+
+class FailingSession(ReplaySession):
+    """
+    ReplaySession, отвечающий статусом status на страницы со смещениями fail_starts (первые times раз).
+    """
+
+    def __init__(self, fail_starts: Iterable[int], status: int = 503, times: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_starts = {int(start): times for start in fail_starts}
+        self.status = status
+        self.calls = []
+
+    def get(self, url: str, params: dict = None, **kwargs) -> ReplayResponse:
+        start = int((params or {}).get("start", 0))
+        self.calls.append((url, dict(params or {})))
+        if self.fail_starts.get(start):
+            self.fail_starts[start] -= 1
+            return ReplayResponse(b"{}", self.status, url)
+        return super().get(url, params, **kwargs)
+
+
+class RetypedSession(FailingSession):
+    """
+    ReplaySession, в метаданных ответов которого на url с url_part колонки columns имеют другие типы ISS:
+    как у одного эндпоинта на разных рынках.
+    """
+
+    def __init__(self, url_part: str, columns: Dict[str, str], **kwargs):
+        super().__init__([], **kwargs)
+        self.url_part = url_part
+        self.columns = columns
+
+    def _respond(self, url: str, params: Optional[dict]) -> ReplayResponse:
+        response = super()._respond(url, params)
+        if self.url_part not in url or response.status_code != 200:
+            return response
+        content = json.loads(response.content)
+        for block in content.values():
+            for column, column_type in self.columns.items():
+                if column in block.get("metadata", {}):
+                    block["metadata"][column] = {**block["metadata"][column], "type": column_type}
+        return ReplayResponse(json.dumps(content).encode(), response.status_code, url)
+
+
+def load_dictionaries(api: MoexApi) -> None:
+    """
+    Справочники из сохраненных ответов: локальный снимок пользователя не читается и не перезаписывается.
+    """
+    api._set_global_dictionaries(
+        api.session.get(dictionaries.DICTIONARY_API_URL).json(), api.session.get(dictionaries.INDEX_ID_API_URL).json()
+    )
+
+
+def unload_dictionaries(api: MoexApi) -> None:
+    """
+    Забыть загруженные справочники, как у только что созданного клиента.
+    """
+    api.__dict__.pop("_raw_dictionaries", None)
+    for entity in api.available_entities:
+        api.__dict__.pop(entity, None)
+        api.__dict__.pop(f"_set_{entity}", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_paths(tmp_path, monkeypatch):
+    """
+    Снимок справочников и общие файлы пишутся во временный каталог теста.
+    """
+    for name in ("DICTIONARY_SNAPSHOT_PATH", "RATE_LIMIT_PATH"):
+        monkeypatch.setattr(dictionaries, name, str(tmp_path / os.path.basename(getattr(dictionaries, name))))
+    saved = {name: MoexApi.__dict__[name] for name in _CLASS_STATE}
+    MoexApi.rate_limiter = RateLimiter(10 ** 9, 10 ** 9)
+    MoexApi.cache = None
+    MoexApi.parse_pool = None
+    MoexApi.securities_master = None
+    MoexApi._page_sizes.clear()
+    MoexApi._schemas.clear()
+    yield tmp_path
+    for name, value in saved.items():
+        setattr(MoexApi, name, value)
+    MoexApi._page_sizes.clear()
+
+
+@pytest.fixture
+def make_api() -> Callable[..., MoexApi]:
+    """
+    Фабрика MoexApi на сохраненных ответах ISS: make_api(pages=10) или make_api(session=FailingSession(...)).
+    """
+    def create(pages: int = 1, session: ReplaySession = None) -> MoexApi:
+        api = MoexApi()
+        api.use_session(session or ReplaySession(pages=pages))
+        load_dictionaries(api)
+        return api
+    return create
+
+
+@pytest.fixture
+def api(make_api) -> MoexApi:
+    return make_api()
@@ -0,0 +1,152 @@
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+import api_lib.dictionaries as dictionaries
+from api_lib.archive import ArchiveDownloader, _get_period
+from api_lib.main import MoexApi
+from conftest import RetypedSession
+
+SHARES = ("stock", "shares", "trades")
+COLUMNS = "TRADENO;TRADEDATE;TRADETIME;SECID;BOARDID;PRICE;QUANTITY;VALUE;EXTRA;SETTLECODE\n"
+
+
+def make_archive(rows: int = 2500) -> bytes:
+    # SETTLECODE числовой в первых строках: по первому фрейму pandas вывел бы для него число
+    csv = COLUMNS + "".join(
+        f"{idx};2022-01-{1 + idx % 28:02};10:00:{idx % 60:02};GAZP;TQBR;{100 + idx / 4};{idx};{idx * 100};Я;"
+        f"{idx if idx < 1000 else 'Y0'}\n" for idx in range(rows)
+    )
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("trades.csv", csv.encode(dictionaries.ARCHIVE_CSV["encoding"]))
+    return archive.getvalue()
+
+
+class DownloadResponse:
+    """
+    Ответ на загрузку архива: iter_content обрывается после cut байт, если cut задан.
+    """
+
+    def __init__(self, status_code: int, content: bytes, cut: int = None):
+        self.status_code = status_code
+        self.content = content
+        self.cut = cut
+
+    def iter_content(self, size: int):
+        for start in range(0, len(self.content), 100):
+            if self.cut is not None and start >= self.cut:
+                raise IOError("Соединение разорвано")
+            yield self.content[start:start + 100]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def make_archives(tmp_path, monkeypatch):
+    """
+    Фабрика ArchiveDownloader, который скачивает make_archive() по любой ссылке. В downloader.ranges - заголовки
+    Range запросов, downloader.cut - обрыв следующей загрузки.
+    """
+    content = make_archive()
+
+    def create(api: MoexApi) -> ArchiveDownloader:
+        downloader = ArchiveDownloader(api, path=str(tmp_path / "archives"))
+        downloader.ranges, downloader.cut = [], None
+        get = api.session.get
+
+        def download(url, params=None, headers=None, **kwargs):
+            if "/downloads/" not in url:
+                return get(url, params, **kwargs)
+            offset = int((headers or {}).get("Range", "bytes=0-")[6:-1])
+            downloader.ranges.append(offset)
+            cut, downloader.cut = downloader.cut, None
+            if offset >= len(content):
+                return DownloadResponse(416, b"")
+            return DownloadResponse(206 if offset else 200, content[offset:], cut)
+
+        monkeypatch.setattr(api.session, "get", download)
+        monkeypatch.setattr(downloader, "links", lambda engine, market, datatype, period: {
+            (year, month): f"https://iss.moex.com/iss/downloads/{engine}/{year}/{month}/trades.zip"
+            for year in range(1997, 2024) for month in ([None] if period == "yearly" else range(1, 13))
+        })
+        downloader.content = content
+        return downloader
+    return create
+
+
+@pytest.fixture
+def archives(api, make_archives):
+    return make_archives(api)
+
+
+@pytest.mark.parametrize("url, period", [
+    ("https://iss.moex.com/iss/downloads/engines/stock/markets/shares/years/2022/months/3/trades.zip", (2022, 3)),
+    ("http://iss.moex.com/a/2021-11.zip", (2021, 11)),
+    ("http://iss.moex.com/y/2019/securities.zip", (2019, None)),
+    ("http://iss.moex.com/y/securities.zip", (None, None)),
+])
+def test_period_from_link(url, period):
+    assert _get_period(url) == period
+
+
+def test_periods(archives):
+    periods = archives.periods(*SHARES, years=[2022, 1800])
+    assert periods[0] == (2022, 1) and all(year == 2022 for year, _ in periods)
+
+
+def test_interrupted_download_is_resumed(archives):
+    months = len(archives.periods(*SHARES, years=[2022]))
+    archives.cut = 300
+    with pytest.warns(UserWarning, match="Не загружено"):
+        assert len(archives.download(*SHARES, years=[2022])) == months - 1
+    assert len(archives.errors) == 1
+    archives.ranges.clear()
+    paths = archives.download(*SHARES, years=[2022])
+    assert len(paths) == months and not archives.errors
+    assert archives.ranges == [300]  # Скачанные файлы пропускаются, недокачанный - с места обрыва
+    with open(paths[0], "rb") as archive:
+        assert archive.read() == archives.content
+    archives.ranges.clear()
+    assert archives.download(*SHARES, years=[2022]) == paths and not archives.ranges
+
+
+def test_chunks_have_same_types(archives, tmp_path):
+    path = tmp_path / "trades.zip"
+    path.write_bytes(archives.content)
+    column_types = archives.api.column_types(35, engine="stock", market="shares")["trades"]
+    frames = list(archives.read_file(str(path), "trades", chunk_rows=1000, column_types=column_types))
+    assert [len(frame) for frame in frames] == [1000, 1000, 500]
+    assert all(frame.dtypes.equals(frames[0].dtypes) for frame in frames)
+    assert str(frames[0]["TRADENO"].dtype) == "Int64" and frames[0]["PRICE"].dtype == "float64"
+    assert frames[-1]["SETTLECODE"].iloc[-1] == "Y0" and frames[0]["EXTRA"].iloc[0] == "Я"
+    assert list(frames[0].columns[-2:]) == ["EXTRA", "SETTLECODE"]  # Колонок EXTRA и SETTLECODE нет в эндпоинте
+
+
+def test_to_lake_is_idempotent(archives, monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    from api_lib.lake import ParquetLake
+
+    lake = ParquetLake(archives.api, path=str(tmp_path / "lake"))
+    monkeypatch.setattr(archives, "periods", lambda *args: [(2022, 1)])
+    assert archives.to_lake(lake, *SHARES, years=[2022]) == 2500
+    assert archives.to_lake(lake, *SHARES, years=[2022]) == 2500
+    frame = lake.read(35, engine="stock")
+    assert len(frame) == 2500 and frame["TRADENO"].is_unique
+    assert pd.api.types.is_float_dtype(frame["PRICE"])
+
+
+def test_each_market_reads_with_own_types(make_api, make_archives, monkeypatch):
+    archives = make_archives(make_api(session=RetypedSession("/forts/", {"PRICE": "string"})))
+    monkeypatch.setattr(archives, "periods", lambda *args: [(2022, 1)])
+    shares = next(archives.read("stock", "shares", "trades", years=[2022]))
+    futures = next(archives.read("futures", "forts", "trades", years=[2022]))
+    assert shares["PRICE"].dtype == "float64"
+    assert not pd.api.types.is_numeric_dtype(futures["PRICE"])  # Типы рынка futures, а не закэшированные shares
+    assert str(futures["TRADENO"].dtype) == "Int64"
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import api_lib.dictionaries as dictionaries
+
+pytest.importorskip("aiohttp")
+
+from api_lib.async_main import AsyncMoexApi  # noqa: E402
+from api_lib.exceptions import MoexPartialDataError  # noqa: E402
+from api_lib.main import MoexApi  # noqa: E402
+from api_lib.replay import AsyncReplaySession, ReplayResponse  # noqa: E402
+
+HISTORY = {"engine": "stock", "market": "shares", "security": "GAZP"}
+
+
+class FailingAsyncSession(AsyncReplaySession):
+    """
+    AsyncReplaySession, отвечающий статусом 503 на страницы со смещениями fail_starts (первые times раз).
+    """
+
+    def __init__(self, fail_starts, times: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_starts = {start: times for start in fail_starts}
+
+    def _respond(self, url, params):
+        start = int((params or {}).get("start", 0))
+        if self.fail_starts.get(start):
+            self.fail_starts[start] -= 1
+            return ReplayResponse(b"{}", 503, url)
+        return super()._respond(url, params)
+
+
+def run(pages, coroutine, session=None):
+    async def main():
+        moex = AsyncMoexApi()
+        await moex.use_session(session or AsyncReplaySession(pages=pages))
+        await moex.open()
+        try:
+            return await coroutine(moex)
+        finally:
+            await moex.close()
+    return asyncio.run(main())
+
+
+def test_cursor_and_no_cursor_pages(make_api):
+    async def request(moex):
+        return await moex.request(63, **HISTORY), await moex.request(5)
+
+    history, securities = run(5, request)
+    expected = make_api(pages=5).request(63, **HISTORY)
+    assert history.equals(expected)
+    assert len(securities) == 500
+
+
+def test_dictionaries_are_loaded_on_open():
+    async def engines(moex):
+        return moex.engines
+
+    assert "stock" in run(1, engines).index
+
+
+def test_request_iter_yields_all_rows():
+    async def collect(moex):
+        return [frame async for _, frame in moex.request_iter(63, chunk_size=70, **HISTORY)]
+
+    frames = run(5, collect)
+    assert sum(len(frame) for frame in frames) == 500
+
+
+def test_failed_page_is_resumed(monkeypatch):
+    monkeypatch.setattr(MoexApi, "MAX_RETRIES", 0)
+
+    async def request(moex):
+        with pytest.raises(MoexPartialDataError) as error:
+            await moex.request(63, **HISTORY)
+        start, rows = error.value.start, len(error.value.partial_data["history"]["data"])
+        return start, rows, await moex.resume(error.value)
+
+    start, rows, frame = run(5, request, FailingAsyncSession([200], pages=5))
+    assert (start, rows) == (200, 200)
+    assert len(frame) == 500
+
+
+def test_server_error_is_retried(monkeypatch):
+    monkeypatch.setattr(MoexApi, "MAX_RETRIES", 2)
+    monkeypatch.setattr(dictionaries, "BACKOFF_FACTOR", 0)
+    events = []
+    MoexApi.instrumentation.add_hook(events.append)
+    try:
+        frame = run(3, lambda moex: moex.request(63, **HISTORY), FailingAsyncSession([100], times=2, pages=3))
+    finally:
+        MoexApi.instrumentation.remove_hook(events.append)
+    assert len(frame) == 300
+    assert [event.values.get("status") for event in events if event.stage == "retry"] == [503, 503]
+
+
+def test_schemas_are_cached_per_market():
+    async def request(moex):
+        for market in ("shares", "bonds"):
+            await moex.request(63, typed=True, engine="stock", market=market, security="GAZP")
+
+    run(1, request)
+    assert sorted(MoexApi._schemas) == [
+        f"/iss/history/engines/stock/markets/{market}/securities/GAZP.json" for market in ("bonds", "shares")
+    ]
@@ -0,0 +1,78 @@
+import api_lib.cache as cache_module
+from api_lib.cache import ResponseCache
+from api_lib.main import MoexApi
+from conftest import FailingSession
+
+URL = "http://iss.moex.com/iss/engines/stock/markets/shares/securities.json"
+
+
+class Clock:
+    def __init__(self, now: float = 1000.):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entry_expires_after_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl={"32": 10})
+    cache.set("32", URL, {"start": 0}, b"body")
+    clock.now += 9
+    assert cache.get(URL, {"start": 0}) == b"body"
+    clock.now += 2
+    assert cache.get(URL, {"start": 0}) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_closed_history_never_expires(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    history = "http://iss.moex.com/iss/history/engines/stock/markets/shares/securities.json"
+    assert cache.get_ttl("62", history, {"date": "2020-01-10"}) is None
+    assert cache.get_ttl("62", history, {"date": "2999-01-10"}) == cache.ttl.get("62", cache.default_ttl)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_size=10)
+    for start in range(3):
+        clock.now += 1
+        cache.set("5", URL, {"start": start}, b"1234")
+        if start == 1:
+            clock.now += 1
+            cache.get(URL, {"start": 0})
+    assert cache.get(URL, {"start": 1}) is None
+    assert cache.get(URL, {"start": 0}) == b"1234"
+    assert cache.stats()["size"] == 8
+
+
+def test_request_is_served_from_cache(make_api, tmp_path):
+    session = FailingSession([], pages=3)
+    api = make_api(session=session)
+    MoexApi.cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    first = api.request(63, engine="stock", market="shares", security="GAZP")
+    calls = len(session.calls)
+    assert calls == 3 + 2  # Страницы и два запроса справочников
+    assert api.request(63, engine="stock", market="shares", security="GAZP").equals(first)
+    assert len(session.calls) == calls
+    with MoexApi.bypass_cache():
+        api.request(63, engine="stock", market="shares", security="GAZP")
+    assert len(session.calls) == calls + 3
+
+
+def test_size_is_tracked_without_table_scans(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_size=100, ttl={"32": 5})
+    for start in range(30):
+        clock.now += 1
+        cache.set("32" if start % 3 else "5", URL, {"start": start % 20}, b"x" * (start % 7 + 1))
+    total = cache._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    assert cache._size == total == cache.stats()["size"] <= 100
+    assert ResponseCache(path)._size == total
+    for query in ("SELECT key FROM responses WHERE expires_at < 1", "SELECT key FROM responses ORDER BY last_access"):
+        plan = " ".join(row[-1] for row in cache._connection.execute(f"EXPLAIN QUERY PLAN {query}"))
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan
@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+import pytest
+
+import api_lib.dictionaries as dictionaries
+
+pytest.importorskip("pyarrow")
+
+from api_lib.lake import ParquetLake  # noqa: E402
+
+HISTORY = {"engine": "stock", "market": "shares", "security": "GAZP"}
+
+
+@pytest.fixture
+def lake(make_api, tmp_path):
+    return ParquetLake(make_api(pages=3), path=str(tmp_path / "lake"))
+
+
+def test_fetched_history_round_trip(lake):
+    fetched = lake.fetch(63, **HISTORY)
+    stored = lake.read(63, columns=list(fetched.columns))
+    key = ["TRADEDATE", "BOARDID"]
+    assert stored.sort_values(key, ignore_index=True).equals(
+        fetched.drop_duplicates(key + ["SECID"]).sort_values(key, ignore_index=True)
+    )
+    assert os.path.isdir(os.path.join(lake.path, "api_id=63", "block=history", "engine=stock", "market=shares"))
+
+
+def test_upsert_does_not_duplicate_rows(lake):
+    lake.fetch(63, **HISTORY)
+    rows = len(lake.read(63))
+    lake.fetch(63, **HISTORY)
+    assert len(lake.read(63)) == rows
+    appended = lake.fetch(63, mode="append", **HISTORY)
+    assert len(lake.read(63)) == rows + len(appended)
+
+
+def test_read_filters_dates_and_partitions(lake):
+    fetched = lake.fetch(63, typed=False, **HISTORY)
+    january = lake.read(63, columns=["TRADEDATE"], date_from="2006-01-01", date_till="2006-01-31", board="EQNE")
+    expected = fetched[(fetched["BOARDID"] == "EQNE") & fetched["TRADEDATE"].between("2006-01-01", "2006-01-31")]
+    assert sorted(january["TRADEDATE"]) == sorted(expected["TRADEDATE"].unique())
+    assert lake.read(63, board="NOPE").empty
+
+
+def test_null_board_and_date_partition(lake):
+    frame = pd.DataFrame({
+        "BOARDID": ["TQBR", None], "TRADEDATE": ["2023-05-17", "0000-00-00"], "SECID": ["GAZP"] * 2, "CLOSE": [1., 2.]
+    })
+    lake.save(63, frame, engine="stock", market="shares")
+    block_path = os.path.join(lake.path, "api_id=63", "block=history", "engine=stock", "market=shares")
+    assert os.path.isdir(os.path.join(block_path, f"board={dictionaries.LAKE_NULL_PARTITION}"))
+    stored = lake.read(63).sort_values("CLOSE", ignore_index=True)
+    assert stored["CLOSE"].tolist() == [1., 2.]
+    assert pd.isna(stored["board"][1]) and pd.isna(stored["date"][1])
+
+
+def test_trades_are_partitioned_by_trade_time(lake):
+    trades = lake.fetch(35, engine="stock", market="shares")["trades"]
+    months = set(pd.to_datetime(trades["SYSTIME"]).dt.strftime(dictionaries.LAKE_DATE_FORMAT))
+    assert set(lake.read(35, columns=["date"])["date"]) == months
+    lake.fetch(35, engine="stock", market="shares")
+    assert len(lake.read(35)) == len(trades.drop_duplicates(["TRADENO", "BOARDID", "SECID"]))
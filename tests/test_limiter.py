@@ -0,0 +1,58 @@
+import pytest
+
+import api_lib.dictionaries as dictionaries
+from api_lib.limiter import FileRateLimiter, RateLimiter, parse_retry_after
+from api_lib.main import MoexApi
+from conftest import FailingSession
+
+
+class Clock:
+    now = 100.
+
+    @classmethod
+    def time(cls) -> float:
+        return cls.now
+
+
+class FrozenLimiter(RateLimiter):
+    _clock = staticmethod(Clock.time)
+
+
+class FrozenFileLimiter(FileRateLimiter):
+    _clock = staticmethod(Clock.time)
+
+
+def test_burst_then_steady_rate():
+    limiter = FrozenLimiter(10, burst=3)
+    assert [round(limiter._reserve(), 6) for _ in range(5)] == [-0.2, -0.1, 0, 0.1, 0.2]
+
+
+def test_throttle_pauses_and_lowers_rate():
+    limiter = FrozenLimiter(10)
+    limiter.throttle(retry_after=2)
+    assert limiter._reserve() == pytest.approx(2)
+    assert limiter._reserve() == pytest.approx(2 + 1 / (10 * dictionaries.RATE_DECREASE))
+
+
+def test_retry_after_header():
+    assert parse_retry_after("1.5") == 1.5
+    assert parse_retry_after("-3") == 0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert parse_retry_after(None) is None
+
+
+def test_file_limiter_is_shared(tmp_path):
+    pytest.importorskip("fcntl")
+    path = str(tmp_path / "rate_limit.json")
+    first, second = FrozenFileLimiter(path, 10, 1), FrozenFileLimiter(path, 10, 1)
+    assert [round(limiter._reserve(), 6) for limiter in (first, second, first)] == [0, 0.1, 0.2]
+
+
+def test_too_many_requests_is_retried(make_api):
+    throttled = []
+    limiter = RateLimiter(10 ** 9, 10 ** 9)
+    limiter.throttle = throttled.append
+    MoexApi.rate_limiter = limiter
+    api = make_api(session=FailingSession([100], status=429, pages=2))
+    assert len(api.request(63, engine="stock", market="shares", security="GAZP")) == 200
+    assert throttled == [None]
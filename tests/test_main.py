@@ -0,0 +1,184 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import api_lib.dictionaries as dictionaries
+from api_lib.exceptions import MoexPartialDataError
+from api_lib.main import MoexApi
+from conftest import FailingSession
+
+HISTORY = {"engine": "stock", "market": "shares", "security": "GAZP"}  # Эндпоинт 63 с курсором, 100 строк на странице
+
+
+def test_cursor_pages_are_loaded_by_offsets(make_api):
+    session = FailingSession([], pages=5)
+    api = make_api(session=session)
+    frame = api.request(63, **HISTORY)
+    assert len(frame) == 500
+    starts = [int(params.get("start", 0)) for url, params in session.calls if "GAZP" in url]
+    assert sorted(starts) == [0, 100, 200, 300, 400]
+
+
+def test_parallel_cursor_pages_match_sequential(make_api):
+    api = make_api(pages=7)
+    sequential = api.request(63, **HISTORY)
+    parallel = api.request(63, parallel=True, **HISTORY)
+    assert len(parallel) == 700
+    assert parallel.equals(sequential)
+
+
+def test_cursor_offsets_from_first_page():
+    cursor = {"columns": ["INDEX", "TOTAL", "PAGESIZE"], "data": [[0, 450, 100]]}
+    assert MoexApi._get_cursor_offsets(cursor) == [100, 200, 300, 400]
+
+
+def test_cursor_offsets_are_capped():
+    cursor = {"columns": ["INDEX", "TOTAL", "PAGESIZE"], "data": [[0, 10 ** 6, 100]]}
+    with pytest.warns(UserWarning, match="Возвращены не все данные"):
+        offsets = MoexApi._get_cursor_offsets(cursor)
+    assert len(offsets) == dictionaries.MAX_REQ_PER_QUERY - 1
+
+
+def test_failed_page_is_resumed(make_api, monkeypatch):
+    monkeypatch.setattr(MoexApi, "MAX_RETRIES", 0)
+    expected = make_api(pages=5).request(63, **HISTORY)
+    api = make_api(session=FailingSession([200], pages=5))
+    with pytest.raises(MoexPartialDataError) as error:
+        api.request(63, **HISTORY)
+    assert error.value.start == 200
+    assert len(error.value.partial_data["history"]["data"]) == 200
+    assert api.resume(error.value).equals(expected)
+
+
+def test_request_iter_streams_pages(make_api):
+    api = make_api(pages=4)
+    pages = list(api.request_iter(63, **HISTORY))
+    assert [(block, len(frame)) for block, frame in pages] == [("history", 100)] * 4
+    assert pd.concat([frame for _, frame in pages], ignore_index=True).equals(api.request(63, **HISTORY))
+
+
+def test_request_iter_chunks(make_api):
+    api = make_api(pages=4)
+    sizes = [len(frame) for _, frame in api.request_iter(63, chunk_size=150, **HISTORY)]
+    assert sizes == [150, 150, 100]
+
+
+def test_request_iter_arrow_batches(make_api):
+    pyarrow = pytest.importorskip("pyarrow")
+    api = make_api(pages=2)
+    batches = [batch for _, batch in api.request_iter(63, arrow=True, **HISTORY)]
+    assert all(isinstance(batch, pyarrow.RecordBatch) for batch in batches)
+    assert sum(batch.num_rows for batch in batches) == 200
+
+
+def test_bulk_chunks_follow_exchange_limit():
+    securities = [f"S{idx}" for idx in range(25)] + ["S0"]
+    chunks = MoexApi._get_bulk_chunks(securities, "securities")
+    assert [len(chunk) for chunk in chunks] == [dictionaries.MAX_SECURITIES] * 2 + [5]
+    assert sum(chunks, []) == securities[:-1]
+    with pytest.raises(KeyError):
+        MoexApi._get_bulk_chunks(securities, "security")
+
+
+def test_request_bulk_fans_out(make_api):
+    session = FailingSession([])
+    api = make_api(session=session)
+    securities = [f"S{idx:02}" for idx in range(25)]
+    frames = api.request_bulk(32, securities, engine="stock", market="shares", board="TQBR")
+    sent = [params["securities"].split(",") for _, params in session.calls if "securities" in params]
+    assert sorted(sum(sent, [])) == securities
+    assert max(len(chunk) for chunk in sent) == dictionaries.MAX_SECURITIES
+    single = api.request(32, engine="stock", market="shares", board="TQBR", securities=securities[:10])
+    assert {block: len(frame) for block, frame in frames.items()} == {
+        block: 3 * len(frame) for block, frame in single.items()
+    }
+
+
+def test_date_windows_follow_cursor_total(api):
+    api_dict = MoexApi._check_and_get_api_dict(63)
+    date_from, date_till = datetime.date(2020, 1, 1), datetime.date(2020, 12, 31)
+    windows = api._get_date_windows(63, api_dict, {}, date_from, date_till, total=(3660, 100))
+    days = int(100 * dictionaries.DATE_SPLIT_PAGES / 10)  # 10 строк в день
+    assert windows[0] == ("2020-01-01", (date_from + datetime.timedelta(days=days - 1)).isoformat())
+    assert windows[-1][1] == "2020-12-31"
+    for (_, till), (next_from, _) in zip(windows, windows[1:]):
+        assert datetime.date.fromisoformat(next_from) - datetime.date.fromisoformat(till) == datetime.timedelta(1)
+
+
+def test_split_dates_request(make_api):
+    session = FailingSession([], pages=30)
+    api = make_api(session=session)
+    frame = api.request(63, split_dates=True, _from="2020-01-01", till="2020-12-31", **HISTORY)
+    windows = {(params["from"], params["till"]) for _, params in session.calls if "from" in params}
+    assert len(windows) == 1 + len(api._get_date_windows(  # Окна и запрос TOTAL за весь интервал
+        63, MoexApi._check_and_get_api_dict(63), {}, datetime.date(2020, 1, 1), datetime.date(2020, 12, 31),
+        total=(3000, 100),
+    ))
+    assert not frame.duplicated(["TRADEDATE", "BOARDID", "SECID"]).any()
+    assert frame["TRADEDATE"].is_monotonic_increasing
+
+
+def test_no_cursor_pages_stop_on_empty_page(make_api):
+    session = FailingSession([], pages=3)
+    api = make_api(session=session)
+    assert len(api.request(5)) == 300
+    assert [int(params["start"]) for url, params in session.calls if url.endswith("/securities.json")] == [
+        0, 100, 200, 300
+    ]
+
+
+def test_unknown_page_size_is_learned(make_api):
+    session = FailingSession([], pages=3)
+    api = make_api(session=session)
+    assert len(api.request(791, engine="stock", market="bonds")) == 42
+    assert MoexApi._page_sizes == {"/iss/history/engines/stock/markets/bonds/yields.json": 14}
+    assert api._get_page_size("http://iss.moex.com/iss/history/engines/stock/markets/shares/yields.json", {}) is None
+
+
+def test_single_short_page_is_not_learned(make_api):
+    api = make_api(pages=1)
+    assert len(api.request(791, engine="stock", market="bonds")) == 14
+    assert not MoexApi._page_sizes
+
+
+def test_repeated_page_is_not_data():
+    columns = ["SECID"]
+    last_rows = {"securities": hash(("GAZP",)), "boards": hash(("TQBR",))}
+    requested = {"securities", "boards"}
+    response = {
+        "securities": {"columns": columns, "data": [["SBER"]] * 100},
+        "boards": {"columns": columns, "data": [["TQBR"]] * 100},  # Блок без пагинации повторяет первую страницу
+    }
+    page, changed = MoexApi._next_without_cursor(last_rows, requested, response, 100)
+    assert list(page) == ["securities"]
+    assert changed and requested == {"securities"}
+
+
+def test_failed_no_cursor_page_is_resumed(make_api, monkeypatch):
+    monkeypatch.setattr(MoexApi, "MAX_RETRIES", 0)
+    api = make_api(session=FailingSession([200], pages=3))
+    with pytest.raises(MoexPartialDataError) as error:
+        api.request(5)
+    assert error.value.start == 200
+    assert len(api.resume(error.value)) == 300
+
+
+def test_parallel_pages_stop_with_consumer(make_api):
+    session = FailingSession([], pages=60, latency=0.01)
+    api = make_api(session=session)
+    pages = api.request_iter(63, parallel=True, **HISTORY)
+    next(pages)
+    next(pages)
+    pages.close()
+    requested = [url for url, _ in session.calls if "GAZP" in url]
+    assert len(requested) <= 2 + MoexApi.MAX_WORKERS  # Только окно из MAX_WORKERS страниц, а не все 60
+
+
+def test_parallel_page_error_cancels_remaining_pages(make_api, monkeypatch):
+    monkeypatch.setattr(MoexApi, "MAX_RETRIES", 0)
+    session = FailingSession([100], pages=60, latency=0.01)
+    api = make_api(session=session)
+    with pytest.raises(MoexPartialDataError):
+        api.request(63, parallel=True, **HISTORY)
+    assert len([url for url, _ in session.calls if "GAZP" in url]) <= 2 + 2 * MoexApi.MAX_WORKERS
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+from api_lib.master import SecuritiesMaster
+from conftest import FailingSession
+
+SHARES = [("stock", "shares")]
+
+
+@pytest.fixture
+def master(api):
+    return SecuritiesMaster.crawl(api, markets=SHARES)
+
+
+def test_crawl_adds_market_securities(api, master):
+    securities = api.request(5)
+    assert len(master) > securities["secid"].nunique()
+    assert set(securities["secid"]) <= set(master.to_frame()["secid"])
+    assert master.boards("GAZP") == ["SMAL", "SPEQ", "TQBR"] and "GAZP" in master
+
+
+def test_crawl_goes_past_request_limit(make_api):
+    pages = dictionaries.MAX_REQ_PER_QUERY + 50
+    session = FailingSession([], pages=pages)
+    master = SecuritiesMaster.crawl(make_api(session=session))
+    starts = {int(params.get("start", 0)) for url, params in session.calls if url.endswith("/securities.json")}
+    assert max(starts) == pages * dictionaries.PAGE_SIZE["5"]  # Последняя страница пустая
+    assert len(master) == 100
+
+
+def test_crawl_stops_on_repeated_window(make_api, monkeypatch):
+    api = make_api(pages=dictionaries.MAX_REQ_PER_QUERY + 50)
+    request = api.request
+    monkeypatch.setattr(api, "request", lambda api_id, start=0, **kwargs: request(api_id, **kwargs))
+    with pytest.raises(RuntimeError, match="повторяет"):
+        SecuritiesMaster.crawl(api)
+
+
+def test_lookup(master):
+    frame = master.to_frame()
+    isins = [frame["isin"].iloc[10], "missing", frame["isin"].iloc[3].lower()]
+    found = master.lookup(isins)
+    assert found["key"].tolist() == isins
+    assert found["secid"].isna().tolist() == [False, True, False]
+    assert found["secid"].iloc[[0, 2]].tolist() == [frame["secid"].iloc[10], frame["secid"].iloc[3]]
+    emitent = frame["emitent_id"].iloc[0]
+    assert master.find(int(emitent))["secid"].tolist() == frame.loc[frame["emitent_id"] == emitent, "secid"].tolist()
+    with pytest.raises(KeyError):
+        master.lookup(["x"], by="shortname")
+
+
+def test_empty_master_lookup(master):
+    empty = SecuritiesMaster(master.to_frame().iloc[:0])
+    found = empty.lookup(["GAZP", "SBER"], by="secid")
+    assert len(empty) == 0 and found["key"].tolist() == ["GAZP", "SBER"] and found["secid"].isna().all()
+
+
+def test_search(master):
+    assert master.search("SBER")["secid"].iloc[0] == "SBER"
+    assert set(master.search("сбербанк", limit=2)["secid"]) == {"SBER", "SBERP"}
+
+
+def test_save_and_load(master, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "securities.parquet")
+    master.save(path)
+    loaded = SecuritiesMaster.load(path)
+    pd.testing.assert_frame_equal(loaded.to_frame(), master.to_frame(), check_dtype=False)
+    assert loaded.boards("GAZP") == master.boards("GAZP")
+
+
+def test_security_check_uses_master(api, master, monkeypatch):
+    monkeypatch.setattr(MoexApi, "securities_master", SecuritiesMaster(master.to_frame().iloc[:10]))
+    assert api._check_security_entity("A-RM") == "A-RM"
+    assert api._check_security_entity("GAZP") == "GAZP"  # Справочник неполный: инструмента нет, но он не отклоняется
+    assert len(api.request(13, security="GAZP")) > 0
+    with pytest.raises(ValueError):
+        api.request(13, security="A")
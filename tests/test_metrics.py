@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from api_lib.main import MoexApi
+from api_lib.metrics import Instrumentation, MetricsCollector, SpanExporter
+from conftest import FailingSession
+
+HISTORY = {"engine": "stock", "market": "shares", "security": "GAZP"}
+
+
+@pytest.fixture
+def hooks():
+    added = []
+
+    def add(hook):
+        added.append(MoexApi.instrumentation.add_hook(hook))
+        return hook
+
+    yield add
+    for hook in added:
+        MoexApi.instrumentation.remove_hook(hook)
+
+
+def test_request_stages_are_collected(make_api, hooks):
+    api = make_api(pages=3)
+    collector = hooks(MetricsCollector())
+    api.request(63, **HISTORY)
+    frame = collector.to_frame().set_index("stage")
+    assert {"request", "prepare", "pages", "http", "decode", "frames"} <= set(frame.index)
+    assert frame.loc["http", "count"] == 3
+    assert frame.loc["frames", "rows"] == 300
+    assert (frame["api_id"] == "63").all()
+
+
+def test_spans_share_trace(make_api, hooks, tmp_path):
+    api = make_api(pages=2)
+    exporter = hooks(SpanExporter())
+    api.request(63, **HISTORY)
+    spans = {span["spanId"]: span for span in exporter.spans}
+    root = next(span for span in spans.values() if span["name"] == "request")
+    assert "parentSpanId" not in root
+    assert {span["traceId"] for span in spans.values()} == {root["traceId"]}
+    http = [span for span in spans.values() if span["name"] == "http"]
+    assert len(http) == 2 and all(span["parentSpanId"] in spans for span in http)
+    exporter.export(str(tmp_path / "spans.jsonl"))
+    exported = json.loads((tmp_path / "spans.jsonl").read_text(encoding="utf-8"))
+    assert len(exported["resourceSpans"][0]["scopeSpans"][0]["spans"]) == len(spans)
+    assert exporter.spans == []
+
+
+def test_retry_events(make_api, hooks):
+    events = []
+    hooks(events.append)
+    api = make_api(session=FailingSession([100], status=429, pages=2))
+    api.request(63, **HISTORY)
+    api._on_retry(status=503)
+    retries = [event.values for event in events if event.stage == "retry"]
+    assert [values["status"] for values in retries] == [429, 503]
+
+
+def test_prometheus_text():
+    collector = MetricsCollector(buckets=(0.1, 1))
+    instrumentation = Instrumentation()
+    instrumentation.add_hook(collector)
+    instrumentation.event("http", duration=0.05, api_id="63", bytes=10)
+    instrumentation.event("http", duration=0.5, api_id="63", bytes=5)
+    text = collector.to_prometheus(prefix="moex")
+    assert 'moex_stage_duration_seconds_bucket{stage="http",api_id="63",le="0.1"} 1' in text
+    assert 'moex_stage_duration_seconds_bucket{stage="http",api_id="63",le="+Inf"} 2' in text
+    assert 'moex_bytes_total{stage="http",api_id="63"} 15' in text
+
+
+def test_failing_hook_does_not_break_request(make_api, hooks):
+    def broken(event):
+        raise RuntimeError("boom")
+
+    hooks(broken)
+    with pytest.warns(UserWarning, match="boom"):
+        assert len(make_api().request(63, **HISTORY)) == 100
+
+
+def test_disabled_instrumentation():
+    instrumentation = Instrumentation()
+    assert not instrumentation.enabled
+    with instrumentation.span("http") as span:
+        span.set(bytes=1)
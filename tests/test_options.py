@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from api_lib.options import OptionSurface, black76_greeks, black76_price, implied_volatility
+
+MOMENT = "2023-05-18 12:00"
+
+
+def test_implied_volatility_round_trip():
+    strike = np.linspace(70, 130, 13)[:, None, None]
+    tenor = np.array([0.1, 0.5, 2.])[None, :, None]
+    is_call = np.array([True, False])[None, None, :]
+    vol = 0.1 + strike / 400 + tenor / 10
+    prices = black76_price(100., strike, tenor, vol, is_call)
+    found = implied_volatility(prices, 100., strike, tenor, is_call)
+    assert found.shape == (13, 3, 2)
+    assert np.allclose(found, np.broadcast_to(vol, found.shape), atol=1e-6)
+
+
+def test_implied_volatility_reprices_short_options():
+    strike, is_call = np.linspace(60, 140, 17), np.arange(17) % 2 == 0
+    prices = black76_price(100., strike, 0.02, 0.3, is_call)
+    found = implied_volatility(prices, 100., strike, 0.02, is_call)
+    # Глубоко вне денег цена почти не зависит от волатильности: проверяется цена, а не сама волатильность
+    finite = np.isfinite(found)
+    assert finite.sum() > 10
+    assert np.allclose(black76_price(100., strike, 0.02, found, is_call)[finite], prices[finite], atol=1e-6)
+
+
+def test_implied_volatility_scalar():
+    price = black76_price(100, 105, 0.5, 0.3, False)
+    assert implied_volatility(price, 100, 105, 0.5, False).shape == ()
+    assert implied_volatility(price, 100, 105, 0.5, False, initial=0.25) == pytest.approx(0.3)
+
+
+def test_prices_outside_bounds_are_nan():
+    vols = implied_volatility([0, -1, 101, np.nan, 5], 100, 100, [1, 1, 1, 1, 0], True)
+    assert np.isnan(vols).all()
+
+
+def test_greeks_match_finite_differences():
+    args = dict(strike=np.array([90., 100., 110.]), tenor=0.5, vol=0.3, is_call=np.array([True, False, True]))
+    greeks = black76_greeks(100., **args)
+    bump = 1e-3
+    up, down = black76_price(100. + bump, **args), black76_price(100. - bump, **args)
+    assert np.allclose(greeks["PRICE"], black76_price(100., **args))
+    assert np.allclose(greeks["DELTA"], (up - down) / (2 * bump), atol=1e-6)
+    assert np.allclose(greeks["GAMMA"], (up - 2 * greeks["PRICE"] + down) / bump ** 2, atol=1e-4)
+    vega = black76_price(100., **{**args, "vol": 0.31}) - black76_price(100., **{**args, "vol": 0.29})
+    assert np.allclose(greeks["VEGA"], vega / 2, atol=1e-4)
+
+
+def test_surface_from_option_boards(api):
+    surface = OptionSurface(api)
+    frame = surface.load(["Si"], moment=MOMENT)
+    assert len(surface.series) == 6 and not surface.errors
+    assert set(frame["EXPIRATION"]) == {expiration for _, expiration in surface.series}
+    assert (frame["TENOR"] > 0).all()
+    quoted = frame[frame["IV_MID"].notna()]
+    mid = black76_price(quoted["UNDERLYINGSETTLEPRICE"], quoted["STRIKE"], quoted["TENOR"], quoted["IV_MID"] / 100,
+                        quoted["OPTIONTYPE"] == "C", surface.rate)
+    assert np.allclose(mid, (quoted["BID"] + quoted["OFFER"]) / 2, rtol=1e-4)
+    assert (surface.smile(*surface.series[0])["STRIKE"].diff().dropna() >= 0).all()
+
+
+def test_failed_assets_are_collected(api, monkeypatch):
+    surface = OptionSurface(api)
+    fetch = surface._fetch_expirations
+
+    def fetch_expirations(asset):
+        if asset == "XX":
+            raise ConnectionError(asset)
+        return fetch(asset)
+
+    monkeypatch.setattr(surface, "_fetch_expirations", fetch_expirations)
+    surface.load(["Si", "XX"], moment=MOMENT)
+    assert list(surface.errors) == ["XX"] and isinstance(surface.errors["XX"], ConnectionError)
+    assert {asset for asset, _ in surface.series} == {"Si"}
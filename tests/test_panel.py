@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api_lib.main import MoexApi
+from api_lib.panel import Panel, PanelBuilder
+from api_lib.replay import ReplayResponse
+from conftest import FailingSession
+
+SHARES = {"engine": "stock", "market": "shares"}
+
+
+class BrokenSecuritySession(FailingSession):
+    """
+    Сессия, отвечающая 503 на все запросы истории инструмента security.
+    """
+
+    def __init__(self, security: str, **kwargs):
+        super().__init__([], **kwargs)
+        self.security = security
+
+    def get(self, url: str, params: dict = None, **kwargs) -> ReplayResponse:
+        if f"/{self.security}" in url:
+            return ReplayResponse(b"{}", 503, url)
+        return super().get(url, params, **kwargs)
+
+
+def test_panel_matches_history(make_api):
+    api = make_api(pages=2)
+    history = api.request(63, security="GAZP", **SHARES)
+    history = history.drop_duplicates("TRADEDATE", keep="last").sort_values("TRADEDATE")
+    panel = PanelBuilder(api, dtype=np.float64).build(["GAZP", "SBER"], board="EQNE", adjust=False, **SHARES)
+    assert panel.dates.tolist() == pd.to_datetime(history["TRADEDATE"]).dt.date.tolist()
+    closes = panel.to_frame("CLOSE")
+    assert list(closes.columns) == ["GAZP", "SBER"]
+    assert np.allclose(closes["GAZP"], history["CLOSE"].to_numpy(dtype=np.float64))
+    assert panel.fields == ["CLOSE", "VOLUME"]
+
+
+def test_other_boards_are_skipped(api):
+    panel = PanelBuilder(api).build(["GAZP"], board="TQBR", **SHARES)
+    assert len(panel.dates) == 0 and panel["CLOSE"].shape == (0, 1)
+
+
+def test_failed_security_stays_empty(make_api, monkeypatch):
+    monkeypatch.setattr(MoexApi, "MAX_RETRIES", 0)
+    api = make_api(session=BrokenSecuritySession("SBER"))
+    with pytest.warns(UserWarning, match="Не загружены инструменты"):
+        panel = PanelBuilder(api).build(["GAZP", "SBER"], board="EQNE", adjust=False, **SHARES)
+    assert list(panel.errors) == ["SBER"]
+    assert np.isnan(panel["CLOSE"][:, 1]).all() and not np.isnan(panel["CLOSE"][:, 0]).any()
+
+
+def test_ffill_prices_only():
+    dates = np.arange("2023-01-02", "2023-01-05", dtype="datetime64[D]")
+    panel = Panel(dates, ["A"], {
+        "CLOSE": np.array([[1.0], [np.nan], [3.0]]), "VOLUME": np.array([[10.0], [np.nan], [30.0]]),
+    }).ffill()
+    assert panel["CLOSE"][:, 0].tolist() == [1.0, 1.0, 3.0]
+    assert np.isnan(panel["VOLUME"][1, 0])
+
+
+def test_adjust_splits():
+    dates = np.arange("2023-01-02", "2023-01-06", dtype="datetime64[D]")
+    panel = Panel(dates, ["A", "B"], {"CLOSE": np.full((4, 2), 100.0), "VOLUME": np.full((4, 2), 10.0)})
+    splits = pd.DataFrame({"tradedate": ["2023-01-04"], "secid": ["A"], "before": [1], "after": [10]})
+    panel.adjust_splits(splits)
+    assert panel["CLOSE"][:, 0].tolist() == [10.0, 10.0, 100.0, 100.0]
+    assert panel["VOLUME"][:, 0].tolist() == [100.0, 100.0, 10.0, 10.0]
+    assert (panel["CLOSE"][:, 1] == 100.0).all()
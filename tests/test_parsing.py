@@ -0,0 +1,54 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+from api_lib.parsing import parse_response
+
+HISTORY = {"engine": "stock", "market": "shares", "security": "GAZP"}
+
+
+class CountingPool(ProcessPoolExecutor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs = 0
+
+    def submit(self, *args, **kwargs):
+        self.jobs += 1
+        return super().submit(*args, **kwargs)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(dictionaries, "PARSE_POOL_MIN_SIZE", 0)
+    pool = CountingPool(max_workers=2)
+    MoexApi.parse_pool = pool
+    yield pool
+    pool.shutdown()
+
+
+def test_parse_response_blocks():
+    content = b'{"history": {"columns": ["SECID"], "data": [["GAZP"]]}, "history.cursor": {"columns": [], "data": []}}'
+    frames = parse_response(content, exclude=["history.cursor"])
+    assert list(frames) == ["history"]
+    assert frames["history"]["SECID"].tolist() == ["GAZP"]
+
+
+@pytest.mark.parametrize("typed", [False, True])
+def test_pooled_cursor_pages_match_in_process(make_api, pool, typed):
+    api = make_api(pages=4)
+    pooled = api.request(63, typed=typed, **HISTORY)
+    assert pool.jobs == 4  # Одна задача на страницу
+    MoexApi.parse_pool = None
+    assert pooled.equals(api.request(63, typed=typed, **HISTORY))
+
+
+def test_pooled_response_without_pagination(make_api, pool):
+    api = make_api()
+    pooled = api.request(32, engine="stock", market="shares", board="TQBR")
+    assert pool.jobs == 1
+    MoexApi.parse_pool = None
+    expected = api.request(32, engine="stock", market="shares", board="TQBR")
+    assert list(pooled) == list(expected)
+    assert all(pooled[block].equals(frame) for block, frame in expected.items())
@@ -0,0 +1,44 @@
+import pytest
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+from api_lib.plan import get_param_name
+
+
+def test_param_names():
+    assert get_param_name("_from") == "from"
+    assert get_param_name("P_market") == "market"
+    assert get_param_name("iss__reverse") == "iss.reverse"
+    assert get_param_name("till") is None
+
+
+def test_plan_is_compiled_once():
+    plan = MoexApi._get_plan(63)
+    assert MoexApi._get_plan("63") is plan
+    assert plan.cursor_name == "history.cursor"
+    assert {"from", "_from", "P_from", "till"} <= set(plan.param_aliases)
+    assert "history" in plan.blocks and "CLOSE" in plan.columns
+
+
+def test_prepared_request(api):
+    kwargs = {"engine": "stock", "market": "shares", "security": "GAZP", "_from": "2020-01-01", "P_till": "2020-02-01",
+              "COLUMNS_history": ["TRADEDATE", "CLOSE"]}
+    api_dict, url, use_params = api._prepare_request(63, False, ["history"], kwargs)
+    assert url == "http://iss.moex.com/iss/history/engines/stock/markets/shares/securities/GAZP.json"
+    assert (use_params["from"], use_params["till"]) == ("2020-01-01", "2020-02-01")
+    assert use_params["history.columns"] == "TRADEDATE,CLOSE"
+    assert use_params["iss.only"] == "history,history.cursor"
+    assert {param: use_params[param] for param in dictionaries.DEFAULT_GET_PARAMS} == dictionaries.DEFAULT_GET_PARAMS
+    assert kwargs == {}
+
+
+@pytest.mark.parametrize("kwargs, error", [
+    ({"engine": "stock", "market": "shares"}, KeyError),  # Нет сущности пути security
+    ({"engine": "stock", "market": "shares", "security": "GAZP", "_date": "2020-01-01"}, KeyError),
+    ({"engine": "stock", "market": "shares", "security": "GAZP", "unknown": 1}, KeyError),
+    ({"engine": "nope", "market": "shares", "security": "GAZP"}, ValueError),
+    ({"engine": "stock", "market": "shares", "security": "GAZP", "_from": "2020-13-01"}, ValueError),
+])
+def test_invalid_requests_are_rejected(api, kwargs, error):
+    with pytest.raises(error):
+        api._prepare_request(63, False, None, kwargs)
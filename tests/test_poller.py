@@ -0,0 +1,84 @@
+import copy
+
+import pytest
+
+from api_lib.poller import LivePoller
+from conftest import FailingSession
+
+SHARES = {"engine": "stock", "market": "shares"}
+
+
+def snapshot_calls(session):
+    return [params.get("iss.only") for url, params in session.calls if url.endswith("/securities.json")]
+
+
+def replace_fixture(session, api_id, fixture):
+    session._fixtures[api_id] = fixture
+    session.close()  # Забыть собранные ответы
+
+
+@pytest.fixture
+def session():
+    return FailingSession([])
+
+
+def test_unchanged_snapshot_is_not_loaded(make_api, session):
+    feed = LivePoller(make_api(session=session)).subscribe(33, **SHARES)
+    first = feed.poll()
+    assert first.block == "marketdata" and len(first.added) == 797 and first.changed.empty
+    assert feed.poll() is None
+    assert snapshot_calls(session) == ["dataversion", "marketdata", "dataversion"]
+    assert feed.interval > feed.min_interval
+
+
+def test_snapshot_changes(make_api, session):
+    api = make_api(session=session)
+    deltas = []
+    feed = LivePoller(api).subscribe(33, deltas.append, **SHARES)
+    feed.poll()
+    fixture = copy.deepcopy(session._get_fixture("33"))
+    version = fixture["dataversion"]
+    version["columns"] = version["columns"][::-1]  # seqnum ищется по имени колонки, а не по позиции
+    version["data"] = [[row[1] + 1, row[0]] for row in version["data"]]
+    rows = fixture["marketdata"]["data"]
+    removed = rows.pop()
+    rows[0] = [*rows[0][:2], 123.45, *rows[0][3:]]
+    replace_fixture(session, "33", fixture)
+    delta = feed.poll()
+    assert delta.version == version["data"][0][0]
+    assert delta.added.empty
+    assert delta.changed["BID"].tolist() == [123.45]
+    assert delta.removed["SECID"].tolist() == [removed[0]]
+    assert deltas == [deltas[0], delta] and feed.interval == feed.min_interval
+
+
+def test_trades_continue_from_last_number(make_api, session):
+    feed = LivePoller(make_api(session=session)).subscribe(35, **SHARES)
+    first = feed.poll()
+    assert feed.is_trades and len(first.added) == 5000
+    assert feed.version == int(first.added["TRADENO"].iloc[-1])
+    assert feed.poll() is None
+    assert session.calls[-1][1]["tradeno"] == feed.version and session.calls[-1][1]["next_trade"] == 1
+
+
+def test_subscriptions_are_shared(api):
+    poller = LivePoller(api)
+    feed = poller.subscribe(33, securities=["GAZP"], **SHARES)
+    assert poller.subscribe(33, lambda delta: None, securities=["GAZP"], **SHARES) is feed
+    assert len(poller.feeds) == 1 and len(feed.callbacks) == 1
+    poller.unsubscribe(feed)
+    assert not poller.feeds
+
+
+def test_failing_callback_does_not_stop_polling(api):
+    def callback(delta):
+        raise ValueError("подписчик")
+
+    feed = LivePoller(api).subscribe(33, callback, **SHARES)
+    with pytest.warns(UserWarning, match="Подписчик"):
+        assert feed.poll() is not None
+
+
+def test_endpoint_without_versions(api):
+    with pytest.raises(KeyError):
+        LivePoller(api).subscribe(63, security="GAZP", **SHARES)
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+from api_lib.replay import ReplaySession
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench_request  # noqa: E402
+
+HISTORY_URL = "https://iss.moex.com/iss/history/engines/stock/markets/shares/securities/GAZP.json"
+TRADES_URL = "https://iss.moex.com/iss/engines/stock/markets/shares/trades.json"
+
+
+def test_cursor_pages_are_replayed():
+    session = ReplaySession(pages=3)
+    first = session.get(HISTORY_URL, {"start": 0}).json()
+    last = session.get(HISTORY_URL, {"start": 200}).json()
+    assert first["history.cursor"]["data"] == [[0, 300, 100]]
+    assert len(last["history"]["data"]) == 100
+    assert last["history"]["data"] != first["history"]["data"]
+    assert session.get(HISTORY_URL, {"start": 300}).json()["history"]["data"] == []
+
+
+def test_params_are_applied():
+    session = ReplaySession()
+    response = session.get(HISTORY_URL, {"iss.only": "history", "history.columns": "SECID,CLOSE", "iss.meta": "off"})
+    assert list(response.json()) == ["history"]
+    assert response.json()["history"]["columns"] == ["SECID", "CLOSE"]
+    assert "metadata" not in response.json()["history"]
+    assert session.get(HISTORY_URL, {"iss.data": "off"}).json()["history"]["data"] == []
+
+
+def test_trades_after_tradeno():
+    session = ReplaySession()
+    trades = session.get(TRADES_URL).json()["trades"]
+    tradeno = trades["data"][len(trades["data"]) // 2][0]
+    later = session.get(TRADES_URL, {"tradeno": tradeno, "next_trade": 1}).json()["trades"]["data"]
+    assert later and min(row[0] for row in later) > tradeno
+
+
+def test_unknown_url_is_not_found():
+    assert ReplaySession().get("https://iss.moex.com/iss/unknown/path.json").status_code == 404
+
+
+def test_no_cursor_pages(make_api):
+    assert len(make_api(pages=3).request(5)) == 300
+
+
+def test_benchmark_case_and_regressions(make_api):
+    result = bench_request.bench_case(make_api(pages=2), "63", bench_request.get_cases(["63"])["63"], repeat=2)
+    assert result["rows"] == 200
+    baseline = {"63/2": {**result, "p50_ms": result["p50_ms"] / 2}}
+    assert bench_request.compare({"63/2": result}, baseline, threshold=.2)
+    assert not bench_request.compare({"63/2": result}, {"63/2": result}, threshold=.2)
+
+
+@pytest.mark.parametrize("pages", [1, 4])
+def test_replay_matches_page_count(make_api, pages):
+    assert len(make_api(pages=pages).request(63, engine="stock", market="shares", security="GAZP")) == 100 * pages
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api_lib.resample import CandleResampler, resample_candles
+
+
+def make_candles(start: str, periods: int, minutes: int = 1, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    begin = pd.date_range(start, periods=periods, freq=f"{minutes}min")
+    close = 100 + rng.standard_normal(periods).cumsum()
+    return pd.DataFrame({
+        "open": close + rng.standard_normal(periods), "close": close,
+        "high": close + 2, "low": close - 2,
+        "value": rng.uniform(1, 10, periods), "volume": rng.integers(1, 100, periods).astype(float),
+        "begin": begin.strftime("%Y-%m-%d %H:%M:%S"),
+        "end": (begin + pd.Timedelta(minutes=minutes, seconds=-1)).strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+
+def test_bars_match_pandas_resample():
+    candles = make_candles("2023-05-17 10:00", 120)
+    bars = resample_candles(candles, "15min", sessions=None)
+    grouped = candles.assign(begin=pd.to_datetime(candles["begin"])).resample("15min", on="begin")
+    assert np.allclose(bars["open"], grouped["open"].first())
+    assert np.allclose(bars["close"], grouped["close"].last())
+    assert np.allclose(bars["high"], grouped["high"].max())
+    assert np.allclose(bars["low"], grouped["low"].min())
+    assert np.allclose(bars["volume"], grouped["volume"].sum())
+    assert bars["begin"].tolist() == list(grouped["open"].first().index)
+
+
+def test_bars_do_not_cross_sessions():
+    bars = resample_candles(make_candles("2023-05-17 18:50", 30), "10min")
+    assert [str(begin.time()) for begin in bars["begin"]] == ["18:50:00", "19:00:00", "19:05:00", "19:15:00"]
+    assert bars["session"].tolist() == [1, 1, 2, 2]
+
+
+def test_streamed_pages_match_whole_frame():
+    candles = make_candles("2023-05-17 10:00", 500, seed=1)
+    resampler = CandleResampler("1h")
+    pages = [resampler.update(candles.iloc[start:start + 77]) for start in range(0, len(candles), 77)]
+    streamed = pd.concat(pages + [resampler.flush()], ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, resample_candles(candles, "1h"))
+
+
+def test_several_securities_and_weekly_bars():
+    candles = pd.concat([
+        make_candles("2023-05-10", 20, minutes=24 * 60).assign(secid=secid) for secid in ("GAZP", "SBER")
+    ], ignore_index=True)
+    bars = resample_candles(candles, "7D", by="secid")
+    assert bars.groupby("secid").size().tolist() == [4, 4]
+    assert set(bars["begin"].dt.dayofweek) == {0}  # Недели начинаются с понедельника
+
+
+@pytest.mark.parametrize("rule", ["0min", "36h"])
+def test_invalid_rules(rule):
+    with pytest.raises(ValueError):
+        CandleResampler(rule)
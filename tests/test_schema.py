@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+import api_lib.dictionaries as dictionaries
+from api_lib.main import MoexApi
+from api_lib.schema import concat_typed, get_schema, typed_dataframe
+from conftest import RetypedSession
+
+TYPES = {"SECID": "string", "TRADEDATE": "date", "PRICE": "double", "NUMTRADES": "int64", "TIME": "time"}
+
+
+def test_columns_are_converted_by_iss_types():
+    data = [["GAZP", "2023-05-17", 170.5, 10, "10:00:00"], ["SBER", "0000-00-00", None, None, "10:01:00"]]
+    frame = typed_dataframe(data, list(TYPES), TYPES)
+    assert frame["TRADEDATE"].dtype.kind == "M" and pd.isna(frame["TRADEDATE"][1])
+    assert frame["PRICE"].dtype == np.float64
+    assert str(frame["NUMTRADES"].dtype) == "Int64"
+    assert frame["TIME"].dtype.kind == "m"
+    assert frame["SECID"].tolist() == ["GAZP", "SBER"]
+
+
+def test_schema_from_metadata():
+    response = {"history": {"metadata": {"SECID": {"type": "string"}}, "columns": ["SECID"], "data": []}}
+    assert get_schema(response) == {"history": {"SECID": "string"}}
+
+
+def test_concat_keeps_categories_across_pages():
+    rows = dictionaries.CATEGORY_MIN_ROWS
+    pages = [
+        typed_dataframe([[secid]] * rows, ["SECID"], {"SECID": "string"}) for secid in ("GAZP", "SBER")
+    ]
+    result = concat_typed(pages, {"SECID": "string"})
+    assert isinstance(result["SECID"].dtype, pd.CategoricalDtype)
+    assert result["SECID"].value_counts().to_dict() == {"GAZP": rows, "SBER": rows}
+
+
+def test_typed_request(make_api):
+    frame = make_api(pages=3).request(63, typed=True, engine="stock", market="shares", security="GAZP")
+    assert len(frame) == 300
+    assert frame["TRADEDATE"].dtype.kind == "M"
+    assert frame["CLOSE"].dtype == np.float64
+    assert isinstance(frame["SECID"].dtype, pd.CategoricalDtype)
+
+
+def test_each_market_has_own_schema(make_api):
+    api = make_api(session=RetypedSession("/bonds/", {"CLOSE": "string"}))
+    shares = api.request(63, typed=True, engine="stock", market="shares", security="GAZP")
+    bonds = api.request(63, typed=True, engine="stock", market="bonds", security="GAZP")
+    assert shares["CLOSE"].dtype == np.float64
+    assert bonds["CLOSE"].dtype == object
+    assert len(MoexApi._schemas) == 2
@@ -0,0 +1,22 @@
+from urllib3.response import HTTPResponse
+
+import api_lib.dictionaries as dictionaries
+from api_lib.session import ObservedRetry, create_session
+
+
+def test_session_retries_server_errors():
+    session = create_session(pool_size=4, retries=2, backoff_factor=0)
+    retry = session.get_adapter("https://iss.moex.com").max_retries
+    assert isinstance(retry, ObservedRetry)
+    assert retry.total == 2
+    assert set(retry.status_forcelist) == set(dictionaries.RETRY_STATUSES)
+    assert session.get_adapter("http://iss.moex.com") is session.get_adapter("https://iss.moex.com")
+
+
+def test_retry_reports_status_and_errors():
+    events = []
+    retry = ObservedRetry(total=3, status_forcelist=(503,), on_retry=lambda **values: events.append(values))
+    retry = retry.increment("GET", "/", response=HTTPResponse(status=503))
+    retry.increment("GET", "/", error=ConnectionResetError())
+    assert events == [{"status": 503}, {"error": "ConnectionResetError"}]
+    assert retry.total == 2
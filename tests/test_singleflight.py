@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_lib.singleflight import AsyncSingleFlight, SingleFlight
+from conftest import FailingSession
+
+
+def test_concurrent_calls_share_one_execution():
+    flight, started, release = SingleFlight(), threading.Event(), threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return [1]
+
+    with ThreadPoolExecutor(4) as executor:
+        leader = executor.submit(flight.do, "key", func, list)
+        started.wait(5)
+        followers = [executor.submit(flight.do, "key", func, list) for _ in range(3)]
+        while flight._calls["key"].waiters < 3:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result()] + [future.result() for future in followers]
+    assert calls == [1]
+    assert results == [[1]] * 4
+    assert len({id(result) for result in results}) == 4  # У каждого вызывающего своя копия
+
+
+def test_error_is_shared_and_key_released():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_async_calls_share_one_execution():
+    flight, calls = AsyncSingleFlight(), []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"rows": 1}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", func, dict) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert results == [{"rows": 1}] * 5
+
+
+def test_identical_requests_are_coalesced(make_api):
+    session = FailingSession([], pages=2, latency=0.05)
+    api = make_api(session=session)
+    session.calls.clear()
+    history = {"engine": "stock", "market": "shares", "security": "GAZP"}
+    with ThreadPoolExecutor(4) as executor:
+        frames = list(executor.map(lambda _: api.request(63, **history), range(4)))
+    assert len(session.calls) == 2
+    assert all(frame.equals(frames[0]) for frame in frames)
+    frames[0].drop(frames[0].index, inplace=True)
+    assert len(frames[1]) == 200
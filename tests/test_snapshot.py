@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import api_lib.dictionaries as dictionaries
+import api_lib.main as main_module
+from api_lib.main import MoexApi
+from api_lib.snapshot import read_snapshot, write_snapshot
+from conftest import FailingSession, unload_dictionaries
+
+
+def test_snapshot_round_trip_and_ttl(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    write_snapshot(path, {"index": {"engines": []}})
+    assert read_snapshot(path, 60)["index"] == {"engines": []}
+    assert read_snapshot(path, -1) is None
+    assert read_snapshot(str(tmp_path / "missing.json"), None) is None
+
+
+def test_dictionaries_are_loaded_lazily_and_cached(make_api):
+    session = FailingSession([])
+    api = make_api(session=session)
+    unload_dictionaries(api)
+    session.calls.clear()
+    assert "stock" in api.engines.index
+    assert len(session.calls) == 2
+
+    unload_dictionaries(api)
+    session.calls.clear()
+    assert "TQBR" in api._set_boards  # Из локального снимка, без запросов
+    assert session.calls == []
+
+
+def test_stale_snapshot_is_used_when_exchange_is_down(make_api, monkeypatch):
+    api = make_api()
+    unload_dictionaries(api)
+    api.engines  # Снимок записан
+    monkeypatch.setattr(dictionaries, "DICTIONARY_SNAPSHOT_TTL", -1)
+    monkeypatch.setattr(MoexApi, "MAX_RETRIES", 0)
+    api.use_session(FailingSession([0], times=10))
+    unload_dictionaries(api)
+    with pytest.warns(UserWarning, match="устаревший локальный снимок"):
+        assert "stock" in api.engines.index
+
+
+def test_concurrent_first_access_loads_once(make_api, monkeypatch):
+    monkeypatch.setattr(dictionaries, "DICTIONARY_SNAPSHOT_TTL", -1)  # Снимок устарел: справочники скачиваются
+    session = FailingSession([], latency=0.05)
+    api = make_api(session=session)
+    unload_dictionaries(api)
+    session.calls.clear()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        boards = list(executor.map(lambda _: api._set_boards, range(8)))
+    assert len(session.calls) == 2 and all("TQBR" in value for value in boards)
+
+
+def test_endpoint_dictionary_is_read_once(monkeypatch):
+    reads = []
+    load = main_module.json.load
+    monkeypatch.setattr(main_module.json, "load", lambda file: reads.append(file) or time.sleep(0.05) or load(file))
+    api_dict = main_module._LazyApiDict(main_module.PATH_TO_DICT)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        sizes = list(executor.map(lambda _: len(api_dict), range(8)))
+    assert len(reads) == 1 and len(set(sizes)) == 1
@@ -0,0 +1,33 @@
+from api_lib.sync import IncrementalSync
+from conftest import FailingSession
+
+TRADES = {"engine": "stock", "market": "shares"}
+
+
+def test_trades_are_loaded_after_watermark(make_api, tmp_path):
+    session = FailingSession([])
+    sync = IncrementalSync(make_api(session=session), path=str(tmp_path))
+    assert sync.watermark(35, **TRADES) is None
+    first = sync.sync(35, **TRADES)
+    assert not first.empty
+    assert sync.watermark(35, **TRADES) == first["TRADENO"].iloc[-1]
+
+    session.calls.clear()
+    assert sync.sync(35, **TRADES).empty
+    assert session.calls[-1][1]["tradeno"] == first["TRADENO"].iloc[-1]
+    assert session.calls[-1][1]["next_trade"] == 1
+    assert sync.load(35, **TRADES).equals(first)
+
+
+def test_history_is_merged_without_duplicates(make_api, tmp_path):
+    session = FailingSession([], pages=2)
+    sync = IncrementalSync(make_api(session=session), path=str(tmp_path))
+    history = {"engine": "stock", "market": "shares", "security": "GAZP"}
+    first = sync.sync(63, _from="2000-01-01", **history)
+    watermark = sync.watermark(63, **history)
+    assert watermark == first["TRADEDATE"].max()
+
+    session.calls.clear()
+    sync.sync(63, _from="2000-01-01", **history)
+    assert {params["from"] for _, params in session.calls} == {watermark}
+    assert len(sync.load(63, **history)) == len(first.drop_duplicates(["TRADEDATE", "BOARDID", "SECID"]))
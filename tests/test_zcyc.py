@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api_lib.zcyc import ZeroCurve, ZeroCurveStore, price_bonds
+from conftest import FailingSession
+
+
+@pytest.fixture
+def curve(api):
+    return ZeroCurve.from_frame(api.request(783, date="2023-05-18"))
+
+
+def test_yields_match_exchange_curve(api):
+    frames = api.request(634, engine="stock")
+    curve = ZeroCurve.from_frame(frames["params"])
+    expected = frames["yearyields"]
+    assert np.allclose(curve.yields(expected["period"])[0], expected["value"], atol=1e-3)
+    assert np.allclose(curve.discount_factors([0, 1])[0], [1, 1 / (1 + curve.yields(1)[0, 0] / 100)])
+
+
+def test_locate(curve):
+    assert len(curve) == 9198 and (np.diff(curve.moments.astype(np.int64)) >= 0).all()
+    assert curve.locate(["2023-05-17", "2023-05-18"]).tolist() == [-1, len(curve) - 1]
+    assert curve.locate(["2023-05-18 10:00:03"]).tolist() == [1]
+    values = curve.yields_at(["2023-05-17", "2023-05-18"], [1, 1])
+    assert np.isnan(values[0]) and values[1] == pytest.approx(curve.yields(1)[-1, 0])
+
+
+def test_store_loads_each_date_once(make_api, curve):
+    session = FailingSession([])
+    store = ZeroCurveStore(make_api(session=session))
+    last = store.curve(["2023-05-18"])
+    assert len(last) == 1 and last.moments[0] == curve.moments[-1]
+    assert len(store.curve(["2023-05-18"], last=False)) == 9198
+    assert len([url for url, _ in session.calls if "zcyc" in url]) == 1
+
+
+def test_price_bonds(curve):
+    tenor = 2.
+    curve_yield = curve.yields(tenor)[-1, 0]
+    bonds = pd.DataFrame({
+        "TRADEDATE": ["2023-05-18", "2023-05-18", "2023-05-17"],
+        "SECID": ["A", "B", "A"],
+        "EFFECTIVEYIELD": [curve_yield, curve_yield + 1, curve_yield],
+        "DURATION": [tenor * 365] * 3,
+        "PRICE": [100., 100., 100.],
+        "ACCINT": [None, 1.5, None],
+    })
+    accints = pd.DataFrame({"tradedate": ["2023-05-18"], "secid": ["A"], "accint": [2.5]})
+    result = price_bonds(bonds, curve, accints)
+    assert result["GSPREAD"].iloc[:2].tolist() == pytest.approx([0, 100])
+    assert result["CURVEPRICE"].iloc[0] == pytest.approx(100)
+    assert result["CURVEPRICE"].iloc[1] > 100
+    assert result["DISCOUNT"].iloc[0] == pytest.approx((1 + curve_yield / 100) ** -tenor)
+    assert result["ACCINT"].iloc[:2].tolist() == [2.5, 1.5]
+    assert result.iloc[2][["CURVEYIELD", "GSPREAD"]].isna().all()  # Кривой на эту дату нет
+
+
+def test_price_exchange_bonds(api, curve):
+    bonds = api.request(791, engine="stock", market="bonds")
+    result = price_bonds(bonds, curve)
+    assert len(result) == len(bonds) and {"CURVEYIELD", "GSPREAD", "CURVEPRICE"} <= set(result.columns)
+
+
+def test_failed_date_is_retried_later(api, monkeypatch):
+    store = ZeroCurveStore(api)
+    fetch = store._fetch
+    monkeypatch.setattr(store, "_fetch", lambda date: fetch(date) if date != "2023-05-19" else 1 / 0)
+    with pytest.warns(UserWarning, match="2023-05-19"):
+        store.load(["2023-05-18", "2023-05-19"])
+    assert store._dates == {"2023-05-18"}